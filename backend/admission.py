@@ -0,0 +1,285 @@
+"""Admission control for the write-hot endpoints.
+
+A burst of message sends, votes or availability syncs can take every pooled
+connection and stall the reads behind them. ``AdmissionMiddleware`` puts three
+checks in front of those routes, and nothing else:
+
+1. Load shedding: while recent pool checkouts have waited longer than
+   ``ADMISSION_POOL_WAIT_SECONDS`` (default 0.25), they get a 503.
+2. Rate limits: each user has a token bucket per route class, refilled at
+   ``rate`` requests per second up to ``burst``. An empty bucket gets a 429.
+3. Concurrency caps: at most ``limit`` requests of a route class run at once in
+   a worker. A request waits up to ``ADMISSION_QUEUE_SECONDS`` (default 0.5)
+   for a slot, then gets a 503.
+
+Every rejection carries ``Retry-After``. Users are recognised by the ids, uids
+and emails in the query and JSON body, or else by client address.
+
+Limits are set per route class as ``RATE_LIMIT_MESSAGES=5/20`` (rate/burst) and
+``CONCURRENCY_LIMIT_MESSAGES=8``; see ``ROUTE_CLASSES`` for the defaults. Token
+buckets live in the worker by default. Set ``ADMISSION_URL=redis://host:6379/2``
+(requires ``pip install redis``) to share them between workers. Like the cache,
+the store accepts any ``redis.asyncio`` client, so ``fakeredis.aioredis`` can
+stand in for a server. Set ``ADMISSION_ENABLED=false`` to turn it all off.
+"""
+import asyncio
+import json
+import math
+import os
+import re
+import time
+import weakref
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl
+
+from sqlalchemy import event
+
+from database import user_identities
+
+ADMISSION_ENABLED = os.getenv("ADMISSION_ENABLED", "true").lower() in ("1", "true", "yes")
+ADMISSION_POOL_WAIT_SECONDS = float(os.getenv("ADMISSION_POOL_WAIT_SECONDS", "0.25"))
+ADMISSION_QUEUE_SECONDS = float(os.getenv("ADMISSION_QUEUE_SECONDS", "0.5"))
+# How fast the pool wait estimate forgets a slow checkout once checkouts are quick again
+POOL_WAIT_HALF_LIFE_SECONDS = 1.0
+MAX_BODY_BYTES = 64 * 1024
+
+
+def _rate(name: str, default: str) -> Tuple[float, int]:
+    rate, _, burst = os.getenv(f"RATE_LIMIT_{name.upper()}", default).partition("/")
+    return float(rate), int(burst or 1)
+
+
+def _concurrency(name: str, default: int) -> int:
+    return int(os.getenv(f"CONCURRENCY_LIMIT_{name.upper()}", str(default)))
+
+
+# name -> (method, path pattern, (rate per second, burst) per user, concurrent requests per worker)
+ROUTE_CLASSES = {
+    "messages": ("POST", re.compile(r"^/messages(/\d+)?$"), _rate("messages", "5/20"), _concurrency("messages", 8)),
+    "votes": ("POST", re.compile(r"^/posts/\d+/vote$"), _rate("votes", "10/30"), _concurrency("votes", 8)),
+    "availability": (
+        "POST", re.compile(r"^/availability/sync$"), _rate("availability", "0.5/5"), _concurrency("availability", 2)
+    ),
+}
+
+
+def route_class(method: str, path: str) -> Optional[str]:
+    for name, (route_method, pattern, _, _) in ROUTE_CLASSES.items():
+        if method == route_method and pattern.match(path):
+            return name
+    return None
+
+
+class PoolWait:
+    """Decaying estimate of how long pool checkouts wait, fed by every checkout of the watched engines."""
+
+    def __init__(self, half_life: float = POOL_WAIT_HALF_LIFE_SECONDS):
+        self.half_life = half_life
+        self._value = 0.0
+        self._at = time.monotonic()
+        self._watched = weakref.WeakSet()
+
+    def current(self, now: Optional[float] = None) -> float:
+        now = time.monotonic() if now is None else now
+        return self._value * 0.5 ** ((now - self._at) / self.half_life)
+
+    def observe(self, seconds: float) -> None:
+        now = time.monotonic()
+        # Jump up at once on a slow checkout; come down gradually as quick ones arrive
+        self._value = max(seconds, 0.8 * self.current(now) + 0.2 * seconds)
+        self._at = now
+
+    def watch(self, engine) -> None:
+        """Time every checkout from ``engine``'s pool (pass ``async_engine.sync_engine`` for async ones)."""
+        if engine in self._watched:
+            return
+        self._watched.add(engine)
+
+        def wrap(pool):
+            connect = pool.connect
+
+            def timed_connect():
+                started = time.perf_counter()
+                try:
+                    return connect()
+                finally:
+                    self.observe(time.perf_counter() - started)
+
+            pool.connect = timed_connect
+
+        wrap(engine.pool)
+        # dispose() swaps in a fresh pool
+        event.listen(engine, "engine_disposed", lambda e: wrap(e.pool))
+
+
+class TokenBuckets:
+    """Per-key token buckets, kept as GCRA theoretical arrival times (the same limits, one number per key)."""
+
+    async def take(self, key: str, rate: float, burst: int) -> float:
+        """Spend a token from ``key``'s bucket; returns 0, or the seconds until one is available."""
+        raise NotImplementedError
+
+    async def close(self) -> None:
+        pass
+
+    @staticmethod
+    def _next(tat: Optional[float], now: float, rate: float, burst: int) -> Tuple[float, float]:
+        """(new arrival time, seconds to wait); the arrival time only moves when the wait is 0."""
+        interval = 1 / rate
+        new_tat = max(tat or now, now) + interval
+        wait = new_tat - burst * interval - now
+        return (new_tat, 0.0) if wait <= 0 else (tat, wait)
+
+
+class MemoryTokenBuckets(TokenBuckets):
+    def __init__(self, max_keys: int = 100000):
+        self.max_keys = max_keys
+        self._tats: Dict[str, float] = {}
+
+    async def take(self, key: str, rate: float, burst: int) -> float:
+        now = time.time()
+        tat, wait = self._next(self._tats.get(key), now, rate, burst)
+        if not wait:
+            if len(self._tats) >= self.max_keys:
+                # A bucket whose arrival time has passed is full, the same as a missing one
+                self._tats = {k: t for k, t in self._tats.items() if t > now}
+            self._tats[key] = tat
+        return wait
+
+
+class RedisTokenBuckets(TokenBuckets):
+    """Arrival times under ``prefix``, updated with WATCH/MULTI so workers never double-spend a token."""
+
+    def __init__(self, client, prefix: str = "admission:"):
+        self.client = client
+        self.prefix = prefix
+
+    @classmethod
+    def from_url(cls, url: str) -> "RedisTokenBuckets":
+        import redis.asyncio as redis
+
+        return cls(redis.from_url(url))
+
+    async def take(self, key: str, rate: float, burst: int) -> float:
+        from redis.exceptions import WatchError
+
+        key = self.prefix + key
+        async with self.client.pipeline(transaction=True) as pipe:
+            while True:
+                try:
+                    await pipe.watch(key)
+                    raw = await pipe.get(key)
+                    now = time.time()
+                    tat, wait = self._next(None if raw is None else float(raw), now, rate, burst)
+                    if wait:
+                        await pipe.unwatch()
+                        return wait
+                    pipe.multi()
+                    # Once the arrival time has passed the bucket is full, so the key can go
+                    pipe.set(key, repr(tat), px=max(1, math.ceil((tat - now) * 1000)))
+                    await pipe.execute()
+                    return 0.0
+                except WatchError:
+                    continue
+
+    async def close(self) -> None:
+        await self.client.aclose()
+
+
+def create_token_buckets(url: str = None) -> TokenBuckets:
+    if url and url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisTokenBuckets.from_url(url)
+    return MemoryTokenBuckets()
+
+
+pool_wait = PoolWait()
+token_buckets = create_token_buckets(os.getenv("ADMISSION_URL"))
+
+
+class AdmissionMiddleware:
+    def __init__(self, app, buckets: Optional[TokenBuckets] = None, waits: Optional[PoolWait] = None):
+        self.app = app
+        self.buckets = buckets or token_buckets
+        self.pool_wait = waits or pool_wait
+        self.slots = {name: asyncio.Semaphore(limit) for name, (_, _, _, limit) in ROUTE_CLASSES.items()}
+
+    async def __call__(self, scope, receive, send):
+        name = scope["type"] == "http" and route_class(scope["method"], scope["path"])
+        if not name:
+            await self.app(scope, receive, send)
+            return
+        _, _, (rate, burst), _ = ROUTE_CLASSES[name]
+
+        wait = self.pool_wait.current()
+        if wait > ADMISSION_POOL_WAIT_SECONDS:
+            await _reject(send, 503, "Database is overloaded, try again shortly", wait)
+            return
+
+        messages, body = await _read_body(receive)
+        retry_after = await self.buckets.take(f"{name}:{_client_key(scope, body)}", rate, burst)
+        if retry_after:
+            await _reject(send, 429, "Too many requests", retry_after)
+            return
+
+        slots = self.slots[name]
+        try:
+            await asyncio.wait_for(slots.acquire(), ADMISSION_QUEUE_SECONDS)
+        except asyncio.TimeoutError:
+            await _reject(send, 503, "Server is busy, try again shortly", ADMISSION_QUEUE_SECONDS)
+            return
+        try:
+            await self.app(scope, _replay(messages, receive), send)
+        finally:
+            slots.release()
+
+
+async def _read_body(receive) -> Tuple[List[dict], bytes]:
+    messages, body = [], b""
+    while True:
+        message = await receive()
+        messages.append(message)
+        if message["type"] != "http.request":
+            break
+        body += message.get("body", b"")
+        if not message.get("more_body", False):
+            break
+    return messages, body
+
+
+def _replay(messages: List[dict], receive):
+    pending = list(messages)
+
+    async def replayed():
+        return pending.pop(0) if pending else await receive()
+
+    return replayed
+
+
+def _client_key(scope, body: bytes) -> str:
+    sources = [dict(parse_qsl(scope["query_string"].decode("latin-1")))]
+    if body and len(body) <= MAX_BODY_BYTES:
+        try:
+            payload = json.loads(body)
+        except ValueError:
+            payload = None
+        if isinstance(payload, dict):
+            sources.append(payload)
+    identities = user_identities(*sources)
+    if identities:
+        return min(identities)
+    client = scope.get("client")
+    return f"ip:{client[0] if client else 'unknown'}"
+
+
+async def _reject(send, status: int, detail: str, retry_after: float) -> None:
+    body = json.dumps({"detail": detail}).encode()
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+            (b"retry-after", str(max(1, math.ceil(retry_after))).encode()),
+        ],
+    })
+    await send({"type": "http.response.body", "body": body})
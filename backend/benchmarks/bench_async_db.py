@@ -0,0 +1,87 @@
+"""Compare concurrent query throughput of the sync and async database paths.
+
+The sync path runs each query in a worker thread capped at Starlette's default
+threadpool size (40), which is how sync `def` endpoints are served; the async path
+runs the same query on AsyncSession. Uses DATABASE_URL and the DB_POOL_* settings.
+
+Run from the backend/ directory:
+
+    python benchmarks/bench_async_db.py --requests 2000 --concurrency 200
+    python benchmarks/bench_async_db.py --sleep-ms 5    # PostgreSQL only: simulate a slower query
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+import anyio
+from sqlalchemy import select, text
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import models
+from database import AsyncSessionLocal, SessionLocal, async_engine, engine
+
+
+def build_query(sleep_ms):
+    feed = select(models.Post.id, models.Post.title).order_by(models.Post.created_at.desc()).limit(50)
+    if sleep_ms:
+        return [text("SELECT pg_sleep(:s)").bindparams(s=sleep_ms / 1000), feed]
+    return [feed]
+
+
+def sync_request(statements):
+    with SessionLocal() as db:
+        for stmt in statements:
+            db.execute(stmt).all()
+
+
+async def async_request(statements):
+    async with AsyncSessionLocal() as db:
+        for stmt in statements:
+            (await db.execute(stmt)).all()
+
+
+async def run_sync(statements, requests, concurrency):
+    limiter = anyio.CapacityLimiter(40)
+    gate = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with gate:
+            await anyio.to_thread.run_sync(sync_request, statements, limiter=limiter)
+
+    await asyncio.gather(*(one() for _ in range(requests)))
+
+
+async def run_async(statements, requests, concurrency):
+    gate = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with gate:
+            await async_request(statements)
+
+    await asyncio.gather(*(one() for _ in range(requests)))
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--sleep-ms", type=float, default=0)
+    args = parser.parse_args()
+
+    statements = build_query(args.sleep_ms)
+    for name, runner in (("sync + threadpool", run_sync), ("async", run_async)):
+        await runner(statements, min(args.requests, 50), args.concurrency)  # warm the pool
+        t0 = time.perf_counter()
+        await runner(statements, args.requests, args.concurrency)
+        elapsed = time.perf_counter() - t0
+        print(f"{name:18}: {args.requests / elapsed:8.0f} req/s  ({elapsed:.2f} s)")
+
+    engine.dispose()
+    await async_engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
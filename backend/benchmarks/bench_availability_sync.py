@@ -0,0 +1,80 @@
+"""Compare the diff-based availability sync with the old delete-and-reinsert loop.
+
+Creates the tables on a scratch database and times three syncs of the same
+user: the first full load, an identical re-sync, and a re-sync where a tenth of
+the slots moved.
+
+Run from the backend/ directory:
+
+    python benchmarks/bench_availability_sync.py --database-url sqlite:////tmp/sync.db --slots 10000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def legacy_sync(db, models, user_email, range_start, range_end, busy, source):
+    """The body of sync_availability before the diff-based rewrite."""
+    db.query(models.UserAvailability).filter(
+        models.UserAvailability.user_email == user_email,
+        models.UserAvailability.starts_at >= range_start,
+        models.UserAvailability.ends_at <= range_end
+    ).delete(synchronize_session=False)
+    for s, e in busy:
+        db.add(models.UserAvailability(user_email=user_email, starts_at=s, ends_at=e, source=source))
+    return {"added": len(busy)}
+
+
+def make_slots(count, start, rng):
+    slots = []
+    t = start
+    for _ in range(count):
+        t += timedelta(minutes=rng.choice([30, 60, 90]))
+        slots.append((t, t + timedelta(minutes=rng.choice([30, 45, 60]))))
+        t = slots[-1][1]
+    return slots
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--database-url", required=True, help="scratch database; tables are created and emptied")
+    parser.add_argument("--slots", type=int, default=10000)
+    args = parser.parse_args()
+    os.environ["DATABASE_URL"] = args.database_url
+    os.environ["METRICS_ENABLED"] = "false"
+
+    import models
+    from availability import sync_busy_blocks
+    from database import Base, SessionLocal, engine
+
+    Base.metadata.create_all(bind=engine)
+    rng = random.Random(393)
+    start = datetime(2026, 1, 5)
+    first = make_slots(args.slots, start, rng)
+    end = first[-1][1] + timedelta(days=1)
+    moved = [(s + timedelta(minutes=15), e + timedelta(minutes=15)) if rng.random() < 0.1 else (s, e)
+             for s, e in first]
+    scenarios = [("initial load", first), ("identical re-sync", first), ("10% moved", moved)]
+
+    for name, sync in (("legacy", legacy_sync), ("diff", None)):
+        with SessionLocal() as db:
+            db.query(models.UserAvailability).delete()
+            db.commit()
+            for label, busy in scenarios:
+                t0 = time.perf_counter()
+                if sync:
+                    counts = sync(db, models, "bench@case.edu", start, end, busy, "google_calendar")
+                else:
+                    counts = sync_busy_blocks(db, "bench@case.edu", start, end, busy)
+                db.commit()
+                elapsed = time.perf_counter() - t0
+                print(f"{name:6} {label:18}: {elapsed * 1000:9.1f} ms  {counts}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""Measure what conditional GETs and compression save on the list endpoints.
+
+Migrates a scratch database to head and seeds it like ``check_query_plans``. Then,
+for each list endpoint, it reports the bytes on the wire and the median latency of
+three kinds of request:
+- a plain 200 with no content coding;
+- a gzip 200, and a brotli 200 when ``brotli`` is installed;
+- a revalidation that the server answers with 304.
+
+Run from the backend/ directory against a throwaway database:
+
+    python benchmarks/bench_conditional_get.py --database-url postgresql://localhost/studysync_etag
+    python benchmarks/bench_conditional_get.py --database-url sqlite:////tmp/etag.db --scale 2000
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+ENDPOINTS = [
+    ("/posts", {"current_user_uid": "uid1", "limit": 200}),
+    ("/users", {"limit": 200}),
+    ("/messages/4", {"limit": 200}),
+    ("/study-sessions", {"user_email": "user5@case.edu", "range_start": "2026-01-05T00:00:00Z",
+                         "range_end": "2026-03-05T00:00:00Z"}),
+    ("/study-sessions/export", {"user_email": "user4@case.edu"}),
+    ("/study-groups/1/sessions/export", {}),
+]
+
+
+def timed(client, path, params, headers, repeats):
+    timings = []
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        response = client.get(path, params=params, headers=headers)
+        timings.append((time.perf_counter() - t0) * 1000)
+    return response, statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--database-url", required=True, help="scratch database; it will be migrated and seeded")
+    parser.add_argument("--scale", type=int, default=2000)
+    parser.add_argument("--repeats", type=int, default=50)
+    args = parser.parse_args()
+    os.environ["DATABASE_URL"] = args.database_url
+    os.environ["METRICS_ENABLED"] = "false"
+    # Measure the database path, not the response cache
+    os.environ["CACHE_URL"] = "none"
+
+    from alembic import command
+    from alembic.config import Config
+    from fastapi.testclient import TestClient
+    from sqlalchemy import text
+
+    import main as app_module
+    import models
+    from check_query_plans import seed
+    from compression import brotli
+    from database import SessionLocal, engine
+
+    backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    command.upgrade(Config(os.path.join(backend_dir, "alembic.ini")), "head")
+    with SessionLocal() as db:
+        seed(db, models, args.scale, random.Random(393))
+        if engine.dialect.name == "postgresql":
+            db.execute(text("ANALYZE"))
+            db.commit()
+
+    encodings = ["identity", "gzip"] + (["br"] if brotli is not None else [])
+    with TestClient(app_module.app) as client:
+        for path, params in ENDPOINTS:
+            print(path)
+            etag = None
+            for encoding in encodings:
+                response, latency = timed(client, path, params, {"Accept-Encoding": encoding}, args.repeats)
+                etag = etag or response.headers.get("etag")
+                print(f"  200 {encoding:8}: {response.num_bytes_downloaded:8d} bytes  p50 {latency:6.2f} ms")
+            response, latency = timed(
+                client, path, params, {"Accept-Encoding": "identity", "If-None-Match": etag}, args.repeats
+            )
+            print(f"  {response.status_code} revalidate: {response.num_bytes_downloaded:8d} bytes  p50 {latency:6.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,280 @@
+"""Load-test every endpoint in-process and compare the results with a JSON baseline.
+
+Migrates a scratch database to head and seeds ``--scale`` users (with their posts,
+votes, conversations, messages, groups, sessions and availability, as in
+``check_query_plans``). It then boots the app from main.py, lifespan included,
+behind an in-process ASGI transport. Each scenario below is driven by
+``--concurrency`` clients for ``--requests`` requests after a short warm-up.
+
+For each scenario the suite reports:
+- p50/p95/p99 latency
+- throughput
+- SQL statements per request, from the metrics middleware
+- the number of error responses
+
+``--save`` writes the results as a baseline. ``--baseline`` compares against one
+and exits non-zero when a scenario regresses:
+- p95 rises by more than ``--threshold`` (default 25%)
+- throughput falls by more than ``--threshold``
+- the scenario issues more statements per request
+- the scenario returns errors
+
+Latency only compares with a baseline recorded on the same machine, dialect and
+scale.
+
+Run from the backend/ directory against a throwaway database:
+
+    python benchmarks/bench_endpoints.py --database-url postgresql://localhost/studysync_bench \\
+        --save benchmarks/baselines/postgresql.json
+    python benchmarks/bench_endpoints.py --database-url "sqlite:////tmp/bench.db?timeout=60" \\
+        --baseline benchmarks/baselines/sqlite.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+RANGE_START = datetime(2026, 1, 5)
+
+
+def _iso(dt):
+    return dt.isoformat() + "Z"
+
+
+def _busy_slots(rng, day):
+    slots = []
+    for _ in range(rng.randint(0, 6)):
+        start = day + timedelta(hours=rng.randint(8, 20))
+        slots.append({"starts_at": _iso(start), "ends_at": _iso(start + timedelta(minutes=rng.choice([30, 60, 90])))})
+    return slots
+
+
+def build_scenarios(scale):
+    """(name, build(rng) -> (method, url, request kwargs)) for every endpoint."""
+    groups = max(scale // 20, 1)
+
+    def user(rng):
+        return rng.randint(1, scale)
+
+    def uid(rng):
+        return f"uid{rng.randrange(scale)}"
+
+    def email(rng):
+        return f"user{rng.randrange(scale)}@case.edu"
+
+    def feed(sort):
+        return lambda rng: ("GET", "/posts", {"params": {"current_user_uid": uid(rng), "sort": sort, "limit": 50}})
+
+    def send_message(rng):
+        # conversation k always has user k as a participant
+        k = user(rng)
+        return "POST", f"/messages/{k}", {"params": {"sender_id": k}, "json": {"content": f"benchmark {rng.random()}"}}
+
+    def sync_availability(rng):
+        day = RANGE_START + timedelta(days=rng.randrange(7))
+        return "POST", "/availability/sync", {"json": {
+            "user_email": email(rng), "starts_at": _iso(day), "ends_at": _iso(day + timedelta(days=1)),
+            "busy_slots": _busy_slots(rng, day),
+        }}
+
+    def create_session(rng):
+        start = RANGE_START + timedelta(hours=rng.randrange(24 * 30))
+        return "POST", "/study-sessions", {"json": {
+            "creator_email": email(rng), "title": "Benchmark", "starts_at": _iso(start),
+            "ends_at": _iso(start + timedelta(hours=1)),
+        }}
+
+    return [
+        ("feed new", feed("new")),
+        ("feed hot", feed("hot")),
+        ("feed top", feed("top")),
+        ("vote", lambda rng: (
+            "POST", f"/posts/{user(rng)}/vote", {"params": {"user_uid": uid(rng), "vote": rng.choice([-1, 0, 1])}}
+        )),
+        ("search posts", lambda rng: ("GET", "/search", {"params": {"q": f"post {user(rng)}"}})),
+        ("profile", lambda rng: ("GET", f"/user/{uid(rng)}", {})),
+        ("user directory", lambda rng: ("GET", "/users", {"params": {"limit": 50}})),
+        ("conversations", lambda rng: ("GET", f"/conversations/{user(rng)}", {})),
+        ("open conversation", lambda rng: (
+            "POST", "/conversations/one-on-one/{}/{}".format(*rng.sample(range(1, scale + 1), 2)), {}
+        )),
+        ("inbox", lambda rng: ("GET", f"/inbox/{user(rng)}", {})),
+        ("message history", lambda rng: ("GET", f"/messages/{user(rng)}", {"params": {"limit": 50}})),
+        ("send message", send_message),
+        ("study groups", lambda rng: ("GET", "/study-groups", {"params": {"user_email": email(rng)}})),
+        ("suggestions", lambda rng: ("GET", f"/study-groups/{rng.randint(1, groups)}/suggestions", {"params": {
+            "range_start": _iso(RANGE_START), "range_end": _iso(RANGE_START + timedelta(days=7)),
+        }})),
+        ("best times", lambda rng: ("GET", "/study-groups/suggestions", {"params": {
+            "user_email": email(rng), "range_start": _iso(RANGE_START), "range_end": _iso(RANGE_START + timedelta(days=7)),
+        }})),
+        ("availability sync", sync_availability),
+        ("sessions", lambda rng: ("GET", "/study-sessions", {"params": {
+            "user_email": email(rng), "range_start": _iso(RANGE_START),
+            "range_end": _iso(RANGE_START + timedelta(days=30)),
+        }})),
+        ("create session", create_session),
+        ("calendar feed", lambda rng: ("GET", "/study-sessions/export", {"params": {"user_email": email(rng)}})),
+    ]
+
+
+def percentile(sorted_values, fraction):
+    return sorted_values[min(int(len(sorted_values) * fraction), len(sorted_values) - 1)]
+
+
+async def run_scenario(client, build, args, rng):
+    from metrics import REQUEST_QUERIES
+
+    async def drive(count, latencies, errors):
+        remaining = count
+
+        async def worker():
+            nonlocal remaining
+            while remaining > 0:
+                remaining -= 1
+                method, url, kwargs = build(rng)
+                t0 = time.perf_counter()
+                response = await client.request(method, url, **kwargs)
+                latencies.append((time.perf_counter() - t0) * 1000)
+                if response.status_code >= 400:
+                    errors.append(response.status_code)
+
+        await asyncio.gather(*(worker() for _ in range(min(args.concurrency, count))))
+
+    await drive(args.warmup, [], [])
+    queries_before, requests_before = REQUEST_QUERIES.total()
+    latencies, errors = [], []
+    t0 = time.perf_counter()
+    await drive(args.requests, latencies, errors)
+    elapsed = time.perf_counter() - t0
+    queries_after, requests_after = REQUEST_QUERIES.total()
+
+    latencies.sort()
+    return {
+        "p50_ms": round(statistics.median(latencies), 3),
+        "p95_ms": round(percentile(latencies, 0.95), 3),
+        "p99_ms": round(percentile(latencies, 0.99), 3),
+        "throughput_rps": round(len(latencies) / elapsed, 1),
+        "queries_per_request": round((queries_after - queries_before) / max(requests_after - requests_before, 1), 2),
+        "errors": len(errors),
+    }
+
+
+async def run_all(app, scenarios, args):
+    import httpx
+
+    rng = random.Random(args.seed)
+    results = {}
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            for name, build in scenarios:
+                results[name] = stats = await run_scenario(client, build, args, rng)
+                print(f"{name:18} p50 {stats['p50_ms']:8.2f} ms  p95 {stats['p95_ms']:8.2f} ms  "
+                      f"p99 {stats['p99_ms']:8.2f} ms  {stats['throughput_rps']:8.1f} req/s  "
+                      f"{stats['queries_per_request']:5.2f} q/req  {stats['errors']} errors")
+    from database import async_engine, engine
+
+    await async_engine.dispose()
+    engine.dispose()
+    return results
+
+
+def regressions(results, baseline, threshold):
+    found = []
+    for name, current in results.items():
+        before = baseline.get("endpoints", {}).get(name)
+        if current["errors"]:
+            found.append(f"{name}: {current['errors']} error responses")
+        if before is None:
+            continue
+        if current["p95_ms"] > before["p95_ms"] * (1 + threshold):
+            found.append(f"{name}: p95 {before['p95_ms']} -> {current['p95_ms']} ms")
+        if current["throughput_rps"] < before["throughput_rps"] * (1 - threshold):
+            found.append(f"{name}: throughput {before['throughput_rps']} -> {current['throughput_rps']} req/s")
+        if current["queries_per_request"] > before["queries_per_request"] + 0.01:
+            found.append(
+                f"{name}: queries per request {before['queries_per_request']} -> {current['queries_per_request']}"
+            )
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--database-url", required=True, help="scratch database; it will be migrated and seeded")
+    parser.add_argument("--scale", type=int, default=1000, help="number of seeded users (and posts, conversations)")
+    parser.add_argument("--requests", type=int, default=500, help="measured requests per scenario")
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=393)
+    parser.add_argument("--only", action="append", help="run only the named scenario; repeatable")
+    parser.add_argument("--cache", action="store_true", help="keep the response cache on (off by default)")
+    parser.add_argument("--save", help="write the results to this JSON baseline file")
+    parser.add_argument("--baseline", help="compare against this JSON baseline file")
+    parser.add_argument("--threshold", type=float, default=0.25, help="allowed fractional latency/throughput loss")
+    args = parser.parse_args()
+    os.environ["DATABASE_URL"] = args.database_url
+    # The middleware counts statements per request
+    os.environ["METRICS_ENABLED"] = "true"
+    # Measure the endpoints, not the rate limits in front of them
+    os.environ["ADMISSION_ENABLED"] = "false"
+    if not args.cache:
+        os.environ["CACHE_URL"] = "none"
+
+    from alembic import command
+    from alembic.config import Config
+    from sqlalchemy import text
+
+    import models
+    from check_query_plans import seed
+    from database import SessionLocal, engine
+    from main import app
+
+    backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    command.upgrade(Config(os.path.join(backend_dir, "alembic.ini")), "head")
+    with SessionLocal() as db:
+        seed(db, models, args.scale, random.Random(args.seed))
+        if engine.dialect.name == "postgresql":
+            db.execute(text("ANALYZE"))
+            db.commit()
+
+    scenarios = [(name, build) for name, build in build_scenarios(args.scale) if not args.only or name in args.only]
+    results = {
+        "meta": {
+            "dialect": engine.dialect.name, "scale": args.scale, "requests": args.requests,
+            "concurrency": args.concurrency, "cache": args.cache, "python": platform.python_version(),
+            "machine": platform.node(), "recorded_at": datetime.utcnow().isoformat(timespec="seconds"),
+        },
+        "endpoints": asyncio.run(run_all(app, scenarios, args)),
+    }
+
+    if args.save:
+        os.makedirs(os.path.dirname(os.path.abspath(args.save)), exist_ok=True)
+        with open(args.save, "w") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"saved baseline to {args.save}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        for key in ("dialect", "scale", "concurrency", "cache"):
+            if baseline["meta"].get(key) != results["meta"][key]:
+                print(f"warning: baseline {key} is {baseline['meta'].get(key)!r}, this run is {results['meta'][key]!r}")
+        found = regressions(results["endpoints"], baseline, args.threshold)
+        if found:
+            print("REGRESSED:\n  " + "\n  ".join(found))
+            sys.exit(1)
+        print(f"OK: {len(results['endpoints'])} scenarios within {args.threshold:.0%} of {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""Measure message fan-out throughput for one large group conversation.
+
+Run from the backend/ directory:
+
+    python benchmarks/bench_fanout.py --members 200 --messages 500
+    python benchmarks/bench_fanout.py --redis-url redis://localhost:6379/0
+    python benchmarks/bench_fanout.py --fake-redis      # needs fakeredis installed
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from broker import InProcessBroker, RedisBroker, conversation_channel
+
+
+async def member(broker, channel, expected, ready, latencies):
+    async with broker.subscribe([channel]) as events:
+        ready.release()
+        received = 0
+        async for _, message in events:
+            latencies.append(time.perf_counter() - message["sent_at"])
+            received += 1
+            if received == expected:
+                return
+
+
+async def run(broker, members, messages):
+    channel = conversation_channel(1)
+    ready = asyncio.Semaphore(0)
+    latencies = []
+    tasks = [asyncio.create_task(member(broker, channel, messages, ready, latencies)) for _ in range(members)]
+    for _ in range(members):
+        await ready.acquire()
+    # Give Redis subscriptions time to register on the server
+    await asyncio.sleep(0.2 if isinstance(broker, RedisBroker) else 0)
+
+    t0 = time.perf_counter()
+    for i in range(messages):
+        await broker.publish(channel, {"message_id": i, "content": "x" * 80, "sent_at": time.perf_counter()})
+        if i % 50 == 0:
+            await asyncio.sleep(0)
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - t0
+    await broker.close()
+
+    deliveries = members * messages
+    latencies.sort()
+    print(f"{type(broker).__name__}: {members} members x {messages} messages")
+    print(f"  deliveries/s : {deliveries / elapsed:,.0f}")
+    print(f"  p50 latency  : {statistics.median(latencies) * 1000:.2f} ms")
+    print(f"  p99 latency  : {latencies[int(len(latencies) * 0.99) - 1] * 1000:.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--members", type=int, default=200)
+    parser.add_argument("--messages", type=int, default=500)
+    parser.add_argument("--redis-url")
+    parser.add_argument("--fake-redis", action="store_true")
+    args = parser.parse_args()
+
+    if args.redis_url:
+        broker = RedisBroker.from_url(args.redis_url)
+    elif args.fake_redis:
+        import fakeredis
+
+        broker = RedisBroker(fakeredis.aioredis.FakeRedis(), queue_size=args.messages)
+    else:
+        broker = InProcessBroker(queue_size=args.messages)
+    asyncio.run(run(broker, args.members, args.messages))
+
+
+if __name__ == "__main__":
+    main()
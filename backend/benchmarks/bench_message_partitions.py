@@ -0,0 +1,166 @@
+"""Measure message inserts and history reads on a long history, before and after archiving.
+
+Migrates a scratch database to ``--revision`` (head by default; 0007 is the last
+revision before messages were partitioned) and loads ``--months`` months of
+messages spread over ``--conversations`` conversations, ending today. It then
+reports median latencies for:
+- ``POST /messages/{id}``, sending a message;
+- ``GET /messages/{id}?limit=50``, the most recent page;
+- ``GET /messages/{id}?limit=50&before=...``, a page from the oldest month.
+
+With ``--retention-months`` it archives every older month to cold storage
+(``MESSAGE_ARCHIVE_DIR``, a temporary directory unless set) and measures again.
+The old page is then served from the archive.
+
+Run from the backend/ directory against a throwaway database, once per revision
+to compare:
+
+    python benchmarks/bench_message_partitions.py --database-url postgresql://localhost/studysync_parts --revision 0007
+    python benchmarks/bench_message_partitions.py --database-url postgresql://localhost/studysync_parts2 --retention-months 6
+    python benchmarks/bench_message_partitions.py --database-url sqlite:////tmp/parts.db --months 12 --per-month 2000
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+PARTICIPANTS = 5
+
+
+def seed(args):
+    from alembic import command
+    from alembic.config import Config
+    from sqlalchemy import text
+
+    import models
+    from database import engine
+    from generate_fake_data import Loader
+    from message_partitions import add_months, ensure_partitions, month_start
+
+    backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    command.upgrade(Config(os.path.join(backend_dir, "alembic.ini")), args.revision)
+    now = datetime.utcnow()
+    first = add_months(month_start(now), 1 - args.months)
+    rng = random.Random(393)
+    with engine.connect() as conn:
+        if conn.execute(text("SELECT count(*) FROM messages")).scalar():
+            sys.exit("the scratch database already has messages; use an empty one")
+        ensure_partitions(conn, now=now, since=first)
+        conn.commit()
+        loader = Loader(conn, 10000)
+        for u in range(1, PARTICIPANTS + 1):
+            loader.add(models.User.__table__, {
+                "user_id": u, "firebase_uid": f"parts{u}", "email": f"parts{u}@case.edu",
+                "full_name": f"Partition User {u}", "role": "Student", "created_at": first, "updated_at": first,
+            })
+        for c in range(1, args.conversations + 1):
+            loader.add(models.Conversation.__table__, {
+                "conversation_id": c, "is_group": True, "group_name": f"Partitions {c}", "created_at": first,
+            })
+            for u in range(1, PARTICIPANTS + 1):
+                loader.add(models.ConversationParticipant.__table__, {
+                    "conversation_id": c, "user_id": u, "joined_at": first,
+                })
+        span = (now - first).total_seconds()
+        total = args.months * args.per_month
+        for m in range(total):
+            loader.add(models.Message.__table__, {
+                "conversation_id": rng.randint(1, args.conversations),
+                "sender_id": m % PARTICIPANTS + 1,
+                "content": f"Message {m}: who has notes from lecture {m % 28}?",
+                "created_at": first + timedelta(seconds=span * m / total),
+            })
+        loader.flush()
+        if engine.dialect.name == "postgresql":
+            conn.execute(text("ANALYZE"))
+            conn.commit()
+    return first
+
+
+def median_ms(call, repeats):
+    timings = []
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        call()
+        timings.append((time.perf_counter() - t0) * 1000)
+    return statistics.median(timings)
+
+
+def measure(client, args, first, label):
+    from pagination import encode_cursor
+
+    rng = random.Random(21)
+    old_cursor = encode_cursor(first + timedelta(days=20), 0)
+
+    def send():
+        response = client.post(
+            f"/messages/{rng.randint(1, args.conversations)}", params={"sender_id": 1},
+            json={"content": "benchmark message"}
+        )
+        assert response.status_code == 200, response.text
+
+    def recent():
+        response = client.get(f"/messages/{rng.randint(1, args.conversations)}", params={"limit": 50})
+        assert response.status_code == 200, response.text
+
+    def old():
+        response = client.get(
+            f"/messages/{rng.randint(1, args.conversations)}", params={"limit": 50, "before": old_cursor}
+        )
+        assert response.status_code == 200, response.text
+
+    print(label)
+    for name, call in (("insert", send), ("recent history", recent), ("oldest month", old)):
+        print(f"  {name:<16} {median_ms(call, args.repeats):8.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--database-url", required=True, help="empty scratch database; it will be migrated and seeded")
+    parser.add_argument("--revision", default="head", help="migrate to this revision, e.g. 0007 for an unpartitioned table")
+    parser.add_argument("--months", type=int, default=24)
+    parser.add_argument("--per-month", type=int, default=100_000, help="messages per month")
+    parser.add_argument("--conversations", type=int, default=200)
+    parser.add_argument("--retention-months", type=int, default=0, help="archive older months, then measure again")
+    parser.add_argument("--repeats", type=int, default=200)
+    args = parser.parse_args()
+    os.environ["DATABASE_URL"] = args.database_url
+    os.environ["METRICS_ENABLED"] = "false"
+    # Measure the endpoints, not the rate limits in front of them
+    os.environ["ADMISSION_ENABLED"] = "false"
+    os.environ["CACHE_URL"] = "none"
+    os.environ["MESSAGE_MAINTENANCE_SECONDS"] = "0"
+    os.environ.setdefault("MESSAGE_ARCHIVE_DIR", tempfile.mkdtemp(prefix="studysync-archive-"))
+
+    from fastapi.testclient import TestClient
+
+    import main as app_module
+    from database import engine
+    from message_partitions import archive_old_months, is_partitioned
+
+    t0 = time.perf_counter()
+    first = seed(args)
+    with engine.connect() as conn:
+        partitioned = is_partitioned(conn)
+    print(f"seeded {args.months * args.per_month:,} messages in {time.perf_counter() - t0:.1f} s "
+          f"({'partitioned' if partitioned else 'one table'}, revision {args.revision})")
+
+    with TestClient(app_module.app) as client:
+        measure(client, args, first, "all months in the database")
+        if args.retention_months > 0:
+            t0 = time.perf_counter()
+            with engine.connect() as conn:
+                archived = archive_old_months(conn, retention=args.retention_months)
+            print(f"archived {len(archived)} months to {os.environ['MESSAGE_ARCHIVE_DIR']} "
+                  f"in {time.perf_counter() - t0:.1f} s")
+            measure(client, args, first, f"last {args.retention_months} months in the database")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""Time /search queries against a large message history.
+
+Migrates a scratch database to head, loads ``--messages`` messages (1M by default)
+spread over many conversations, then times post and message searches for rare,
+common and multi-word queries through ``search.search`` and reports p50/p95/max.
+The measured user is in ``--user-conversations`` conversations, so message search
+also exercises the participant scoping.
+
+Run from the backend/ directory against a throwaway database:
+
+    python benchmarks/bench_search.py --database-url postgresql://localhost/studysync_search
+    python benchmarks/bench_search.py --database-url sqlite:////tmp/search.db --messages 200000
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Words are drawn with Zipf weights, so w1 is in most messages and w4000 in few
+VOCABULARY = [f"w{i}" for i in range(5000)]
+QUERIES = {
+    "common word": "w1",
+    "mid word": "w50",
+    "rare word": "w4000",
+    "two words": "w3 w50",
+}
+BATCH = 50000
+
+
+def seed(db, models, args, rng):
+    now = datetime(2026, 1, 5)
+    conversations = max(args.messages // 100, 10)
+    db.execute(models.User.__table__.insert(), [
+        {"user_id": u + 1, "firebase_uid": f"uid{u}", "email": f"user{u}@case.edu", "full_name": f"User {u}",
+         "role": "Student", "created_at": now}
+        for u in range(conversations + 1)
+    ])
+    db.execute(models.Conversation.__table__.insert(), [
+        {"conversation_id": c + 1, "is_group": False, "created_at": now} for c in range(conversations)
+    ])
+    # user 1 is in the first --user-conversations conversations, everyone else in one
+    db.execute(models.ConversationParticipant.__table__.insert(), [
+        {"conversation_id": c + 1, "user_id": 1 if c < args.user_conversations else c + 2, "joined_at": now}
+        for c in range(conversations)
+    ])
+    weights = [1 / (rank + 1) for rank in range(len(VOCABULARY))]
+    for start in range(0, args.messages, BATCH):
+        count = min(BATCH, args.messages - start)
+        db.execute(models.Message.__table__.insert(), [
+            {"conversation_id": rng.randint(1, conversations), "sender_id": 1,
+             "content": " ".join(rng.choices(VOCABULARY, weights, k=12)),
+             "created_at": now + timedelta(seconds=start + m)}
+            for m in range(count)
+        ])
+        db.commit()
+    db.execute(models.Post.__table__.insert(), [
+        {"author_uid": "uid0", "title": " ".join(rng.choices(VOCABULARY, weights, k=5)),
+         "description": " ".join(rng.choices(VOCABULARY, weights, k=30)), "score": 0, "hot_score": 0,
+         "created_at": now}
+        for _ in range(args.messages // 20)
+    ])
+    db.commit()
+
+
+async def time_queries(kind, args):
+    from database import AsyncSessionLocal
+    from search import search
+
+    for label, q in QUERIES.items():
+        timings = []
+        hits = 0
+        async with AsyncSessionLocal() as db:
+            for _ in range(args.repeats):
+                t0 = time.perf_counter()
+                rows = await search(db, kind, q, user_id=1, limit=20)
+                timings.append((time.perf_counter() - t0) * 1000)
+                hits = min(len(rows), 20)
+        timings.sort()
+        print(f"{kind:8} {label:12}: p50 {statistics.median(timings):7.1f} ms  "
+              f"p95 {timings[int(len(timings) * 0.95) - 1]:7.1f} ms  max {timings[-1]:7.1f} ms  ({hits} on page)")
+
+
+async def time_all(args):
+    from database import async_engine
+
+    for kind in ("posts", "messages"):
+        await time_queries(kind, args)
+    await async_engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--database-url", required=True, help="scratch database; it will be migrated and seeded")
+    parser.add_argument("--messages", type=int, default=1000000)
+    parser.add_argument("--user-conversations", type=int, default=50)
+    parser.add_argument("--repeats", type=int, default=20)
+    args = parser.parse_args()
+    os.environ["DATABASE_URL"] = args.database_url
+    os.environ["METRICS_ENABLED"] = "false"
+
+    from alembic import command
+    from alembic.config import Config
+    from sqlalchemy import text
+
+    import models
+    from database import SessionLocal, engine
+
+    backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    command.upgrade(Config(os.path.join(backend_dir, "alembic.ini")), "head")
+    t0 = time.perf_counter()
+    with SessionLocal() as db:
+        seed(db, models, args, random.Random(393))
+        if engine.dialect.name == "postgresql":
+            db.execute(text("ANALYZE"))
+            db.commit()
+    print(f"seeded {args.messages} messages in {time.perf_counter() - t0:.1f} s")
+
+    asyncio.run(time_all(args))
+
+
+if __name__ == "__main__":
+    main()
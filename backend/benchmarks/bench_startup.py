@@ -0,0 +1,133 @@
+"""Measure how long the app takes to import and how long a server's workers take to come up.
+
+Migrates a scratch database to head, then reports:
+- ``import main`` time, the median of ``--repeats`` fresh interpreters run with
+  ``python -X importtime``, and the modules that cost the most themselves;
+- whether the import created an engine or loaded a database driver, which
+  fails the run: connections made before a server forks would be shared by
+  its workers;
+- cold start under ``uvicorn --workers N``: the time from launch until every
+  worker has finished its lifespan startup, and until the first request that
+  reads the database succeeds.
+
+Run from the backend/ directory against a throwaway database:
+
+    python benchmarks/bench_startup.py --database-url postgresql://localhost/studysync_startup
+    python benchmarks/bench_startup.py --database-url sqlite:////tmp/startup.db --workers 4
+"""
+import argparse
+import json
+import os
+import re
+import socket
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DRIVERS = ("psycopg2", "asyncpg", "aiosqlite", "sqlite3")
+
+# Printed on stdout by the child; importtime's report goes to stderr
+IMPORT_CHECK = """
+import json, sys
+import main, database
+print(json.dumps({
+    "engines": [name for name in database.LAZY_ATTRIBUTES if name in vars(database)],
+    "drivers": [name for name in %r if name in sys.modules],
+}))
+""" % (DRIVERS,)
+
+
+def import_times(env, repeats, top):
+    totals, checks, modules = [], [], {}
+    for _ in range(repeats):
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", IMPORT_CHECK], cwd=BACKEND_DIR, env=env,
+            capture_output=True, text=True, check=True
+        )
+        checks.append(json.loads(result.stdout))
+        modules = {}
+        for line in result.stderr.splitlines():
+            match = re.match(r"import time:\s+(\d+) \|\s+(\d+) \|(\s+)(\S+)", line)
+            if match:
+                modules[match.group(4)] = (int(match.group(1)), int(match.group(2)))
+        totals.append(modules["main"][1] / 1000)
+    slowest = sorted(modules.items(), key=lambda item: item[1][0], reverse=True)[:top]
+    return statistics.median(totals), checks[-1], slowest
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def cold_start(env, workers, app, timeout):
+    port = free_port()
+    command = [sys.executable, "-m", "uvicorn", app, "--port", str(port), "--workers", str(workers)]
+    if app.endswith("create_app"):
+        command.append("--factory")
+    url = f"http://127.0.0.1:{port}/users?limit=1"
+    started = time.perf_counter()
+    server = subprocess.Popen(command, cwd=BACKEND_DIR, env=env, stderr=subprocess.PIPE, text=True)
+    log = []
+    threading.Thread(target=lambda: log.extend(server.stderr), daemon=True).start()
+    ready = first_response = None
+    complete = 0
+    try:
+        while (ready is None or first_response is None) and time.perf_counter() - started < timeout:
+            complete = sum("Application startup complete" in line for line in list(log))
+            if ready is None and complete >= workers:
+                ready = time.perf_counter() - started
+            if first_response is None and complete:
+                try:
+                    with urllib.request.urlopen(url, timeout=1) as response:
+                        if response.status == 200:
+                            first_response = time.perf_counter() - started
+                except (urllib.error.URLError, ConnectionError):
+                    pass
+            if server.poll() is not None:
+                sys.exit("the server exited:\n" + "".join(log))
+            time.sleep(0.01)
+    finally:
+        server.terminate()
+        server.wait(timeout)
+    if ready is None or first_response is None:
+        sys.exit(f"the server was not ready after {timeout:.0f} s ({complete} of {workers} workers started)")
+    return ready, first_response
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--database-url", required=True, help="scratch database; it will be migrated")
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10, help="list this many of the slowest modules")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--app", default="main:create_app", help="uvicorn app; a create_app factory gets --factory")
+    parser.add_argument("--timeout", type=float, default=60)
+    args = parser.parse_args()
+    env = {**os.environ, "DATABASE_URL": args.database_url, "METRICS_ENABLED": "false", "CACHE_URL": "none"}
+
+    subprocess.run([sys.executable, "-m", "alembic", "upgrade", "head"], cwd=BACKEND_DIR, env=env, check=True)
+
+    total, check, slowest = import_times(env, args.repeats, args.top)
+    print(f"import main: {total:.0f} ms (median of {args.repeats})")
+    for name, (self_us, cumulative_us) in slowest:
+        print(f"  {name:<40} {self_us / 1000:8.1f} ms self {cumulative_us / 1000:8.1f} ms cumulative")
+
+    ready, first = zip(*(cold_start(env, args.workers, args.app, args.timeout) for _ in range(args.repeats)))
+    print(f"{args.workers} workers of {args.app}: all started in {statistics.median(ready) * 1000:.0f} ms, "
+          f"first database read in {statistics.median(first) * 1000:.0f} ms (medians of {args.repeats})")
+
+    if check["engines"] or check["drivers"]:
+        sys.exit(f"FAILED: importing main created {check['engines'] or 'no engines'} "
+                 f"and loaded {check['drivers'] or 'no drivers'}")
+    print("OK: importing main creates no engine and loads no database driver")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""Compare the slot-suggestion engine against the old per-slot scan.
+
+Run from the backend/ directory:
+
+    python benchmarks/bench_suggestions.py --members 40 --days 30
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scheduling import suggest_slots
+
+
+def legacy_suggestions(busy_slots, total_members, start, end, duration_minutes, slot_minutes,
+                       day_start_hour, day_end_hour, min_available_members):
+    """The loop get_group_suggestions used before the scheduling engine."""
+    suggestions = []
+    slot_start = start
+    while slot_start + timedelta(minutes=duration_minutes) <= end:
+        slot_end = slot_start + timedelta(minutes=duration_minutes)
+        if day_start_hour <= slot_start.hour < day_end_hour:
+            busy_count = sum(1 for s, e in busy_slots if s < slot_end and e > slot_start)
+            available = total_members - busy_count
+            if available >= min_available_members:
+                suggestions.append({
+                    "starts_at": slot_start.isoformat(),
+                    "ends_at": slot_end.isoformat(),
+                    "available_members": available,
+                    "total_members": total_members
+                })
+        slot_start += timedelta(minutes=slot_minutes)
+    return suggestions[:50]
+
+
+def make_busy(members, days, blocks_per_day, start, rng):
+    busy_by_member = {}
+    for m in range(members):
+        blocks = []
+        for d in range(days):
+            for _ in range(blocks_per_day):
+                s = start + timedelta(days=d, hours=rng.randint(7, 21), minutes=rng.choice([0, 15, 30, 45]))
+                blocks.append((s, s + timedelta(minutes=rng.choice([30, 60, 90, 120]))))
+        busy_by_member[f"member{m}@example.com"] = blocks
+    return busy_by_member
+
+
+def timed(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--members", type=int, default=40)
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--blocks-per-day", type=int, default=4)
+    parser.add_argument("--slot-minutes", type=int, default=30)
+    parser.add_argument("--duration-minutes", type=int, default=60)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=393)
+    args = parser.parse_args()
+
+    start = datetime(2026, 1, 5)
+    end = start + timedelta(days=args.days)
+    busy_by_member = make_busy(args.members, args.days, args.blocks_per_day, start, random.Random(args.seed))
+    flat = [b for blocks in busy_by_member.values() for b in blocks]
+    params = dict(duration_minutes=args.duration_minutes, slot_minutes=args.slot_minutes,
+                  day_start_hour=8, day_end_hour=22, min_available_members=1)
+
+    legacy = timed(lambda: legacy_suggestions(flat, args.members, start, end, **params), args.repeat)
+    engine = timed(lambda: suggest_slots(busy_by_member, args.members, start, end, limit=50, **params),
+                   args.repeat)
+
+    print(f"members={args.members} days={args.days} busy_blocks={len(flat)}")
+    print(f"legacy loop : {legacy * 1000:9.2f} ms")
+    print(f"sweep engine: {engine * 1000:9.2f} ms  ({legacy / engine:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
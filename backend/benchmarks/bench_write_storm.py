@@ -0,0 +1,143 @@
+"""Measure read latency during a storm of writes, with and without admission control.
+
+Migrates a scratch database to head and seeds it like ``bench_endpoints``. For
+``--seconds``, ``--writers`` clients then send messages, votes and availability
+syncs as fast as they can, all on behalf of ``--storm-users`` users. Like any
+well-behaved client, they wait out ``Retry-After`` when turned away. At the
+same time ``--readers`` clients load the feed, the user directory, conversation
+lists and study sessions. The report gives p50/p95/p99 read latency and counts
+write responses by status. Rejected writes (429, 503) are the point, not
+errors.
+
+Run it twice from the backend/ directory against a throwaway database, once with
+``--no-admission``, and compare the read tail:
+
+    python benchmarks/bench_write_storm.py --database-url postgresql://localhost/studysync_storm
+    python benchmarks/bench_write_storm.py --database-url postgresql://localhost/studysync_storm --no-admission
+    python benchmarks/bench_write_storm.py --database-url "sqlite:////tmp/storm.db?timeout=60" --fake-redis
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import time
+from collections import Counter
+from datetime import timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+READS = ("feed new", "user directory", "conversations", "sessions")
+
+
+def storm_builders(users):
+    from bench_endpoints import RANGE_START, _busy_slots, _iso
+
+    def send_message(rng):
+        k = rng.randint(1, users)
+        return "POST", f"/messages/{k}", {"params": {"sender_id": k}, "json": {"content": f"storm {rng.random()}"}}
+
+    def vote(rng):
+        return "POST", f"/posts/{rng.randint(1, 50)}/vote", {
+            "params": {"user_uid": f"uid{rng.randrange(users)}", "vote": rng.choice([-1, 0, 1])}
+        }
+
+    def sync_availability(rng):
+        day = RANGE_START + timedelta(days=rng.randrange(7))
+        return "POST", "/availability/sync", {"json": {
+            "user_email": f"user{rng.randrange(users)}@case.edu", "starts_at": _iso(day),
+            "ends_at": _iso(day + timedelta(days=1)), "busy_slots": _busy_slots(rng, day),
+        }}
+
+    return [send_message, send_message, vote, vote, sync_availability]
+
+
+async def storm(app, args):
+    import httpx
+
+    from bench_endpoints import build_scenarios, percentile
+
+    rng = random.Random(args.seed)
+    reads = [build for name, build in build_scenarios(args.scale) if name in READS]
+    writes = storm_builders(args.storm_users)
+    latencies, read_errors, write_statuses = [], Counter(), Counter()
+    deadline = time.perf_counter() + args.seconds
+
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app, client=("10.0.0.1", 1))
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            async def reader():
+                while time.perf_counter() < deadline:
+                    method, url, kwargs = rng.choice(reads)(rng)
+                    t0 = time.perf_counter()
+                    response = await client.request(method, url, **kwargs)
+                    latencies.append((time.perf_counter() - t0) * 1000)
+                    if response.status_code >= 400:
+                        read_errors[response.status_code] += 1
+
+            async def writer():
+                while time.perf_counter() < deadline:
+                    method, url, kwargs = rng.choice(writes)(rng)
+                    response = await client.request(method, url, **kwargs)
+                    write_statuses[response.status_code] += 1
+                    if "retry-after" in response.headers:
+                        await asyncio.sleep(float(response.headers["retry-after"]))
+
+            await asyncio.gather(*(reader() for _ in range(args.readers)), *(writer() for _ in range(args.writers)))
+
+    latencies.sort()
+    print(f"reads:  {len(latencies)} in {args.seconds:.0f} s, p50 {statistics.median(latencies):.2f} ms, "
+          f"p95 {percentile(latencies, 0.95):.2f} ms, p99 {percentile(latencies, 0.99):.2f} ms, "
+          f"errors {dict(read_errors) or 0}")
+    print(f"writes: {sum(write_statuses.values())} sent, by status {dict(sorted(write_statuses.items()))}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--database-url", required=True, help="scratch database; it will be migrated and seeded")
+    parser.add_argument("--scale", type=int, default=1000)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--readers", type=int, default=10)
+    parser.add_argument("--writers", type=int, default=100)
+    parser.add_argument("--storm-users", type=int, default=20)
+    parser.add_argument("--no-admission", action="store_true", help="turn admission control off")
+    parser.add_argument("--fake-redis", action="store_true", help="keep token buckets in fakeredis")
+    parser.add_argument("--seed", type=int, default=393)
+    args = parser.parse_args()
+    os.environ["DATABASE_URL"] = args.database_url
+    os.environ["METRICS_ENABLED"] = "false"
+    os.environ["CACHE_URL"] = "none"
+    os.environ["ADMISSION_ENABLED"] = "false" if args.no_admission else "true"
+
+    from alembic import command
+    from alembic.config import Config
+    from sqlalchemy import text
+
+    import admission
+    import models
+    from check_query_plans import seed
+    from database import SessionLocal, engine
+    from main import app
+
+    if args.fake_redis:
+        import fakeredis
+
+        # The middleware picks up the store when the app builds its stack on the first request
+        admission.token_buckets = admission.RedisTokenBuckets(fakeredis.aioredis.FakeRedis())
+
+    backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    command.upgrade(Config(os.path.join(backend_dir, "alembic.ini")), "head")
+    with SessionLocal() as db:
+        seed(db, models, args.scale, random.Random(args.seed))
+        if engine.dialect.name == "postgresql":
+            db.execute(text("ANALYZE"))
+            db.commit()
+
+    print(f"admission control {'off' if args.no_admission else 'on'}, {engine.dialect.name}, "
+          f"{args.writers} writers for {args.storm_users} users, {args.readers} readers")
+    asyncio.run(storm(app, args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+"""Export one very long conversation and fail if the process grows past an RSS budget.
+
+Migrates a scratch database to head and loads a conversation of ``--messages``
+messages (1M by default) between a few users. A child process then boots the
+app and streams ``GET /messages/{id}/export`` straight through the ASGI
+interface, discarding the body as it arrives. Test clients buffer whole
+responses, so they are not used here. The child compares its peak RSS before
+and after the export and exits non-zero when the export grew it by more than
+``--budget-mb``. It also checks that every message arrived.
+
+Run from the backend/ directory against a throwaway database:
+
+    python benchmarks/check_export_memory.py --database-url postgresql://localhost/studysync_export
+    python benchmarks/check_export_memory.py --database-url sqlite:////tmp/export.db --format csv
+"""
+import argparse
+import asyncio
+import os
+import resource
+import subprocess
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+CONVERSATION_ID = 1
+SMALL_CONVERSATION_ID = 2
+PARTICIPANTS = 5
+
+
+def seed(args):
+    from alembic import command
+    from alembic.config import Config
+    from sqlalchemy import text
+
+    import models
+    from database import engine
+    from generate_fake_data import Loader
+
+    backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    command.upgrade(Config(os.path.join(backend_dir, "alembic.ini")), "head")
+    start = datetime(2026, 1, 5)
+    with engine.connect() as conn:
+        if conn.execute(text("SELECT count(*) FROM messages")).scalar():
+            sys.exit("the scratch database already has messages; use an empty one")
+        loader = Loader(conn, 10000)
+        for u in range(1, PARTICIPANTS + 1):
+            loader.add(models.User.__table__, {
+                "user_id": u, "firebase_uid": f"export{u}", "email": f"export{u}@case.edu",
+                "full_name": f"Export User {u}", "role": "Student", "created_at": start, "updated_at": start,
+            })
+        for c in (CONVERSATION_ID, SMALL_CONVERSATION_ID):
+            loader.add(models.Conversation.__table__, {
+                "conversation_id": c, "is_group": True, "group_name": f"Export {c}", "created_at": start,
+            })
+            for u in range(1, PARTICIPANTS + 1):
+                loader.add(models.ConversationParticipant.__table__, {
+                    "conversation_id": c, "user_id": u, "joined_at": start,
+                })
+        for m in range(args.messages + 100):
+            loader.add(models.Message.__table__, {
+                "conversation_id": CONVERSATION_ID if m < args.messages else SMALL_CONVERSATION_ID,
+                "sender_id": m % PARTICIPANTS + 1,
+                "content": f"Message {m}: shall we go over problem set {m % 12} before the exam?",
+                "created_at": start + timedelta(seconds=m),
+            })
+        loader.flush()
+        if engine.dialect.name == "postgresql":
+            conn.execute(text("ANALYZE"))
+            conn.commit()
+
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+async def export(app, conversation_id, fmt):
+    """Drive one export through the ASGI interface; returns (status, bytes, lines)."""
+    path = f"/messages/{conversation_id}/export"
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET", "scheme": "http",
+        "path": path, "raw_path": path.encode(), "root_path": "", "query_string": f"format={fmt}".encode(),
+        "headers": [(b"host", b"bench")], "client": ("127.0.0.1", 1), "server": ("bench", 80),
+    }
+    requested = False
+    disconnected = asyncio.Event()
+    status, size, lines = None, 0, 0
+
+    async def receive():
+        nonlocal requested
+        if not requested:
+            requested = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        await disconnected.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        nonlocal status, size, lines
+        if message["type"] == "http.response.start":
+            status = message["status"]
+        elif message["type"] == "http.response.body":
+            body = message.get("body", b"")
+            size += len(body)
+            lines += body.count(b"\n")
+            if not message.get("more_body", False):
+                disconnected.set()
+
+    await app(scope, receive, send)
+    return status, size, lines
+
+
+def measure(args):
+    import main
+
+    # Load every code path on a short conversation first, so the baseline includes them
+    asyncio.run(export(main.app, SMALL_CONVERSATION_ID, args.format))
+    before = peak_rss_mb()
+    t0 = time.perf_counter()
+    status, size, lines = asyncio.run(export(main.app, CONVERSATION_ID, args.format))
+    elapsed = time.perf_counter() - t0
+    after = peak_rss_mb()
+
+    # CSV adds a header line
+    expected = args.messages + (1 if args.format == "csv" else 0)
+    print(f"{args.format}: status {status}, {lines} lines, {size / 1e6:.1f} MB in {elapsed:.1f} s "
+          f"({args.messages / elapsed:,.0f} messages/s)")
+    print(f"peak RSS {before:.1f} MB before, {after:.1f} MB after: grew {after - before:.1f} MB "
+          f"(budget {args.budget_mb} MB)")
+    if status != 200 or lines != expected:
+        sys.exit(f"FAILED: expected status 200 and {expected} lines")
+    if after - before > args.budget_mb:
+        sys.exit("FAILED: the export grew the process past its memory budget")
+    print("OK")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--database-url", required=True, help="empty scratch database; it will be migrated and seeded")
+    parser.add_argument("--messages", type=int, default=1_000_000)
+    parser.add_argument("--format", choices=["ndjson", "csv"], default="ndjson")
+    parser.add_argument("--budget-mb", type=float, default=50, help="allowed growth of peak RSS during the export")
+    parser.add_argument("--measure-only", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    os.environ["DATABASE_URL"] = args.database_url
+    os.environ["METRICS_ENABLED"] = "false"
+    os.environ["CACHE_URL"] = "none"
+
+    if args.measure_only:
+        measure(args)
+        return
+    seed(args)
+    # Seeding raises the peak RSS, so measure in a fresh process
+    child = subprocess.run([sys.executable, os.path.abspath(__file__), *sys.argv[1:], "--measure-only"])
+    sys.exit(child.returncode)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,240 @@
+"""Fail if any endpoint query falls back to a sequential scan on seeded data.
+
+Migrates an empty scratch database to head, seeds it, drives the endpoints through
+the app while capturing every SELECT/UPDATE/DELETE they send, then EXPLAINs each
+captured statement with its real parameters. Exits non-zero when a plan scans a
+whole table (``Seq Scan`` on PostgreSQL, a bare ``SCAN <table>`` on SQLite).
+
+Run from the backend/ directory against a throwaway database:
+
+    python benchmarks/check_query_plans.py --database-url postgresql://localhost/studysync_plans
+    python benchmarks/check_query_plans.py --database-url sqlite:////tmp/plans.db
+"""
+import argparse
+import asyncio
+import os
+import random
+import re
+import sys
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Full-table reads that are intended: (route, table, dialect or None for any)
+ALLOWED_SCANS = {
+    ("GET /users?q=", "users", "sqlite"),  # substring search uses pg_trgm indexes, which SQLite lacks
+}
+
+
+def seed(db, models, scale, rng):
+    now = datetime(2026, 1, 5, 8)
+    users = [
+        {"firebase_uid": f"uid{i}", "email": f"user{i}@case.edu", "full_name": f"User {i}", "role": "Student",
+         "created_at": now}
+        for i in range(scale)
+    ]
+    db.execute(models.User.__table__.insert(), users)
+
+    db.execute(models.Conversation.__table__.insert(), [
+        {"conversation_id": c + 1, "is_group": c % 10 == 0, "group_name": None, "created_at": now}
+        for c in range(scale)
+    ])
+    db.execute(models.ConversationParticipant.__table__.insert(), [
+        {"conversation_id": c + 1, "user_id": u + 1, "joined_at": now}
+        for c in range(scale) for u in {c, (c + 1) % scale}
+    ])
+    db.execute(models.Message.__table__.insert(), [
+        {"conversation_id": rng.randint(1, scale), "sender_id": rng.randint(1, scale),
+         "content": "hello", "created_at": now + timedelta(seconds=m)}
+        for m in range(scale * 10)
+    ])
+    db.execute(models.Post.__table__.insert(), [
+        {"id": p + 1, "author_uid": f"uid{rng.randrange(scale)}", "title": f"Post {p}", "score": 0,
+         "created_at": now + timedelta(minutes=p)}
+        for p in range(scale)
+    ])
+    db.execute(models.PostVote.__table__.insert(), [
+        {"post_id": p + 1, "user_uid": f"uid{u}", "vote": 1}
+        for p in range(scale) for u in rng.sample(range(scale), min(3, scale))
+    ])
+    groups = max(scale // 20, 1)
+    db.execute(models.StudyGroup.__table__.insert(), [
+        {"id": g + 1, "name": f"Group {g}", "created_at": now} for g in range(groups)
+    ])
+    db.execute(models.StudyGroupMember.__table__.insert(), [
+        {"group_id": u % groups + 1, "user_email": f"user{u}@case.edu", "joined_at": now} for u in range(scale)
+    ])
+    db.execute(models.StudySession.__table__.insert(), [
+        {"creator_email": f"user{rng.randrange(scale)}@case.edu", "session_type": "group" if s % 4 == 0 else "solo",
+         "title": "Study", "starts_at": now + timedelta(hours=s), "ends_at": now + timedelta(hours=s + 1),
+         "group_id": s % groups + 1 if s % 4 == 0 else None, "created_at": now}
+        for s in range(scale)
+    ])
+    db.execute(models.UserAvailability.__table__.insert(), [
+        {"user_email": f"user{u}@case.edu", "starts_at": now + timedelta(hours=h * 5),
+         "ends_at": now + timedelta(hours=h * 5 + 1), "source": "google_calendar", "created_at": now}
+        for u in range(scale) for h in range(5)
+    ])
+    db.commit()
+
+
+# REQUESTS names ids up to 8; smaller seeds turn their statements into 404s
+MIN_SCALE = 10
+REQUESTS = [
+    ("GET", "/posts", {"params": {"current_user_uid": "uid1", "limit": 20}}),
+    ("GET", "/posts?sort=hot", {"params": {"current_user_uid": "uid1", "sort": "hot", "limit": 20}}),
+    ("GET", "/posts?sort=top", {"params": {"sort": "top", "limit": 20}}),
+    ("POST", "/posts/5/vote", {"params": {"user_uid": "uid2", "vote": 1}}),
+    ("GET", "/search", {"params": {"q": "post 17", "limit": 20}}),
+    ("GET", "/search?type=messages", {"params": {"q": "hello", "type": "messages", "user_id": 4}}),
+    ("GET", "/user/uid3", {}),
+    ("GET", "/users", {"params": {"limit": 20}}),
+    ("GET", "/users?q=", {"params": {"q": "User 1234", "typeahead": True}}),
+    ("GET", "/users?role=", {"params": {"role": "Student", "limit": 20}}),
+    ("GET", "/conversations/4", {}),
+    ("GET", "/inbox/4", {}),
+    ("GET", "/messages/4", {"params": {"limit": 20}}),
+    ("GET", "/messages/4/export", {"params": {"format": "csv"}}),
+    ("POST", "/messages/4", {"params": {"sender_id": 4}, "json": {"content": "hi"}}),
+    ("POST", "/conversations/4/read", {"params": {"user_id": 4}}),
+    ("POST", "/conversations/one-on-one/7/8", {}),
+    ("GET", "/study-groups", {"params": {"user_email": "user5@case.edu"}}),
+    ("POST", "/study-groups/1/join", {"json": {"user_email": "user6@case.edu"}}),
+    ("GET", "/study-groups/1/suggestions",
+     {"params": {"range_start": "2026-01-05T00:00:00Z", "range_end": "2026-01-07T00:00:00Z"}}),
+    ("GET", "/study-groups/suggestions",
+     {"params": {"user_email": "user5@case.edu", "range_start": "2026-01-05T00:00:00Z",
+                 "range_end": "2026-01-07T00:00:00Z"}}),
+    ("GET", "/study-sessions",
+     {"params": {"user_email": "user5@case.edu", "range_start": "2026-01-05T00:00:00Z",
+                 "range_end": "2026-02-05T00:00:00Z"}}),
+    ("GET", "/study-sessions/export", {"params": {"user_email": "user5@case.edu", "format": "ndjson"}}),
+    ("GET", "/study-groups/1/sessions/export", {"params": {"range_start": "2026-01-05T00:00:00Z"}}),
+    ("POST", "/availability/sync",
+     {"json": {"user_email": "user5@case.edu", "starts_at": "2026-01-05T00:00:00Z",
+               "ends_at": "2026-01-06T00:00:00Z", "busy_slots": []}}),
+    ("GET", "/jobs/1", {}),
+]
+
+
+def scanned_tables(dialect, plan_lines, tables):
+    found = set()
+    for line in plan_lines:
+        if dialect == "postgresql":
+            match = re.search(r"Seq Scan on (\w+)", line)
+        else:
+            match = re.search(r"\bSCAN (?:TABLE )?(\w+)(.*)", line)
+            if match and "USING" in match.group(2):
+                match = None
+        if match and match.group(1) in tables:
+            found.add(match.group(1))
+    return found
+
+
+async def explain_async(url, explain, statements):
+    from sqlalchemy.ext.asyncio import create_async_engine
+    from sqlalchemy.pool import NullPool
+
+    async_engine = create_async_engine(url, poolclass=NullPool)
+    plans = []
+    async with async_engine.connect() as conn:
+        for statement, parameters in statements:
+            rows = (await conn.exec_driver_sql(explain + statement, parameters)).all()
+            plans.append([" ".join(str(c) for c in row) for row in rows])
+    await async_engine.dispose()
+    return plans
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--database-url", required=True, help="scratch database; it will be migrated and seeded")
+    parser.add_argument("--scale", type=int, default=2000)
+    args = parser.parse_args()
+    if args.scale < MIN_SCALE:
+        parser.error(f"--scale must be at least {MIN_SCALE}")
+    os.environ["DATABASE_URL"] = args.database_url
+    os.environ["METRICS_ENABLED"] = "false"
+    # Every request must reach the database for its statements to be captured
+    os.environ["CACHE_URL"] = "none"
+    # Queued jobs are run below, so their statements are not mixed into the requests'
+    os.environ["JOB_WORKER_IN_APP"] = "false"
+
+    from alembic import command
+    from alembic.config import Config
+    from fastapi.testclient import TestClient
+    from sqlalchemy import event, text
+
+    import jobs
+    import models
+    from database import AsyncSessionLocal, Base, SessionLocal, async_database_url, async_engine, engine
+    import main as app_module
+
+    backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    command.upgrade(Config(os.path.join(backend_dir, "alembic.ini")), "head")
+    with SessionLocal() as db:
+        seed(db, models, args.scale, random.Random(393))
+        if engine.dialect.name == "postgresql":
+            db.execute(text("ANALYZE"))
+            db.commit()
+
+    captured = []
+    route = None
+
+    def capture_from(kind):
+        def capture(conn, cursor, statement, parameters, context, executemany):
+            verb = statement.lstrip().split(None, 1)[0].upper()
+            if not executemany and verb in ("SELECT", "UPDATE", "DELETE"):
+                captured.append((route, kind, statement, parameters))
+        return capture
+
+    event.listen(engine, "before_cursor_execute", capture_from("sync"))
+    event.listen(async_engine.sync_engine, "before_cursor_execute", capture_from("async"))
+
+    failures = []
+    with TestClient(app_module.app) as client:
+        for method, path, kwargs in REQUESTS:
+            route = f"{method} {path}"
+            response = client.request(method, path, **kwargs)
+            if response.status_code >= 400:
+                failures.append(f"{route}: HTTP {response.status_code}")
+
+        async def run_queued_jobs():
+            async with AsyncSessionLocal() as db:
+                queued = await jobs.claim(db, len(REQUESTS))
+            for job in queued:
+                await jobs.run_job(job)
+            return queued
+
+        route = "worker"
+        for job in client.portal.call(run_queued_jobs):
+            if job.kind not in jobs.HANDLERS:
+                failures.append(f"worker: no handler for {job.kind}")
+
+    explain = "EXPLAIN " if engine.dialect.name == "postgresql" else "EXPLAIN QUERY PLAN "
+    sync_statements = [c for c in captured if c[1] == "sync"]
+    async_statements = [c for c in captured if c[1] == "async"]
+    plans = []
+    with engine.connect() as conn:
+        for _, _, statement, parameters in sync_statements:
+            rows = conn.exec_driver_sql(explain + statement, parameters).all()
+            plans.append([" ".join(str(c) for c in row) for row in rows])
+    plans += asyncio.run(explain_async(
+        async_database_url(args.database_url), explain, [(c[2], c[3]) for c in async_statements]
+    ))
+
+    tables = set(Base.metadata.tables)
+    for (route, _, statement, _), plan in zip(sync_statements + async_statements, plans):
+        for table in scanned_tables(engine.dialect.name, plan, tables):
+            if not {(route, table, None), (route, table, engine.dialect.name)} & ALLOWED_SCANS:
+                failures.append(f"{route}: full scan of {table}\n      {' '.join(statement.split())[:300]}")
+
+    if failures:
+        print("Sequential scans found:")
+        for failure in failures:
+            print(" -", failure)
+        sys.exit(1)
+    print(f"OK: {len(REQUESTS)} endpoints, {len(captured)} statements, no unexpected sequential scans")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""Check read-replica routing against two local databases standing in for a primary and a replica.
+
+Both databases are migrated to head and given the same two users, then nothing
+is replicated between them: the replica behaves like one that lags forever,
+so every read shows where it was routed. The check fails unless:
+- a user's own post is visible to them right after the write (sticky primary);
+- another user, and the writer once ``--sticky-seconds`` have passed, read the
+  replica and do not see it;
+- a replica that cannot be reached is marked down on first use and its reads
+  fall back to a healthy one;
+- with every replica down, reads go to the primary;
+- a health check brings a replica back.
+
+Run from the backend/ directory against two throwaway databases:
+
+    python benchmarks/check_replica_routing.py --database-url postgresql://localhost:5432/studysync_primary \\
+        --replica-url postgresql://localhost:5433/studysync_replica
+    python benchmarks/check_replica_routing.py --database-url sqlite:////tmp/primary.db --replica-url sqlite:////tmp/replica.db
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Connecting to this fails, so it plays a replica that is down
+UNREACHABLE_URL = "sqlite:////nonexistent/studysync/replica.db"
+USERS = [("replica-writer", "writer@case.edu"), ("replica-reader", "reader@case.edu")]
+
+
+def prepare(url):
+    from sqlalchemy import create_engine
+
+    import models
+
+    # env.py migrates the engine database.py built at import, so each database gets its own process
+    backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    subprocess.run(
+        [sys.executable, "-m", "alembic", "upgrade", "head"], cwd=backend_dir,
+        env={**os.environ, "DATABASE_URL": url}, check=True
+    )
+    engine = create_engine(url)
+    with engine.begin() as conn:
+        for uid, email in USERS:
+            if conn.execute(models.User.__table__.select().where(models.User.firebase_uid == uid)).first() is None:
+                conn.execute(models.User.__table__.insert().values(
+                    firebase_uid=uid, email=email, full_name=uid.title(), role="Student",
+                    created_at=datetime(2026, 1, 5), updated_at=datetime(2026, 1, 5),
+                ))
+    engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--database-url", required=True, help="scratch primary; it will be migrated and seeded")
+    parser.add_argument("--replica-url", required=True, help="scratch stand-in replica; it will be migrated and seeded")
+    parser.add_argument("--sticky-seconds", type=float, default=1.0)
+    args = parser.parse_args()
+
+    os.environ["DATABASE_URL"] = args.database_url
+    os.environ["DATABASE_REPLICA_URLS"] = f"{args.replica_url},{UNREACHABLE_URL}"
+    os.environ["REPLICA_STICKY_SECONDS"] = str(args.sticky_seconds)
+    # Only the explicit checks below, not the periodic ones
+    os.environ["REPLICA_HEALTH_SECONDS"] = "3600"
+    os.environ["METRICS_ENABLED"] = "false"
+    os.environ["CACHE_URL"] = "none"
+
+    for url in (args.database_url, args.replica_url):
+        prepare(url)
+
+    from fastapi.testclient import TestClient
+
+    import main as app_module
+    from database import replicas
+
+    (writer, _), (reader, _) = USERS
+    title = f"Replica check {time.time_ns()}"
+    failures = []
+
+    def sees_post(uid):
+        response = client.get("/posts", params={"current_user_uid": uid, "limit": 200})
+        assert response.status_code == 200, response.text
+        return any(post["title"] == title for post in response.json())
+
+    def check(description, ok):
+        print(f"{'ok' if ok else 'FAILED'}: {description}")
+        if not ok:
+            failures.append(description)
+
+    with TestClient(app_module.app) as client:
+        response = client.post("/posts", params={"author_uid": writer}, json={"title": title})
+        assert response.status_code == 200, response.text
+
+        check("the writer sees their post at once", sees_post(writer))
+        # Round-robin reaches the unreachable replica within two reads
+        reader_saw = [sees_post(reader) for _ in range(2)]
+        healthy = [replica.healthy for replica in replicas.replicas]
+        check("the unreachable replica is marked down", healthy == [True, False])
+        check("another user reads the replica and does not see it yet", not any(reader_saw))
+        time.sleep(args.sticky_seconds + 0.2)
+        check("after the sticky window the writer reads the replica", not sees_post(writer))
+
+        replicas.replicas[0].mark(False, "taken down by the check")
+        check("with every replica down, reads go to the primary", sees_post(reader))
+        check("a health check finds the stand-in up and the unreachable one down", replicas.check() == [True, False])
+        check("the recovered replica serves reads again", not sees_post(reader))
+
+    if failures:
+        sys.exit(f"FAILED: {len(failures)} checks")
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
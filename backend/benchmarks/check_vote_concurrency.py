@@ -0,0 +1,116 @@
+"""Fire concurrent votes at a few posts and check no score update was lost.
+
+Every user votes on every post several times with random values, all requests in
+flight at once. Afterwards each ``posts.score`` must equal ``SUM(post_votes.vote)``,
+each ``posts.hot_score`` must match that score, and every user must have at most
+one vote row per post. Exits non-zero otherwise.
+
+Run from the backend/ directory against a scratch database that is at alembic head
+(PostgreSQL exercises the row locks; SQLite serializes writers, so give them a
+generous busy timeout):
+
+    python benchmarks/check_vote_concurrency.py --database-url postgresql://localhost/studysync_votes
+    python benchmarks/check_vote_concurrency.py --database-url 'sqlite:////tmp/votes.db?timeout=60' --buffer-seconds 0.05
+"""
+import argparse
+import asyncio
+import math
+import os
+import random
+import sys
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+async def run(args):
+    import httpx
+    from sqlalchemy import delete, func, insert, select
+
+    import models
+    from database import AsyncSessionLocal
+    from main import app
+    from ranking import hot_score
+    from votes import score_buffer
+
+    created_at = datetime.utcnow()
+    async with AsyncSessionLocal() as db:
+        await db.execute(delete(models.PostVote))
+        await db.execute(delete(models.Post))
+        await db.execute(insert(models.Post), [
+            {"id": p + 1, "author_uid": "author", "title": f"Post {p}", "score": 0,
+             "created_at": created_at, "hot_score": hot_score(0, created_at)}
+            for p in range(args.posts)
+        ])
+        await db.commit()
+
+    rng = random.Random(args.seed)
+    calls = [
+        (post_id, f"uid{u}", rng.choice((-1, 0, 1)))
+        for post_id in range(1, args.posts + 1) for u in range(args.users) for _ in range(args.repeats)
+    ]
+    rng.shuffle(calls)
+
+    score_buffer.start()
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        limit = asyncio.Semaphore(args.concurrency)
+
+        async def vote(post_id, user_uid, value):
+            async with limit:
+                response = await client.post(f"/posts/{post_id}/vote", params={"user_uid": user_uid, "vote": value})
+                return response.status_code
+
+        statuses = await asyncio.gather(*(vote(*call) for call in calls))
+    await score_buffer.stop()
+
+    failures = [f"{statuses.count(code)} requests returned HTTP {code}" for code in set(statuses) if code != 200]
+    async with AsyncSessionLocal() as db:
+        totals = dict((await db.execute(
+            select(models.PostVote.post_id, func.sum(models.PostVote.vote)).group_by(models.PostVote.post_id)
+        )).all())
+        duplicates = (await db.execute(
+            select(models.PostVote.post_id, models.PostVote.user_uid)
+            .group_by(models.PostVote.post_id, models.PostVote.user_uid)
+            .having(func.count() > 1)
+        )).all()
+        posts = (await db.execute(
+            select(models.Post.id, models.Post.score, models.Post.created_at, models.Post.hot_score)
+        )).all()
+        for post_id, score, created_at, hot in posts:
+            if score != totals.get(post_id, 0):
+                failures.append(f"post {post_id}: score {score} != sum of votes {totals.get(post_id, 0)}")
+            # The database computes it, so allow for float rounding
+            elif not math.isclose(hot, hot_score(score, created_at), abs_tol=1e-6):
+                failures.append(f"post {post_id}: hot score {hot} is stale for score {score}")
+    if duplicates:
+        failures.append(f"{len(duplicates)} (post, user) pairs have more than one vote row")
+
+    if failures:
+        print("Vote check failed:")
+        for failure in failures:
+            print(" -", failure)
+        sys.exit(1)
+    print(f"OK: {len(calls)} concurrent votes on {args.posts} posts, every score equals the sum of its votes")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--database-url", required=True, help="scratch database at alembic head; posts are replaced")
+    parser.add_argument("--posts", type=int, default=3)
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--repeats", type=int, default=4, help="votes per user per post")
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--buffer-seconds", type=float, default=0, help="enable buffered score updates")
+    parser.add_argument("--seed", type=int, default=393)
+    args = parser.parse_args()
+    os.environ["DATABASE_URL"] = args.database_url
+    os.environ["VOTE_BUFFER_SECONDS"] = str(args.buffer_seconds)
+    os.environ["METRICS_ENABLED"] = "false"
+    # Check every vote lands, not the rate limits in front of them
+    os.environ["ADMISSION_ENABLED"] = "false"
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+"""Pub/sub brokers used to push new messages to connected WebSocket clients.
+
+``InProcessBroker`` fans out within a single worker. ``RedisBroker`` relays through
+Redis pub/sub so every uvicorn worker sees every message; it accepts any client
+with the ``redis.asyncio`` interface, so a fake such as ``fakeredis.aioredis`` can
+stand in for a server.
+
+Set ``BROKER_URL=redis://host:6379/0`` (requires ``pip install redis``) to use Redis;
+otherwise the in-process broker is used.
+"""
+import asyncio
+import json
+import os
+from collections import defaultdict
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, Iterable, Set, Tuple
+
+Event = Tuple[str, dict]
+
+
+def conversation_channel(conversation_id: int) -> str:
+    return f"conversation:{conversation_id}"
+
+
+def user_channel(firebase_uid: str) -> str:
+    return f"user:{firebase_uid}"
+
+
+class Broker:
+    """Publish JSON-serializable dicts to channels and subscribe to sets of channels."""
+
+    async def publish(self, channel: str, message: dict) -> None:
+        raise NotImplementedError
+
+    def subscribe(self, channels: Iterable[str]):
+        """Async context manager yielding an async iterator of ``(channel, message)``."""
+        raise NotImplementedError
+
+    async def close(self) -> None:
+        pass
+
+
+class InProcessBroker(Broker):
+    def __init__(self, queue_size: int = 1000):
+        self.queue_size = queue_size
+        self._subscribers: Dict[str, Set[asyncio.Queue]] = defaultdict(set)
+
+    async def publish(self, channel: str, message: dict) -> None:
+        for queue in self._subscribers.get(channel, ()):
+            try:
+                queue.put_nowait((channel, message))
+            except asyncio.QueueFull:
+                # A stalled client must not hold up delivery to everyone else;
+                # it can catch up through the history endpoints.
+                pass
+
+    @asynccontextmanager
+    async def subscribe(self, channels: Iterable[str]):
+        channels = list(channels)
+        queue: asyncio.Queue = asyncio.Queue(self.queue_size)
+        for channel in channels:
+            self._subscribers[channel].add(queue)
+        try:
+            yield self._drain(queue)
+        finally:
+            for channel in channels:
+                subscribers = self._subscribers.get(channel)
+                if subscribers is not None:
+                    subscribers.discard(queue)
+                    if not subscribers:
+                        del self._subscribers[channel]
+
+    @staticmethod
+    async def _drain(queue: asyncio.Queue) -> AsyncIterator[Event]:
+        while True:
+            yield await queue.get()
+
+
+class RedisBroker(Broker):
+    """Relays through Redis with one pub/sub connection per worker.
+
+    Local sockets subscribe to an ``InProcessBroker``; the worker subscribes to a
+    Redis channel while at least one local socket is listening on it, and a single
+    reader task hands incoming messages to the local broker.
+    """
+
+    def __init__(self, client, queue_size: int = 1000):
+        self.client = client
+        self._local = InProcessBroker(queue_size)
+        self._listeners: Dict[str, int] = defaultdict(int)
+        self._pubsub = None
+        self._reader = None
+
+    @classmethod
+    def from_url(cls, url: str) -> "RedisBroker":
+        import redis.asyncio as redis
+
+        return cls(redis.from_url(url))
+
+    async def publish(self, channel: str, message: dict) -> None:
+        await self.client.publish(channel, json.dumps(message, default=str))
+
+    @asynccontextmanager
+    async def subscribe(self, channels: Iterable[str]):
+        channels = list(channels)
+        async with self._local.subscribe(channels) as events:
+            new = [c for c in channels if not self._listeners[c]]
+            for channel in channels:
+                self._listeners[channel] += 1
+            try:
+                if new:
+                    if self._pubsub is None:
+                        self._pubsub = self.client.pubsub()
+                    await self._pubsub.subscribe(*new)
+                    if self._reader is None or self._reader.done():
+                        self._reader = asyncio.create_task(self._relay())
+                yield events
+            finally:
+                idle = []
+                for channel in channels:
+                    self._listeners[channel] -= 1
+                    if not self._listeners[channel]:
+                        del self._listeners[channel]
+                        idle.append(channel)
+                if idle and self._pubsub is not None:
+                    await self._pubsub.unsubscribe(*idle)
+
+    async def _relay(self) -> None:
+        async for item in self._pubsub.listen():
+            if item["type"] != "message":
+                continue
+            channel = item["channel"]
+            if isinstance(channel, bytes):
+                channel = channel.decode()
+            await self._local.publish(channel, json.loads(item["data"]))
+
+    async def close(self) -> None:
+        if self._reader is not None:
+            self._reader.cancel()
+            await asyncio.gather(self._reader, return_exceptions=True)
+        if self._pubsub is not None:
+            await self._pubsub.aclose()
+        await self.client.aclose()
+
+
+def create_broker(url: str = None) -> Broker:
+    if url and url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisBroker.from_url(url)
+    return InProcessBroker()
+
+
+broker = create_broker(os.getenv("BROKER_URL"))
@@ -0,0 +1,175 @@
+"""Cached per-user busy bitmaps for scheduling across several groups in one pass.
+
+Time is cut into ``CELL_MINUTES`` cells, grouped into weeks counted from
+``BITMAP_EPOCH``. A user's bitmap for a week has one flag per cell. A flag is
+set when any of the user's busy blocks overlaps the cell, so blocks are rounded
+outward to whole cells.
+
+A bitmap is built from ``UserAvailability`` the first time it is needed. It is
+then kept in the shared response cache (see ``cache``), packed and hex-encoded,
+for ``BUSY_BITMAP_TTL_SECONDS``. A calendar sync deletes the weeks it rewrote.
+
+To suggest slots, the members' bitmaps are stacked into one boolean matrix. A
+prefix sum along the cells marks which members are busy in every candidate
+slot. Each group's availability is then a column sum over its members' rows.
+"""
+import os
+from datetime import datetime, timedelta
+from typing import Dict, Hashable, Iterable, List, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import models
+from cache import cache
+from database import REPLICA_STICKY_SECONDS, on_replica
+from metrics import CACHE_REQUESTS
+from scheduling import Interval
+
+BITMAP_EPOCH = datetime(2025, 1, 6)  # a Monday
+CELL_MINUTES = 15
+CELL = timedelta(minutes=CELL_MINUTES)
+WEEK = timedelta(days=7)
+MAX_RANGE = timedelta(days=62)
+CELLS_PER_WEEK = WEEK // CELL
+BUSY_BITMAP_TTL_SECONDS = float(os.getenv("BUSY_BITMAP_TTL_SECONDS", "900"))
+
+
+def week_of(moment: datetime) -> int:
+    return (moment - BITMAP_EPOCH) // WEEK
+
+
+def bitmap_key(email: str, week: int) -> str:
+    return f"busy:{email}:{week}"
+
+
+def align_range(start: datetime, end: datetime) -> Tuple[datetime, datetime]:
+    """Shrink ``[start, end)`` to whole cells."""
+    first = -((BITMAP_EPOCH - start) // CELL)
+    last = (end - BITMAP_EPOCH) // CELL
+    return BITMAP_EPOCH + first * CELL, BITMAP_EPOCH + max(last, first) * CELL
+
+
+def week_bitmap(blocks: Iterable[Interval], week: int) -> np.ndarray:
+    bits = np.zeros(CELLS_PER_WEEK, dtype=bool)
+    week_start = BITMAP_EPOCH + week * WEEK
+    for starts_at, ends_at in blocks:
+        first = max((starts_at - week_start) // CELL, 0)
+        last = min(-((week_start - ends_at) // CELL), CELLS_PER_WEEK)
+        if first < last:
+            bits[first:last] = True
+    return bits
+
+
+def _pack(bits: np.ndarray) -> str:
+    return np.packbits(bits).tobytes().hex()
+
+
+def _unpack(packed: str) -> np.ndarray:
+    return np.unpackbits(np.frombuffer(bytes.fromhex(packed), dtype=np.uint8), count=CELLS_PER_WEEK).astype(bool)
+
+
+async def busy_matrix(db: AsyncSession, emails: Sequence[str], start: datetime, end: datetime) -> np.ndarray:
+    """One row of busy flags per email for the cells of ``[start, end)``, which must be cell-aligned."""
+    weeks = range(week_of(start), week_of(end - CELL) + 1)
+    keys = [bitmap_key(email, week) for email in emails for week in weeks]
+    packed = await cache.get_many(keys)
+    hits = sum(value is not None for value in packed)
+    CACHE_REQUESTS.inc("busy", "hit", amount=hits)
+    CACHE_REQUESTS.inc("busy", "miss", amount=len(keys) - hits)
+
+    # Anyone missing a week gets all of them rebuilt from one query
+    missing = sorted({emails[i // len(weeks)] for i, value in enumerate(packed) if value is None})
+    built: Dict[str, np.ndarray] = {}
+    if missing:
+        span_start = BITMAP_EPOCH + weeks.start * WEEK
+        span_end = BITMAP_EPOCH + weeks.stop * WEEK
+        rows = (await db.execute(
+            select(
+                models.UserAvailability.user_email,
+                models.UserAvailability.starts_at,
+                models.UserAvailability.ends_at
+            ).where(
+                models.UserAvailability.user_email.in_(missing),
+                models.UserAvailability.starts_at < span_end,
+                models.UserAvailability.ends_at > span_start
+            )
+        )).all()
+        blocks: Dict[str, List[Interval]] = {email: [] for email in missing}
+        for email, starts_at, ends_at in rows:
+            blocks[email].append((starts_at, ends_at))
+        for email in missing:
+            for week in weeks:
+                built[bitmap_key(email, week)] = week_bitmap(blocks[email], week)
+        # A lagging replica's bitmaps must not outlive the window its users read from the primary
+        ttl = REPLICA_STICKY_SECONDS if on_replica(db) else BUSY_BITMAP_TTL_SECONDS
+        await cache.set_many({key: _pack(bits) for key, bits in built.items()}, ttl=ttl)
+
+    matrix = np.empty((len(emails), len(weeks) * CELLS_PER_WEEK), dtype=bool)
+    for i, key in enumerate(keys):
+        row, column = divmod(i, len(weeks))
+        bits = built.get(key)
+        matrix[row, column * CELLS_PER_WEEK:(column + 1) * CELLS_PER_WEEK] = (
+            bits if bits is not None else _unpack(packed[i])
+        )
+    offset = (start - (BITMAP_EPOCH + weeks.start * WEEK)) // CELL
+    return matrix[:, offset:offset + (end - start) // CELL]
+
+
+async def invalidate_busy_bitmaps(email: str, start: datetime, end: datetime) -> None:
+    if end > start:
+        await cache.delete(*(bitmap_key(email, week) for week in range(week_of(start), week_of(end - CELL) + 1)))
+
+
+def suggest_for_groups(
+    busy: np.ndarray,
+    rows_by_group: Dict[Hashable, Sequence[int]],
+    start: datetime,
+    duration_minutes: int = 60,
+    slot_minutes: int = 30,
+    day_start_hour: int = 8,
+    day_end_hour: int = 22,
+    min_available_members: int = 1,
+    limit: int = 50,
+    required_rows: Sequence[int] = (),
+) -> Dict[Hashable, List[dict]]:
+    """Best slots per group, most available members first, earliest first on ties.
+
+    ``busy`` comes from ``busy_matrix`` and ``rows_by_group`` lists each group's
+    rows in it. Durations and steps are whole cells. Slots where any of
+    ``required_rows`` is busy are skipped.
+    """
+    duration_cells = duration_minutes // CELL_MINUTES
+    slot_cells = slot_minutes // CELL_MINUTES
+    members, cells = busy.shape
+    if duration_cells > cells:
+        return {group: [] for group in rows_by_group}
+
+    starts = np.arange(0, cells - duration_cells + 1, slot_cells)
+    prefix = np.zeros((members, cells + 1), dtype=np.int32)
+    np.cumsum(busy, axis=1, out=prefix[:, 1:])
+    busy_in_slot = prefix[:, starts + duration_cells] > prefix[:, starts]
+
+    minute_of_day = (start.hour * 60 + start.minute + starts * CELL_MINUTES) % (24 * 60)
+    eligible = (minute_of_day >= day_start_hour * 60) & (minute_of_day < day_end_hour * 60)
+    if len(required_rows):
+        eligible &= ~busy_in_slot[list(required_rows)].any(axis=0)
+
+    duration = timedelta(minutes=duration_minutes)
+    suggestions = {}
+    for group, rows in rows_by_group.items():
+        total = len(rows)
+        available = total - busy_in_slot[list(rows)].sum(axis=0)
+        candidates = np.flatnonzero(eligible & (available >= min_available_members))
+        best = candidates[np.lexsort((candidates, -available[candidates]))][:limit]
+        suggestions[group] = [
+            {
+                "starts_at": (start + int(starts[i]) * CELL).isoformat(),
+                "ends_at": (start + int(starts[i]) * CELL + duration).isoformat(),
+                "available_members": int(available[i]),
+                "total_members": total
+            }
+            for i in best
+        ]
+    return suggestions
@@ -0,0 +1,195 @@
+"""Read-through cache for the most frequently read GET endpoints.
+
+``MemoryCache`` is a per-worker LRU bounded by entry count, with a TTL on every
+entry. ``RedisCache`` shares entries between workers; like ``RedisBroker`` it
+accepts any client with the ``redis.asyncio`` interface, so a fake such as
+``fakeredis.aioredis`` can stand in for a server.
+
+Writes invalidate the keys they affect right after they commit. Lists whose
+contents shift with every write (the posts feed) are keyed under a generation
+that writes replace instead, so their many pages never have to be enumerated.
+The TTL bounds how long a value read just before a concurrent write can survive.
+
+Set ``CACHE_URL=redis://host:6379/1`` (requires ``pip install redis``) to use
+Redis, or ``CACHE_URL=none`` to turn caching off; otherwise the in-process cache
+is used. ``CACHE_TTL_SECONDS`` (default 60) and ``CACHE_MAX_ENTRIES`` (default
+10000, in-process only) tune it. Hits and misses are counted per key prefix in
+``cache_requests_total`` on ``/metrics``.
+"""
+import json
+import os
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from fastapi.encoders import jsonable_encoder
+
+from metrics import CACHE_REQUESTS
+
+CACHE_TTL_SECONDS = float(os.getenv("CACHE_TTL_SECONDS", "60"))
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "10000"))
+
+FEED_NAMESPACE = "posts"
+
+
+def user_profile_key(firebase_uid: str) -> str:
+    return f"user:{firebase_uid}"
+
+
+def study_groups_key(user_email: str) -> str:
+    return f"study-groups:{user_email}"
+
+
+def conversations_key(user_id: int) -> str:
+    return f"conversations:{user_id}"
+
+
+class Cache:
+    """Store JSON-compatible values under string keys for at most ``ttl`` seconds."""
+
+    def __init__(self, ttl: float = CACHE_TTL_SECONDS):
+        self.ttl = ttl
+
+    async def get(self, key: str) -> Optional[Any]:
+        raise NotImplementedError
+
+    async def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        raise NotImplementedError
+
+    async def delete(self, *keys: str) -> None:
+        raise NotImplementedError
+
+    async def get_many(self, keys: List[str]) -> List[Optional[Any]]:
+        return [await self.get(key) for key in keys]
+
+    async def set_many(self, values: Dict[str, Any], ttl: Optional[float] = None) -> None:
+        for key, value in values.items():
+            await self.set(key, value, ttl)
+
+    async def close(self) -> None:
+        pass
+
+    async def read_through(self, key: str, load: Callable[[], Awaitable[Any]], ttl: Optional[float] = None) -> Any:
+        """Return the cached value for ``key``, or await ``load()`` and cache its result for ``ttl``.
+
+        Exceptions from ``load`` (such as a 404) propagate and are not cached.
+        """
+        namespace = key.split(":", 1)[0]
+        value = await self.get(key)
+        if value is not None:
+            CACHE_REQUESTS.inc(namespace, "hit")
+            return value
+        CACHE_REQUESTS.inc(namespace, "miss")
+        value = jsonable_encoder(await load())
+        await self.set(key, value, ttl)
+        return value
+
+    async def generation(self, namespace: str) -> str:
+        """Current generation of ``namespace``, to embed in the keys of its entries."""
+        key = f"generation:{namespace}"
+        value = await self.get(key)
+        if value is None:
+            # A lost generation is replaced by a new one, which only orphans old entries
+            value = uuid.uuid4().hex
+            await self.set(key, value, ttl=0)
+        return value
+
+    async def invalidate_namespace(self, namespace: str) -> None:
+        await self.set(f"generation:{namespace}", uuid.uuid4().hex, ttl=0)
+
+
+class NullCache(Cache):
+    async def get(self, key: str) -> Optional[Any]:
+        return None
+
+    async def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        pass
+
+    async def delete(self, *keys: str) -> None:
+        pass
+
+
+class MemoryCache(Cache):
+    """LRU of at most ``max_entries``; a ``ttl`` of 0 keeps an entry until it is evicted."""
+
+    def __init__(self, ttl: float = CACHE_TTL_SECONDS, max_entries: int = CACHE_MAX_ENTRIES):
+        super().__init__(ttl)
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+
+    async def get(self, key: str) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at and expires_at < time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    async def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        ttl = self.ttl if ttl is None else ttl
+        self._entries[key] = (time.monotonic() + ttl if ttl else 0, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def delete(self, *keys: str) -> None:
+        for key in keys:
+            self._entries.pop(key, None)
+
+
+class RedisCache(Cache):
+    """Values are stored as JSON under ``prefix``; a ``ttl`` of 0 sets no expiry."""
+
+    def __init__(self, client, ttl: float = CACHE_TTL_SECONDS, prefix: str = "cache:"):
+        super().__init__(ttl)
+        self.client = client
+        self.prefix = prefix
+
+    @classmethod
+    def from_url(cls, url: str) -> "RedisCache":
+        import redis.asyncio as redis
+
+        return cls(redis.from_url(url))
+
+    async def get(self, key: str) -> Optional[Any]:
+        raw = await self.client.get(self.prefix + key)
+        return None if raw is None else json.loads(raw)
+
+    async def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        ttl = self.ttl if ttl is None else ttl
+        await self.client.set(self.prefix + key, json.dumps(value), px=int(ttl * 1000) or None)
+
+    async def delete(self, *keys: str) -> None:
+        if keys:
+            await self.client.delete(*(self.prefix + key for key in keys))
+
+    async def get_many(self, keys: List[str]) -> List[Optional[Any]]:
+        if not keys:
+            return []
+        raw = await self.client.mget([self.prefix + key for key in keys])
+        return [None if value is None else json.loads(value) for value in raw]
+
+    async def set_many(self, values: Dict[str, Any], ttl: Optional[float] = None) -> None:
+        ttl = self.ttl if ttl is None else ttl
+        async with self.client.pipeline(transaction=False) as pipe:
+            for key, value in values.items():
+                pipe.set(self.prefix + key, json.dumps(value), px=int(ttl * 1000) or None)
+            await pipe.execute()
+
+    async def close(self) -> None:
+        await self.client.aclose()
+
+
+def create_cache(url: str = None) -> Cache:
+    if url and url.lower() in ("none", "off", "false", "0"):
+        return NullCache()
+    if url and url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisCache.from_url(url)
+    return MemoryCache()
+
+
+cache = create_cache(os.getenv("CACHE_URL"))
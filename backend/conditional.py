@@ -0,0 +1,75 @@
+"""Conditional GET support for the list endpoints.
+
+Each endpoint derives a validator from a cheap index-only query (a ``max()`` of
+row versions or timestamps) plus its own query parameters, *before* loading the
+page. ``not_modified`` sets ``ETag``/``Last-Modified`` and returns a bare 304 when
+the client's ``If-None-Match`` (or, without one, ``If-Modified-Since``) still
+matches, so the page is neither queried nor serialized. No endpoint deletes these
+rows, so the maxima only grow; the one gap is a transaction that commits after a
+later-stamped one, which shows up with the next write.
+
+ETags are strong. ``compression`` appends the content coding to the tag of a
+compressed body (``"<tag>-gzip"``) so each representation keeps its own
+validator; comparison here ignores that suffix, and a 304 echoes the tag the
+client sent so it carries the same suffix as the 200 the client holds.
+"""
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Optional
+
+from fastapi import Request, Response
+
+CACHE_CONTROL = "private, no-cache"
+
+
+def make_etag(*parts) -> str:
+    digest = hashlib.blake2b(repr(parts).encode(), digest_size=16).hexdigest()
+    return f'"{digest}"'
+
+
+def _opaque_tag(tag: str) -> str:
+    tag = tag.strip()
+    if tag.startswith("W/"):
+        tag = tag[2:]
+    return tag.strip('"').split("-", 1)[0]
+
+
+def _latest(*timestamps: Optional[datetime]) -> Optional[datetime]:
+    present = [t for t in timestamps if t is not None]
+    return max(present) if present else None
+
+
+def not_modified(
+    request: Request, response: Response, etag: str, *last_modified: Optional[datetime]
+) -> Optional[Response]:
+    """Set the validators on ``response``; return a 304 to send instead if the client is current.
+
+    ``last_modified`` are naive UTC timestamps; the latest one is used.
+    """
+    headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL}
+    modified = _latest(*last_modified)
+    if modified is not None:
+        modified = modified.replace(tzinfo=timezone.utc, microsecond=0)
+        headers["Last-Modified"] = format_datetime(modified, usegmt=True)
+    response.headers.update(headers)
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        if if_none_match.strip() == "*":
+            return Response(status_code=304, headers=headers)
+        current = _opaque_tag(etag)
+        for tag in if_none_match.split(","):
+            if _opaque_tag(tag) == current:
+                return Response(status_code=304, headers={**headers, "ETag": tag.strip()})
+        return None
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and modified is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return None
+        if since.tzinfo is not None and modified <= since:
+            return Response(status_code=304, headers=headers)
+    return None
@@ -1,23 +1,333 @@
 # database.py
+import asyncio
+import itertools
+import json
+import logging
 import os
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Set
+from urllib.parse import parse_qsl
+
 from dotenv import load_dotenv
-from sqlalchemy import create_engine
+from fastapi import Request
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
 
 # Load variables from .env
 load_dotenv()
 
+# Reads METRICS_ENABLED, so import after .env is loaded
+from metrics import METRICS_ENABLED, instrument_engine
+
 # Use the environment variable, or a fallback if it's missing
 SQLALCHEMY_DATABASE_URL = os.getenv("DATABASE_URL")
 
-engine = create_engine(SQLALCHEMY_DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# Async driver for each sync URL scheme we support
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "postgresql+psycopg2": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+
+def async_database_url(url):
+    scheme, sep, rest = url.partition("://")
+    return ASYNC_DRIVERS.get(scheme, scheme) + sep + rest
+
+
+def pool_options(url):
+    """Connection pool settings, tunable via DB_POOL_* environment variables."""
+    options = {
+        "pool_pre_ping": os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes"),
+        "pool_recycle": int(os.getenv("DB_POOL_RECYCLE", "1800")),
+    }
+    # SQLite uses single-connection pools that take no size arguments
+    if not url.startswith("sqlite"):
+        options["pool_size"] = int(os.getenv("DB_POOL_SIZE", "5"))
+        options["max_overflow"] = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+        options["pool_timeout"] = int(os.getenv("DB_POOL_TIMEOUT", "30"))
+    return options
+
+
+# Engines and their pools are created on first use, not at import: importing the
+# app stays cheap, and a server that forks workers after importing it (gunicorn
+# --preload) gives each worker its own connections. The app's lifespan calls
+# init_engines; scripts can simply use database.engine or database.SessionLocal.
+LAZY_ATTRIBUTES = ("engine", "async_engine", "SessionLocal", "AsyncSessionLocal")
+_init_lock = threading.Lock()
+
+
+def init_engines():
+    """Create the primary's engines and session factories, and the replicas', unless already done."""
+    global engine, async_engine, SessionLocal, AsyncSessionLocal
+    with _init_lock:
+        if "AsyncSessionLocal" not in globals():
+            if not SQLALCHEMY_DATABASE_URL:
+                raise RuntimeError("DATABASE_URL is not set")
+            engine = create_engine(SQLALCHEMY_DATABASE_URL, **pool_options(SQLALCHEMY_DATABASE_URL))
+            async_engine = create_async_engine(
+                async_database_url(SQLALCHEMY_DATABASE_URL), **pool_options(SQLALCHEMY_DATABASE_URL)
+            )
+            if METRICS_ENABLED:
+                instrument_engine(engine)
+                instrument_engine(async_engine.sync_engine)
+            replicas.open()
+            SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+            AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+    return engine, async_engine
+
+
+async def dispose_engines():
+    """Close every pooled connection; the engines stay usable and reconnect on demand."""
+    if "AsyncSessionLocal" in globals():
+        engine.dispose()
+        await async_engine.dispose()
+        await replicas.dispose()
+
+
+def __getattr__(name):
+    if name in LAZY_ATTRIBUTES:
+        init_engines()
+        return globals()[name]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
 Base = declarative_base()
 
 def get_db():
+    init_engines()
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
-        
\ No newline at end of file
+
+
+async def get_async_db():
+    init_engines()
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+# Read replicas
+#
+# DATABASE_REPLICA_URLS is a comma-separated list of replicas of the primary.
+# Read-only endpoints take their session from get_read_db/get_async_read_db,
+# which hand out replicas round-robin. A replica that fails to connect, or that
+# a health check finds down or more than REPLICA_MAX_LAG_SECONDS behind, is
+# skipped until a later check passes; with none left, reads use the primary.
+#
+# A user who wrote within the last REPLICA_STICKY_SECONDS reads from the primary,
+# so they see their own write before the replicas do. Users are recognised by
+# the ids, uids and emails in a request's path, query and JSON body.
+
+logger = logging.getLogger(__name__)
+
+REPLICA_URLS = [url.strip() for url in os.getenv("DATABASE_REPLICA_URLS", "").split(",") if url.strip()]
+REPLICA_STICKY_SECONDS = float(os.getenv("REPLICA_STICKY_SECONDS", "5"))
+REPLICA_HEALTH_SECONDS = float(os.getenv("REPLICA_HEALTH_SECONDS", "10"))
+REPLICA_MAX_LAG_SECONDS = float(os.getenv("REPLICA_MAX_LAG_SECONDS", "30"))
+
+# Request parameter -> kind of user identity it holds
+USER_PARAMS = {
+    "user_id": "id", "user_id_1": "id", "user_id_2": "id", "sender_id": "id",
+    "firebase_uid": "uid", "user_uid": "uid", "author_uid": "uid", "current_user_uid": "uid", "sender_uid": "uid",
+    "user_email": "email", "creator_email": "email", "email": "email",
+}
+MAX_SCANNED_BODY = 64 * 1024
+
+# Zero while a standby has replayed everything it received
+REPLICA_LAG_SQL = """
+    SELECT CASE WHEN NOT pg_is_in_recovery() OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+    ELSE coalesce(extract(epoch FROM now() - pg_last_xact_replay_timestamp()), 0) END
+"""
+
+
+class Replica:
+    def __init__(self, url: str):
+        self.url = url
+        self.engine = create_engine(url, **pool_options(url))
+        self.async_engine = create_async_engine(async_database_url(url), **pool_options(url))
+        info = {"replica": url}
+        self.session = sessionmaker(autocommit=False, autoflush=False, bind=self.engine, info=info)
+        self.async_session = async_sessionmaker(
+            self.async_engine, autoflush=False, expire_on_commit=False, info=info
+        )
+        self.healthy = True
+        if METRICS_ENABLED:
+            instrument_engine(self.engine)
+            instrument_engine(self.async_engine.sync_engine)
+
+    def check(self) -> bool:
+        try:
+            with self.engine.connect() as conn:
+                lag = conn.execute(text(REPLICA_LAG_SQL if conn.dialect.name == "postgresql" else "SELECT 0")).scalar()
+        except DBAPIError as e:
+            self.mark(False, f"unreachable: {e}")
+            return False
+        self.mark(lag <= REPLICA_MAX_LAG_SECONDS, f"{lag:.1f} s behind")
+        return self.healthy
+
+    def mark(self, healthy: bool, reason: str) -> None:
+        if healthy != self.healthy:
+            logger.warning("Replica %s is %s (%s)", self.engine.url.render_as_string(), "back" if healthy else "down", reason)
+        self.healthy = healthy
+
+
+class ReplicaSet:
+    """Round-robin over the healthy replicas."""
+
+    def __init__(self, urls: List[str]):
+        self.urls = urls
+        self.replicas: List[Replica] = []
+        self._turn = itertools.count()
+
+    def open(self) -> None:
+        """Create the replicas' engines; until then there are none to read from."""
+        if not self.replicas:
+            self.replicas = [Replica(url) for url in self.urls]
+
+    async def dispose(self) -> None:
+        for replica in self.replicas:
+            replica.engine.dispose()
+            await replica.async_engine.dispose()
+
+    def __bool__(self) -> bool:
+        return bool(self.replicas)
+
+    def choose(self) -> Optional[Replica]:
+        healthy = [replica for replica in self.replicas if replica.healthy]
+        return healthy[next(self._turn) % len(healthy)] if healthy else None
+
+    def check(self) -> List[bool]:
+        return [replica.check() for replica in self.replicas]
+
+    async def check_periodically(self, interval: float = REPLICA_HEALTH_SECONDS) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            await run_in_threadpool(self.check)
+
+
+class RecentWriters:
+    """User identities that wrote in the last ``window`` seconds, kept per worker."""
+
+    def __init__(self, window: float = REPLICA_STICKY_SECONDS):
+        self.window = window
+        self._until: Dict[str, float] = {}
+
+    def mark(self, identities: Iterable[str]) -> None:
+        now = time.monotonic()
+        if len(self._until) > 10000:
+            self._until = {key: until for key, until in self._until.items() if until > now}
+        for identity in identities:
+            self._until[identity] = now + self.window
+
+    def wrote_recently(self, identities: Iterable[str]) -> bool:
+        now = time.monotonic()
+        return any(self._until.get(identity, 0) > now for identity in identities)
+
+
+replicas = ReplicaSet(REPLICA_URLS)
+recent_writers = RecentWriters()
+
+
+def user_identities(*sources: Dict) -> Set[str]:
+    identities = set()
+    for source in sources:
+        for name, value in source.items():
+            kind = USER_PARAMS.get(name)
+            if kind and isinstance(value, (str, int)) and not isinstance(value, bool):
+                identities.add(f"{kind}:{str(value).lower() if kind == 'email' else value}")
+    return identities
+
+
+def on_replica(db) -> bool:
+    """Whether ``db`` (sync or async) reads from a replica, and so may lag the primary."""
+    return "replica" in db.info
+
+
+def _use_replicas(request: Request) -> bool:
+    return bool(replicas) and not recent_writers.wrote_recently(
+        user_identities(request.path_params, request.query_params)
+    )
+
+
+def get_read_db(request: Request):
+    init_engines()
+    db = None
+    # Each failed connect marks its replica down, so this tries every replica at most once
+    while db is None and _use_replicas(request) and (replica := replicas.choose()):
+        db = replica.session()
+        try:
+            db.connection()
+        except DBAPIError as e:
+            db.close()
+            db = None
+            replica.mark(False, f"connect failed: {e}")
+    db = db or SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+async def get_async_read_db(request: Request):
+    init_engines()
+    db = None
+    while db is None and _use_replicas(request) and (replica := replicas.choose()):
+        db = replica.async_session()
+        try:
+            await db.connection()
+        except (DBAPIError, OSError) as e:
+            await db.close()
+            db = None
+            replica.mark(False, f"connect failed: {e}")
+    async with db or AsyncSessionLocal() as db:
+        yield db
+
+
+class ReadYourWritesMiddleware:
+    """Marks the users named by a successful write, so their next reads go to the primary."""
+
+    UNSAFE_METHODS = {"POST", "PUT", "PATCH", "DELETE"}
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] not in self.UNSAFE_METHODS or not replicas:
+            await self.app(scope, receive, send)
+            return
+
+        body = bytearray()
+        status = 500
+
+        async def receive_wrapper():
+            message = await receive()
+            if message["type"] == "http.request" and len(body) <= MAX_SCANNED_BODY:
+                body.extend(message.get("body", b""))
+            return message
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        await self.app(scope, receive_wrapper, send_wrapper)
+        if status >= 400:
+            return
+        # The router has filled in path_params by now
+        sources = [scope.get("path_params", {}), dict(parse_qsl(scope["query_string"].decode("latin-1")))]
+        if body and len(body) <= MAX_SCANNED_BODY:
+            try:
+                payload = json.loads(body)
+            except ValueError:
+                payload = None
+            if isinstance(payload, dict):
+                sources.append(payload)
+        recent_writers.mark(user_identities(*sources))
@@ -0,0 +1,122 @@
+"""Streaming exports: iCalendar feeds, NDJSON and CSV.
+
+Rows are read through a server-side cursor (``yield_per``), so memory stays flat
+however large the export is, and each batch of ``EXPORT_BATCH_SIZE`` rows goes
+out as one chunk of the response body. The export runs on a session of its own,
+so its connection is held only while the body streams. Anything a batch refers
+to (such as sender names) is looked up per batch by a ``lookup`` callback on the
+same session, never joined or collected up front.
+"""
+import csv
+import io
+import json
+import os
+from datetime import datetime
+from typing import Callable, Iterable, Iterator, Optional, Sequence
+
+import database
+
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "500"))
+ICS_MEDIA_TYPE = "text/calendar; charset=utf-8"
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+CSV_MEDIA_TYPE = "text/csv; charset=utf-8"
+
+
+def stream_rows(statement, lookup: Optional[Callable] = None, first: Iterable[Sequence] = ()) -> Iterator[Sequence]:
+    """Yield the rows of ``statement`` in batches, each passed through ``lookup(db, rows)`` if given.
+
+    Batches from ``first`` (such as archived rows) are yielded ahead of the statement's.
+    """
+    with database.SessionLocal() as db:
+        for rows in first:
+            yield rows if lookup is None else lookup(db, rows)
+        result = db.execute(statement.execution_options(yield_per=EXPORT_BATCH_SIZE))
+        for rows in result.partitions():
+            yield rows if lookup is None else lookup(db, rows)
+
+
+def _as_dict(row) -> dict:
+    return row if isinstance(row, dict) else row._asdict()
+
+
+def ndjson(batches: Iterable[Sequence]) -> Iterator[str]:
+    """One JSON object per row, keyed by column name; datetimes in ISO 8601."""
+    for rows in batches:
+        yield "".join(json.dumps(_as_dict(row), default=datetime.isoformat) + "\n" for row in rows)
+
+
+def _csv_value(value):
+    if value is None:
+        return ""
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def csv_rows(columns: Sequence[str], batches: Iterable[Sequence]) -> Iterator[str]:
+    """A header line of ``columns``, then one CSV line per row; datetimes in ISO 8601."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    yield buffer.getvalue()
+    for rows in batches:
+        buffer.seek(0)
+        buffer.truncate()
+        for row in rows:
+            record = _as_dict(row)
+            writer.writerow([_csv_value(record[column]) for column in columns])
+        yield buffer.getvalue()
+
+
+def _ics_text(value: str) -> str:
+    return (
+        value.replace("\\", "\\\\").replace(";", "\\;").replace(",", "\\,")
+        .replace("\r\n", "\\n").replace("\n", "\\n")
+    )
+
+
+def _ics_time(moment: datetime) -> str:
+    return moment.strftime("%Y%m%dT%H%M%SZ")
+
+
+def _fold(line: str) -> str:
+    """End ``line`` with CRLF, folded into lines of at most 75 octets (RFC 5545, 3.1)."""
+    data = line.encode()
+    chunks, limit = [], 75
+    while len(data) > limit:
+        cut = limit
+        while data[cut] & 0xC0 == 0x80:  # never split a UTF-8 sequence
+            cut -= 1
+        chunks.append(data[:cut])
+        data = data[cut:]
+        limit = 74  # continuation lines start with a space
+    chunks.append(data)
+    return b"\r\n ".join(chunks).decode() + "\r\n"
+
+
+def _ics_event(session) -> str:
+    lines = [
+        "BEGIN:VEVENT",
+        f"UID:study-session-{session.id}@studysync",
+        f"DTSTAMP:{_ics_time(session.created_at or session.starts_at)}",
+        f"DTSTART:{_ics_time(session.starts_at)}",
+        f"DTEND:{_ics_time(session.ends_at)}",
+        f"SUMMARY:{_ics_text(session.title)}",
+        f"CATEGORIES:{_ics_text(session.session_type or 'solo')}",
+        f"ORGANIZER:mailto:{session.creator_email}",
+        "END:VEVENT",
+    ]
+    return "".join(_fold(line) for line in lines)
+
+
+def ics_feed(name: str, batches: Iterable[Sequence]) -> Iterator[str]:
+    """An iCalendar feed of study sessions, whose times are naive UTC."""
+    yield "".join(_fold(line) for line in (
+        "BEGIN:VCALENDAR",
+        "VERSION:2.0",
+        "PRODID:-//StudySync//Study Sessions//EN",
+        "CALSCALE:GREGORIAN",
+        "METHOD:PUBLISH",
+        f"X-WR-CALNAME:{_ics_text(name)}",
+    ))
+    for sessions in batches:
+        yield "".join(_ics_event(session) for session in sessions)
+    yield "END:VCALENDAR\r\n"
@@ -0,0 +1,305 @@
+"""Bulk-load deterministic fake data at production-like volumes.
+
+Every table the app reads is filled with plausible skew:
+- a few very active users;
+- mostly one-on-one conversations with exponential message counts;
+- heavy-tailed post votes;
+- users in several study groups, each with sessions and busy blocks.
+
+The same ``--seed`` and volumes always produce the same rows. Each table draws
+from its own random stream, so changing one volume leaves the others alone.
+
+Rows are generated lazily and written in ``--batch-size`` batches:
+- PostgreSQL (psycopg2) uses COPY;
+- other databases use multi-row INSERTs.
+
+Memory stays bounded whatever the volumes. The target database is migrated to
+head first and must not contain users yet.
+
+Run from the backend/ directory (DATABASE_URL comes from .env unless given):
+
+    python generate_fake_data.py
+    python generate_fake_data.py --database-url sqlite:////tmp/scale.db --users 10000 --messages 100000
+"""
+import argparse
+import csv
+import hashlib
+import io
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+FIRST_NAMES = [
+    "Alice", "Bob", "Charlie", "Diana", "Eve", "Farah", "Gabriel", "Hana", "Ibrahim", "Jia", "Kofi", "Lena",
+    "Mateo", "Nadia", "Oscar", "Priya", "Quinn", "Rosa", "Samir", "Tara", "Uma", "Victor", "Wei", "Ximena",
+    "Yusuf", "Zoe",
+]
+LAST_NAMES = [
+    "Johnson", "Smith", "Brown", "Prince", "Wilson", "Garcia", "Nguyen", "Patel", "Kim", "Okafor", "Martinez",
+    "Cohen", "Rossi", "Silva", "Tanaka", "Novak", "Ahmed", "Schmidt", "Kowalski", "Murphy",
+]
+COURSES = ["CSDS 393", "CSDS 233", "CSDS 302", "MATH 223", "PHYS 122", "CHEM 105", "STAT 312", "ECON 102"]
+WORDS = (
+    "exam midterm final homework lecture notes quiz project deadline group meeting library review question "
+    "answer proof graph tree recursion lab report office hours slides chapter problem set study tonight "
+    "tomorrow week thanks help anyone know how when where practice solution tutorial recording syllabus "
+    "grade curve partner draft submit code bug test database query index schema"
+).split()
+ROLES = [("Student", 0.9), ("TA", 0.08), ("Admin", 0.02)]
+
+# Tables whose ids are generated here, so their sequences must be moved past them
+EXPLICIT_IDS = {
+    "users": "user_id", "study_groups": "id", "posts": "id",
+    "conversations": "conversation_id", "messages": "message_id",
+}
+
+
+def stream(seed, name):
+    """Independent deterministic random stream for one table."""
+    return random.Random(f"{seed}:{name}")
+
+
+def skewed(rng, n, power=2.5):
+    """Index in 1..n where low indexes are far more likely (a few very active users)."""
+    return int(n * rng.random() ** power) + 1
+
+
+def sentence(rng, low, high):
+    return " ".join(rng.choices(WORDS, k=rng.randint(low, high)))
+
+
+def person(seed, user_id):
+    """(firebase_uid, email, full_name) of a generated user, computed without storing it."""
+    digest = hashlib.blake2b(f"{seed}:{user_id}".encode(), digest_size=21).hexdigest()
+    first = FIRST_NAMES[int(digest[:4], 16) % len(FIRST_NAMES)]
+    last = LAST_NAMES[int(digest[4:8], 16) % len(LAST_NAMES)]
+    return digest[:28], f"{first.lower()}.{last.lower()}{user_id}@case.edu", f"{first} {last}"
+
+
+class Loader:
+    """Buffers rows per table and writes every buffer, in first-seen order, when one fills up.
+
+    Parents are always generated before their children, so flushing in first-seen
+    order keeps foreign keys satisfied.
+    """
+
+    def __init__(self, conn, batch_size):
+        self.conn = conn
+        self.batch_size = batch_size
+        self.copy = conn.dialect.name == "postgresql" and conn.dialect.driver == "psycopg2"
+        self.buffers = {}
+        self.counts = {}
+
+    def add(self, table, row):
+        buffer = self.buffers.setdefault(table, [])
+        buffer.append(row)
+        if len(buffer) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        for table, rows in self.buffers.items():
+            if rows:
+                self._write(table, rows)
+                self.counts[table] = self.counts.get(table, 0) + len(rows)
+                rows.clear()
+        self.conn.commit()
+
+    def _write(self, table, rows):
+        columns = list(rows[0])
+        if not self.copy:
+            self.conn.execute(table.insert(), rows)
+            return
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for row in rows:
+            writer.writerow(["\\N" if row[c] is None else row[c] for c in columns])
+        buffer.seek(0)
+        cursor = self.conn.connection.dbapi_connection.cursor()
+        cursor.copy_expert(
+            f"COPY {table.name} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv, NULL '\\N')", buffer
+        )
+
+
+def generate_users(loader, models, args):
+    rng = stream(args.seed, "users")
+    roles, weights = zip(*ROLES)
+    for user_id in range(1, args.users + 1):
+        firebase_uid, email, full_name = person(args.seed, user_id)
+        created_at = args.now - timedelta(days=rng.uniform(30, 730))
+        loader.add(models.User.__table__, {
+            "user_id": user_id, "firebase_uid": firebase_uid, "email": email, "full_name": full_name,
+            "role": rng.choices(roles, weights)[0], "google_calendar_token": None,
+            "created_at": created_at, "updated_at": created_at,
+        })
+
+
+def generate_groups(loader, models, args):
+    rng = stream(args.seed, "study_groups")
+    for group_id in range(1, args.groups + 1):
+        loader.add(models.StudyGroup.__table__, {
+            "id": group_id, "name": f"{rng.choice(COURSES)} study group {group_id}",
+            "created_at": args.now - timedelta(days=rng.uniform(1, 365)),
+        })
+
+
+def generate_calendars(loader, models, args):
+    """Group memberships, study sessions and busy blocks, one user at a time."""
+    rng = stream(args.seed, "calendars")
+    window_start = args.now - timedelta(days=28)
+    for user_id in range(1, args.users + 1):
+        email = person(args.seed, user_id)[1]
+        groups = set()
+        for _ in range(min(int(rng.expovariate(1 / args.groups_per_user)), args.groups)):
+            groups.add(skewed(rng, args.groups, power=1.5))
+        for group_id in sorted(groups):
+            loader.add(models.StudyGroupMember.__table__, {
+                "group_id": group_id, "user_email": email,
+                "joined_at": args.now - timedelta(days=rng.uniform(0, 180)),
+            })
+
+        for _ in range(int(rng.expovariate(1 / args.sessions_per_user))):
+            starts_at = window_start + timedelta(hours=rng.randrange(24 * 56))
+            group_id = rng.choice(sorted(groups)) if groups and rng.random() < 0.4 else None
+            loader.add(models.StudySession.__table__, {
+                "creator_email": email, "session_type": "group" if group_id else "solo",
+                "title": f"{rng.choice(COURSES)} {rng.choice(['review', 'homework', 'exam prep', 'project'])}",
+                "starts_at": starts_at, "ends_at": starts_at + timedelta(minutes=rng.choice([30, 60, 90, 120])),
+                "group_id": group_id, "created_at": starts_at - timedelta(days=rng.uniform(0, 14)),
+            })
+
+        # Non-overlapping blocks spread over the four weeks before --now
+        starts_at = window_start
+        for _ in range(args.busy_blocks_per_user):
+            starts_at += timedelta(hours=rng.uniform(1, 24 * 28 * 2 / max(args.busy_blocks_per_user, 1)))
+            starts_at = starts_at.replace(minute=rng.choice([0, 30]), second=0, microsecond=0)
+            ends_at = starts_at + timedelta(minutes=rng.choice([30, 60, 90, 120, 180]))
+            loader.add(models.UserAvailability.__table__, {
+                "user_email": email, "starts_at": starts_at, "ends_at": ends_at,
+                "source": "google_calendar", "created_at": args.now,
+            })
+            starts_at = ends_at
+
+
+def generate_posts(loader, models, args):
+    from ranking import hot_score
+
+    rng = stream(args.seed, "posts")
+    for post_id in range(1, args.posts + 1):
+        created_at = args.now - timedelta(days=rng.uniform(0, 365))
+        # Heavy-tailed vote counts; each post has its own approval rate
+        voters = rng.sample(range(1, args.users + 1), min(int(rng.paretovariate(1.2)) - 1, args.users, 5000))
+        approval = rng.betavariate(5, 2)
+        votes = [1 if rng.random() < approval else -1 for _ in voters]
+        score = sum(votes)
+        loader.add(models.Post.__table__, {
+            "id": post_id, "author_uid": person(args.seed, skewed(rng, args.users))[0],
+            "title": sentence(rng, 3, 8).capitalize(), "description": sentence(rng, 10, 60),
+            "resource_link": f"https://example.edu/resources/{post_id}" if rng.random() < 0.3 else None,
+            "score": score, "hot_score": hot_score(score, created_at),
+            "created_at": created_at, "updated_at": created_at,
+        })
+        for voter, vote in zip(voters, votes):
+            loader.add(models.PostVote.__table__, {
+                "post_id": post_id, "user_uid": person(args.seed, voter)[0], "vote": vote,
+            })
+
+
+def generate_conversations(loader, models, args):
+    rng = stream(args.seed, "conversations")
+    mean_messages = args.messages / max(args.conversations, 1)
+    message_id = 0
+    for conversation_id in range(1, args.conversations + 1):
+        is_group = rng.random() < 0.15
+        size = rng.randint(3, 8) if is_group else 2
+        members = set()
+        while len(members) < min(size, args.users):
+            members.add(skewed(rng, args.users))
+        members = sorted(members)
+        created_at = args.now - timedelta(days=rng.uniform(1, 365))
+        loader.add(models.Conversation.__table__, {
+            "conversation_id": conversation_id, "is_group": is_group,
+            "group_name": f"{rng.choice(COURSES)} chat" if is_group else None, "created_at": created_at,
+        })
+
+        first_message_id = message_id + 1
+        sent_at = created_at
+        for _ in range(min(int(rng.expovariate(1 / mean_messages)), 5000) if mean_messages else 0):
+            sent_at += timedelta(minutes=rng.expovariate(1 / 90))
+            if sent_at >= args.now:
+                break
+            message_id += 1
+            loader.add(models.Message.__table__, {
+                "message_id": message_id, "conversation_id": conversation_id, "sender_id": rng.choice(members),
+                "content": sentence(rng, 2, 25), "created_at": sent_at,
+            })
+
+        for user_id in members:
+            # Most participants have read everything; the rest are somewhere behind
+            last_read = message_id if rng.random() < 0.8 else rng.randint(first_message_id - 1, message_id)
+            loader.add(models.ConversationParticipant.__table__, {
+                "conversation_id": conversation_id, "user_id": user_id, "joined_at": created_at,
+                "last_read_message_id": last_read if last_read >= first_message_id else None,
+            })
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--database-url", help="defaults to DATABASE_URL")
+    parser.add_argument("--seed", type=int, default=393)
+    parser.add_argument("--users", type=int, default=100000)
+    parser.add_argument("--conversations", type=int, default=100000)
+    parser.add_argument("--messages", type=int, default=1000000, help="approximate total")
+    parser.add_argument("--posts", type=int, default=50000)
+    parser.add_argument("--groups", type=int, default=5000)
+    parser.add_argument("--groups-per-user", type=float, default=2)
+    parser.add_argument("--sessions-per-user", type=float, default=3)
+    parser.add_argument("--busy-blocks-per-user", type=int, default=8)
+    parser.add_argument("--batch-size", type=int, default=10000)
+    parser.add_argument("--now", type=datetime.fromisoformat, default=datetime(2026, 9, 1),
+                        help="generated activity ends here (default 2026-09-01)")
+    args = parser.parse_args()
+    if args.database_url:
+        os.environ["DATABASE_URL"] = args.database_url
+    os.environ["METRICS_ENABLED"] = "false"
+
+    from alembic import command
+    from alembic.config import Config
+    from sqlalchemy import func, select, text
+
+    import models
+    from database import engine
+    from message_partitions import ensure_partitions
+
+    command.upgrade(Config(os.path.join(os.path.dirname(os.path.abspath(__file__)), "alembic.ini")), "head")
+    with engine.connect() as conn:
+        if conn.scalar(select(func.count()).select_from(models.User.__table__)):
+            sys.exit("The users table is not empty; generate into a fresh database.")
+
+        # Every generated month gets its partition up front instead of filling the default one
+        ensure_partitions(conn, now=args.now, since=args.now - timedelta(days=366))
+        conn.commit()
+        loader = Loader(conn, args.batch_size)
+        for step in (generate_users, generate_groups, generate_calendars, generate_posts, generate_conversations):
+            t0 = time.perf_counter()
+            before = dict(loader.counts)
+            step(loader, models, args)
+            loader.flush()
+            added = {t.name: n - before.get(t, 0) for t, n in loader.counts.items() if n != before.get(t, 0)}
+            print(f"{step.__name__:24} {time.perf_counter() - t0:7.1f} s  "
+                  + ", ".join(f"{n} {name}" for name, n in added.items()))
+
+        if conn.dialect.name == "postgresql":
+            for table, column in EXPLICIT_IDS.items():
+                conn.execute(text(
+                    f"SELECT setval(pg_get_serial_sequence('{table}', '{column}'), "
+                    f"(SELECT coalesce(max({column}), 1) FROM {table}))"
+                ))
+            conn.commit()
+            conn.execute(text("ANALYZE"))
+            conn.commit()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,271 @@
+"""Durable background jobs.
+
+Work that need not finish inside a request is stored as a row in ``jobs`` by
+``enqueue`` and run later by a ``Worker``. A module registers the function for a
+job kind with ``@job_handler(kind)``. The function receives the job's JSON payload
+and returns a JSON-compatible result. A coroutine function runs on the event
+loop; any other function runs in the thread pool.
+
+Jobs with the same kind and ``dedup_key`` are merged while they wait: enqueueing
+again replaces the queued job's payload instead of adding a second job, so a
+user who syncs twice in a row costs one run. A job that is already running is
+left alone and the new one queues behind it.
+
+A worker claims due jobs with ``FOR UPDATE SKIP LOCKED`` on PostgreSQL and a
+conditional update everywhere, so any number of workers can share the table.
+A claimed job is leased for ``JOB_LEASE_SECONDS``. If its worker dies, the job
+is claimed again once the lease runs out. A failed job is retried after
+``JOB_RETRY_SECONDS``, doubled on every attempt, until it has had
+``max_attempts``. Finished jobs are deleted after ``JOB_RETENTION_SECONDS``.
+
+The app runs a worker in-process unless ``JOB_WORKER_IN_APP=false``. Then run
+``python worker.py`` instead, as many as needed.
+"""
+import asyncio
+import inspect
+import logging
+import os
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Union
+
+from fastapi.concurrency import run_in_threadpool
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import delete, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import database
+import models
+
+logger = logging.getLogger(__name__)
+
+JOB_WORKER_IN_APP = os.getenv("JOB_WORKER_IN_APP", "true").lower() in ("1", "true", "yes")
+JOB_CONCURRENCY = int(os.getenv("JOB_CONCURRENCY", "4"))
+JOB_POLL_SECONDS = float(os.getenv("JOB_POLL_SECONDS", "1"))
+JOB_LEASE_SECONDS = float(os.getenv("JOB_LEASE_SECONDS", "300"))
+JOB_RETRY_SECONDS = float(os.getenv("JOB_RETRY_SECONDS", "5"))
+JOB_MAX_RETRY_SECONDS = 3600
+JOB_RETENTION_SECONDS = float(os.getenv("JOB_RETENTION_SECONDS", str(7 * 86400)))
+PRUNE_INTERVAL_SECONDS = 3600
+
+QUEUED, RUNNING, SUCCEEDED, FAILED = "queued", "running", "succeeded", "failed"
+
+Handler = Callable[[dict], Union[Any, Awaitable[Any]]]
+HANDLERS: Dict[str, Handler] = {}
+
+# In-process workers, which enqueue wakes at once instead of at their next poll
+_workers: Set["Worker"] = set()
+
+
+def job_handler(kind: str) -> Callable[[Handler], Handler]:
+    def register(handler: Handler) -> Handler:
+        HANDLERS[kind] = handler
+        return handler
+
+    return register
+
+
+def describe(job: models.Job) -> dict:
+    return {
+        "job_id": job.id,
+        "kind": job.kind,
+        "status": job.status,
+        "attempts": job.attempts,
+        "result": job.result,
+        "error": job.error,
+        "created_at": job.created_at,
+        "updated_at": job.updated_at,
+        "finished_at": job.finished_at,
+    }
+
+
+async def enqueue(
+    db: AsyncSession, kind: str, payload: dict, dedup_key: Optional[str] = None, max_attempts: int = 5
+) -> models.Job:
+    """Queue a job, or merge it into the queued one with the same kind and ``dedup_key``; commits."""
+    Job = models.Job
+    for _ in range(3):
+        now = datetime.utcnow()
+        if dedup_key is not None:
+            # Only while still queued: a worker may claim it at any moment
+            job_id = (await db.execute(
+                update(Job).where(Job.kind == kind, Job.dedup_key == dedup_key, Job.status == QUEUED)
+                .values(payload=payload, attempts=0, max_attempts=max_attempts, run_at=now, error=None, updated_at=now)
+                .returning(Job.id)
+            )).scalar()
+            if job_id is not None:
+                await db.commit()
+                _wake_workers()
+                return await db.get(Job, job_id, populate_existing=True)
+        job = Job(
+            kind=kind, dedup_key=dedup_key, payload=payload, status=QUEUED, attempts=0, max_attempts=max_attempts,
+            run_at=now, created_at=now, updated_at=now
+        )
+        db.add(job)
+        try:
+            await db.commit()
+        except IntegrityError:
+            # Another request queued the same job first; merge into it
+            await db.rollback()
+            continue
+        _wake_workers()
+        return job
+    raise RuntimeError(f"could not queue {kind} job {dedup_key!r}")
+
+
+def _wake_workers() -> None:
+    for worker in list(_workers):
+        worker.wake()
+
+
+async def claim(db: AsyncSession, limit: int) -> List[models.Job]:
+    """Lease up to ``limit`` due jobs (queued, or running with an expired lease) to the caller."""
+    Job = models.Job
+    now = datetime.utcnow()
+    due = (Job.status.in_((QUEUED, RUNNING)), Job.run_at <= now)
+    candidates = (await db.execute(
+        select(Job.id).where(*due).order_by(Job.run_at).limit(limit).with_for_update(skip_locked=True)
+    )).scalars().all()
+    claimed = []
+    for job_id in candidates:
+        # Conditional, so two workers never both claim a job (SQLite ignores SKIP LOCKED)
+        result = await db.execute(
+            update(Job).where(Job.id == job_id, *due)
+            .values(status=RUNNING, attempts=Job.attempts + 1, run_at=now + timedelta(seconds=JOB_LEASE_SECONDS),
+                    updated_at=now)
+        )
+        if result.rowcount:
+            claimed.append(job_id)
+    await db.commit()
+    if not claimed:
+        return []
+    return list((await db.execute(select(Job).where(Job.id.in_(claimed)).order_by(Job.run_at))).scalars())
+
+
+async def _finish(job: models.Job, **values) -> bool:
+    """Record the outcome of ``job`` if this worker still holds its lease."""
+    Job = models.Job
+    now = datetime.utcnow()
+    owned = (Job.id == job.id, Job.status == RUNNING, Job.attempts == job.attempts)
+    async with database.AsyncSessionLocal() as db:
+        try:
+            result = await db.execute(update(Job).where(*owned).values(updated_at=now, **values))
+            await db.commit()
+        except IntegrityError:
+            # A newer job with the same key is queued and supersedes this retry
+            await db.rollback()
+            result = await db.execute(update(Job).where(*owned).values(
+                status=FAILED, error=f"{values.get('error')} (superseded by a newer job)", updated_at=now,
+                finished_at=now
+            ))
+            await db.commit()
+    return bool(result.rowcount)
+
+
+async def run_job(job: models.Job) -> None:
+    handler = HANDLERS.get(job.kind)
+    if job.attempts > job.max_attempts:
+        # Its last attempt lost its worker
+        await _finish(job, status=FAILED, error="lease expired on the last attempt", finished_at=datetime.utcnow())
+        return
+    try:
+        if handler is None:
+            raise LookupError(f"no handler for job kind {job.kind!r}")
+        if inspect.iscoroutinefunction(handler):
+            result = await handler(job.payload)
+        else:
+            result = await run_in_threadpool(handler, job.payload)
+    except Exception as e:
+        logger.exception("Job %s (%s) failed on attempt %d", job.id, job.kind, job.attempts)
+        error = f"{type(e).__name__}: {e}"
+        if job.attempts < job.max_attempts and handler is not None:
+            delay = min(JOB_RETRY_SECONDS * 2 ** (job.attempts - 1), JOB_MAX_RETRY_SECONDS)
+            await _finish(job, status=QUEUED, error=error, run_at=datetime.utcnow() + timedelta(seconds=delay))
+        else:
+            await _finish(job, status=FAILED, error=error, finished_at=datetime.utcnow())
+        return
+    await _finish(job, status=SUCCEEDED, result=jsonable_encoder(result), error=None, finished_at=datetime.utcnow())
+
+
+async def release(jobs: List[models.Job]) -> None:
+    """Hand unfinished jobs back to the queue without counting the interrupted attempt."""
+    Job = models.Job
+    async with database.AsyncSessionLocal() as db:
+        for job in jobs:
+            try:
+                await db.execute(
+                    update(Job).where(Job.id == job.id, Job.status == RUNNING, Job.attempts == job.attempts)
+                    .values(status=QUEUED, attempts=Job.attempts - 1, run_at=datetime.utcnow())
+                )
+                await db.commit()
+            except IntegrityError:
+                # A newer job with the same key is already queued
+                await db.rollback()
+
+
+async def prune(older_than: float = JOB_RETENTION_SECONDS) -> int:
+    Job = models.Job
+    cutoff = datetime.utcnow() - timedelta(seconds=older_than)
+    async with database.AsyncSessionLocal() as db:
+        result = await db.execute(
+            delete(Job).where(Job.status.in_((SUCCEEDED, FAILED)), Job.finished_at < cutoff)
+        )
+        await db.commit()
+    return result.rowcount
+
+
+class Worker:
+    """Claims due jobs and runs up to ``concurrency`` of them at a time until cancelled."""
+
+    def __init__(self, concurrency: int = JOB_CONCURRENCY, poll: float = JOB_POLL_SECONDS):
+        self.concurrency = concurrency
+        self.poll = poll
+        self.running: Dict[asyncio.Task, models.Job] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wakeup: Optional[asyncio.Event] = None
+
+    def wake(self) -> None:
+        """Make the worker look for jobs now; safe to call from any thread."""
+        if self._loop is not None and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    async def run(self) -> None:
+        pruned_at = 0.0
+        loop = self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        _workers.add(self)
+        try:
+            while True:
+                self._wakeup.clear()
+                jobs = []
+                free = self.concurrency - len(self.running)
+                if free > 0:
+                    try:
+                        async with database.AsyncSessionLocal() as db:
+                            jobs = await claim(db, free)
+                        if loop.time() - pruned_at > PRUNE_INTERVAL_SECONDS:
+                            pruned_at = loop.time()
+                            await prune()
+                    except Exception:
+                        logger.exception("Claiming jobs failed")
+                for job in jobs:
+                    task = asyncio.create_task(run_job(job))
+                    self.running[task] = job
+                    task.add_done_callback(self._done)
+                # A full batch may mean more are due; otherwise wait for a job to finish or arrive
+                if not jobs or len(self.running) >= self.concurrency:
+                    try:
+                        await asyncio.wait_for(self._wakeup.wait(), self.poll)
+                    except asyncio.TimeoutError:
+                        pass
+        finally:
+            _workers.discard(self)
+            interrupted = list(self.running.values())
+            for task in self.running:
+                task.cancel()
+            await asyncio.gather(*self.running, return_exceptions=True)
+            await release(interrupted)
+
+    def _done(self, task: asyncio.Task) -> None:
+        self.running.pop(task, None)
+        self._wakeup.set()
@@ -1,29 +1,106 @@
-from fastapi import FastAPI, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
-from sqlalchemy import func
+import asyncio
+from contextlib import asynccontextmanager
+from fastapi import APIRouter, FastAPI, Depends, HTTPException, Query, Request, Response, BackgroundTasks, WebSocket, WebSocketDisconnect, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy.orm import Session, aliased
+from sqlalchemy import func, literal, or_, select, text, union
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from pydantic import BaseModel, ConfigDict
-from database import engine, Base, get_db
+from database import (
+    REPLICA_STICKY_SECONDS, ReadYourWritesMiddleware, dispose_engines, get_async_db, get_async_read_db, get_db,
+    get_read_db, init_engines, on_replica, replicas
+)
+import database
 import models
-from typing import List, Optional
+from admission import ADMISSION_ENABLED, AdmissionMiddleware, pool_wait, token_buckets
+from availability import AVAILABILITY_SYNC_JOB, sync_job
+from broker import broker, conversation_channel, user_channel
+from busy_bitmaps import CELL_MINUTES, MAX_RANGE, align_range, busy_matrix, suggest_for_groups
+from compression import CompressionMiddleware
+from conditional import make_etag, not_modified
+from exports import CSV_MEDIA_TYPE, ICS_MEDIA_TYPE, NDJSON_MEDIA_TYPE, csv_rows, ics_feed, ndjson, stream_rows
+from cache import FEED_NAMESPACE, cache, conversations_key, study_groups_key, user_profile_key
+from jobs import JOB_WORKER_IN_APP, Worker, describe, enqueue
+from message_archive import archived_months, iter_conversation, read_direct_messages, read_history
+from message_partitions import MESSAGE_MAINTENANCE_SECONDS, maintain_periodically
+from metrics import METRICS_ENABLED, MetricsMiddleware, render_metrics
+from pagination import (
+    NEXT_CURSOR_HEADER, PREV_CURSOR_HEADER, decode_cursor, decode_rank_cursor, decode_text_cursor,
+    encode_cursor, encode_rank_cursor, encode_text_cursor
+)
+from ranking import HOT_RESCORE_SECONDS, hot_score, rescore_periodically
+from scheduling import suggest_slots
+from search import search
+from votes import apply_score_delta, record_vote, score_buffer
+from typing import List, Literal, Optional, Union
 from datetime import datetime
 
-# Create tables in PostgreSQL automatically 
-Base.metadata.create_all(bind=engine)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Per worker process, so a server that forks after import never shares connections
+    engine, async_engine = init_engines()
+    if ADMISSION_ENABLED:
+        pool_wait.watch(engine)
+        pool_wait.watch(async_engine.sync_engine)
+    score_buffer.start()
+    rescorer = asyncio.create_task(rescore_periodically()) if HOT_RESCORE_SECONDS > 0 else None
+    maintenance = asyncio.create_task(maintain_periodically()) if MESSAGE_MAINTENANCE_SECONDS > 0 else None
+    replica_checks = asyncio.create_task(replicas.check_periodically()) if replicas else None
+    worker = asyncio.create_task(Worker().run()) if JOB_WORKER_IN_APP else None
+    yield
+    for task in (worker, rescorer, maintenance, replica_checks):
+        if task:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+    await score_buffer.stop()
+    await broker.close()
+    await cache.close()
+    await token_buckets.close()
+    await dispose_engines()
 
-app = FastAPI()
+
+router = APIRouter()
 
 origins = [
     "http://localhost:3000",
     "http://127.0.0.1:3000",
 ]
 
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"], # Updated for local development flexibility
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
+
+def create_app() -> FastAPI:
+    """Build the app. Nothing touches the database until its lifespan starts.
+
+    ``uvicorn main:create_app --factory`` builds one per worker; ``main:app`` is one built at import.
+    """
+    app = FastAPI(lifespan=lifespan)
+    # Inside CORS, so clients can read the 429s and 503s it sends
+    if ADMISSION_ENABLED:
+        app.add_middleware(AdmissionMiddleware)
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=["*"], # Updated for local development flexibility
+        allow_methods=["*"],
+        allow_headers=["*"],
+        expose_headers=[NEXT_CURSOR_HEADER, PREV_CURSOR_HEADER, "ETag", "Last-Modified", "Retry-After"],
+    )
+    app.add_middleware(CompressionMiddleware)
+    app.add_middleware(ReadYourWritesMiddleware)
+
+    if METRICS_ENABLED:
+        app.add_middleware(MetricsMiddleware)
+        app.add_api_route("/metrics", metrics, include_in_schema=False)
+
+    app.include_router(router)
+    return app
+
+
+def metrics():
+    """Prometheus text exposition of request and database metrics."""
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
 
 # ============ PYDANTIC MODELS ============
 
@@ -35,6 +112,12 @@ class UserSimple(BaseModel):
     email: str
     role: str
 
+class UserTypeahead(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+    user_id: int
+    firebase_uid: str
+    full_name: str
+
 class UserCreate(BaseModel):
     firebase_uid: str
     email: str
@@ -95,19 +178,46 @@ class PostOut(BaseModel):
     user_vote: int
     created_at: datetime
 
+class SearchResult(BaseModel):
+    type: str  # "post" or "message"
+    id: int
+    rank: float
+    created_at: datetime
+    # posts
+    title: Optional[str] = None
+    description: Optional[str] = None
+    resource_link: Optional[str] = None
+    score: Optional[int] = None
+    # messages
+    conversation_id: Optional[int] = None
+    sender_id: Optional[int] = None
+    content: Optional[str] = None
+
 # ============ USER ENDPOINTS ============
 
-@app.post("/sync-user")
-def sync_user(user_data: UserCreate, db: Session = Depends(get_db)):
+async def _invalidate_user_views(db: AsyncSession, user_id: int, firebase_uid: str) -> None:
+    """Drop cached responses that show this user's profile: their own and their contacts' conversations."""
+    mine = aliased(models.ConversationParticipant)
+    contacts = (await db.execute(
+        select(models.ConversationParticipant.user_id).distinct().join(
+            mine, mine.conversation_id == models.ConversationParticipant.conversation_id
+        ).where(mine.user_id == user_id)
+    )).scalars().all()
+    await cache.delete(user_profile_key(firebase_uid), *(conversations_key(u) for u in contacts))
+
+@router.post("/sync-user")
+async def sync_user(user_data: UserCreate, db: AsyncSession = Depends(get_async_db)):
     """Synchronizes Firebase Auth user with PostgreSQL database."""
-    db_user = db.query(models.User).filter(models.User.firebase_uid == user_data.firebase_uid).first()
+    db_user = (await db.execute(
+        select(models.User).where(models.User.firebase_uid == user_data.firebase_uid)
+    )).scalars().first()
     
     if db_user:
         # Robust Sync: If verified email in Firebase differs from DB, update DB
         if db_user.email != user_data.email:
             db_user.email = user_data.email
-            db.commit()
-            db.refresh(db_user)
+            await db.commit()
+            await _invalidate_user_views(db, db_user.user_id, db_user.firebase_uid)
         
         return {
             "status": "exists",
@@ -122,127 +232,336 @@ def sync_user(user_data: UserCreate, db: Session = Depends(get_db)):
             role=user_data.role
         )
         db.add(new_user)
-        db.commit()
-        db.refresh(new_user)
+        await db.commit()
+        await db.refresh(new_user)
         return {"status": "success", "user_id": new_user.user_id, "user": new_user.full_name, "role": new_user.role}
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
 
-@app.get("/user/{firebase_uid}")
-def get_user_profile(firebase_uid: str, db: Session = Depends(get_db)):
-    user = db.query(models.User).filter(models.User.firebase_uid == firebase_uid).first()
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-    return {
-        "user_id": user.user_id,
-        "full_name": user.full_name,
-        "email": user.email,
-        "role": user.role,
-        "gcal_connected": True if user.google_calendar_token else False
-    }
+@router.get("/user/{firebase_uid}")
+async def get_user_profile(firebase_uid: str, db: AsyncSession = Depends(get_async_db)):
+    async def load():
+        user = (await db.execute(
+            select(models.User).where(models.User.firebase_uid == firebase_uid)
+        )).scalars().first()
+        if not user:
+            raise HTTPException(status_code=404, detail="User not found")
+        return {
+            "user_id": user.user_id,
+            "full_name": user.full_name,
+            "email": user.email,
+            "role": user.role,
+            "gcal_connected": True if user.google_calendar_token else False
+        }
+
+    return await cache.read_through(user_profile_key(firebase_uid), load)
 
-@app.put("/user/{firebase_uid}/update")
-def update_user_profile(firebase_uid: str, update_data: UserCreate, db: Session = Depends(get_db)):
+@router.put("/user/{firebase_uid}/update")
+async def update_user_profile(firebase_uid: str, update_data: UserCreate, db: AsyncSession = Depends(get_async_db)):
     """Updates profile while preventing login issues during pending email verification."""
-    db_user = db.query(models.User).filter(models.User.firebase_uid == firebase_uid).first()
+    db_user = (await db.execute(
+        select(models.User).where(models.User.firebase_uid == firebase_uid)
+    )).scalars().first()
     if not db_user:
         raise HTTPException(status_code=404, detail="User not found")
     
+    # Posts show their author's name and role
+    shown_on_posts = (db_user.full_name, db_user.role) != (update_data.full_name, update_data.role)
     db_user.full_name = update_data.full_name
     db_user.role = update_data.role
     db_user.email = update_data.email 
     
-    db.commit()
+    await db.commit()
+    await _invalidate_user_views(db, db_user.user_id, firebase_uid)
+    if shown_on_posts:
+        await cache.invalidate_namespace(FEED_NAMESPACE)
     return {"status": "success"}
 
-@app.get("/users", response_model=List[UserSimple])
-def list_users(db: Session = Depends(get_db)):
-    """Return all users for chat roster."""
-    users = db.query(models.User).all()
+def _like_pattern(q: str) -> str:
+    """Case-insensitive substring pattern with LIKE wildcards in ``q`` escaped."""
+    escaped = q.lower().replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{escaped}%"
+
+@router.get("/users", response_model=Union[List[UserSimple], List[UserTypeahead]])
+def list_users(
+    request: Request,
+    response: Response,
+    q: Optional[str] = Query(None, max_length=100),
+    role: Optional[str] = None,
+    typeahead: bool = False,
+    cursor: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=200),
+    db: Session = Depends(get_read_db)
+):
+    """Chat roster in name order, one page at a time.
+
+    ``q`` matches a substring of the name or email, ``role`` filters by role, and
+    ``typeahead`` returns only the fields a picker needs. The next page's cursor is
+    returned in the X-Next-Cursor header.
+    """
+    users_version = db.query(func.max(models.User.updated_at)).scalar()
+    unchanged = not_modified(
+        request, response, make_etag("users", users_version, q, role, typeahead, cursor, limit), users_version
+    )
+    if unchanged:
+        return unchanged
+
+    name_key = models.user_name_key(models.User.full_name)
+    if typeahead:
+        query = db.query(name_key, models.User.user_id, models.User.firebase_uid, models.User.full_name)
+    else:
+        query = db.query(name_key, models.User)
+    if q:
+        pattern = _like_pattern(q)
+        query = query.filter(or_(
+            func.lower(models.User.full_name).like(pattern, escape="\\"),
+            func.lower(models.User.email).like(pattern, escape="\\")
+        ))
+    if role:
+        query = query.filter(models.User.role == role)
+
+    after = decode_text_cursor(cursor)
+    if after:
+        key, user_id = after
+        query = query.filter(or_(name_key > key, (name_key == key) & (models.User.user_id > user_id)))
+    rows = query.order_by(name_key, models.User.user_id).limit(limit + 1).all()
+
+    if len(rows) > limit:
+        rows = rows[:limit]
+        key = rows[-1][0]
+        last_id = rows[-1].user_id if typeahead else rows[-1][1].user_id
+        response.headers[NEXT_CURSOR_HEADER] = encode_text_cursor(key, last_id)
+
+    if typeahead:
+        return [
+            UserTypeahead(user_id=r.user_id, firebase_uid=r.firebase_uid, full_name=r.full_name or "")
+            for r in rows
+        ]
     return [
         UserSimple(
             user_id=u.user_id,
             firebase_uid=u.firebase_uid,
-            full_name=u.full_name,
+            full_name=u.full_name or "",
             email=u.email,
             role=u.role or "Student"
         )
-        for u in users
+        for _, u in rows
     ]
 
 # ============ MESSAGING ENDPOINTS ============
 
-@app.post("/conversations/one-on-one/{user_id_1}/{user_id_2}")
-def create_or_get_one_on_one_conversation(user_id_1: int, user_id_2: int, db: Session = Depends(get_db)):
+@router.post("/conversations/one-on-one/{user_id_1}/{user_id_2}")
+async def create_or_get_one_on_one_conversation(
+    user_id_1: int, user_id_2: int, db: AsyncSession = Depends(get_async_db)
+):
     if user_id_1 == user_id_2:
         raise HTTPException(status_code=400, detail="Cannot create conversation with yourself")
     
-    existing_conv = db.query(models.Conversation).filter(
-        models.Conversation.is_group == False
-    ).join(models.ConversationParticipant).filter(
-        models.ConversationParticipant.user_id.in_([user_id_1, user_id_2])
-    ).group_by(models.Conversation.conversation_id).having(
-        func.count(models.ConversationParticipant.participant_id) == 2
-    ).first()
+    existing_id = (await db.execute(
+        select(models.Conversation.conversation_id).where(
+            models.Conversation.is_group == False
+        ).join(models.ConversationParticipant).where(
+            models.ConversationParticipant.user_id.in_([user_id_1, user_id_2])
+        ).group_by(models.Conversation.conversation_id).having(
+            func.count(models.ConversationParticipant.participant_id) == 2
+        ).limit(1)
+    )).scalar()
     
-    if existing_conv:
-        return {"conversation_id": existing_conv.conversation_id, "is_new": False}
+    if existing_id:
+        return {"conversation_id": existing_id, "is_new": False}
     
     try:
         conv = models.Conversation(is_group=False)
         db.add(conv)
-        db.flush()
+        await db.flush()
         
         p1 = models.ConversationParticipant(conversation_id=conv.conversation_id, user_id=user_id_1)
         p2 = models.ConversationParticipant(conversation_id=conv.conversation_id, user_id=user_id_2)
         db.add(p1)
         db.add(p2)
-        db.commit()
+        await db.commit()
+        await cache.delete(conversations_key(user_id_1), conversations_key(user_id_2))
         
         return {"conversation_id": conv.conversation_id, "is_new": True}
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail=f"Error: {str(e)}")
 
-@app.post("/conversations/group")
-def create_group_conversation(group_name: str, user_ids: List[int], db: Session = Depends(get_db)):
+@router.post("/conversations/group")
+async def create_group_conversation(group_name: str, user_ids: List[int], db: AsyncSession = Depends(get_async_db)):
     try:
         conv = models.Conversation(is_group=True, group_name=group_name)
         db.add(conv)
-        db.flush()
+        await db.flush()
         for u_id in user_ids:
             p = models.ConversationParticipant(conversation_id=conv.conversation_id, user_id=u_id)
             db.add(p)
-        db.commit()
+        await db.commit()
+        await cache.delete(*(conversations_key(u_id) for u_id in user_ids))
         return {"conversation_id": conv.conversation_id, "is_new": True}
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail=f"Error: {str(e)}")
 
-@app.get("/conversations/{user_id}")
-def get_user_conversations(user_id: int, db: Session = Depends(get_db)):
-    conversations = db.query(models.Conversation).join(
-        models.ConversationParticipant
-    ).filter(models.ConversationParticipant.user_id == user_id).all()
-    
-    result = []
-    for conv in conversations:
-        participants = db.query(models.User).join(
-            models.ConversationParticipant
-        ).filter(models.ConversationParticipant.conversation_id == conv.conversation_id).all()
-        
-        result.append({
+async def _participants_by_conversation(db: AsyncSession, conversation_ids: List[int]) -> dict:
+    """Participants of several conversations in one query, keyed by conversation id."""
+    rows = (await db.execute(
+        select(models.ConversationParticipant.conversation_id, models.User).join(
+            models.User, models.User.user_id == models.ConversationParticipant.user_id
+        ).where(models.ConversationParticipant.conversation_id.in_(conversation_ids))
+    )).all()
+    participants = {conv_id: [] for conv_id in conversation_ids}
+    for conv_id, p in rows:
+        participants[conv_id].append(
+            {"user_id": p.user_id, "full_name": p.full_name, "email": p.email, "role": p.role}
+        )
+    return participants
+
+@router.get("/conversations/{user_id}")
+async def get_user_conversations(user_id: int, db: AsyncSession = Depends(get_async_read_db)):
+    # Lists no messages, so sending one leaves the cached entry valid
+    async def load():
+        conversations = (await db.execute(
+            select(models.Conversation).join(
+                models.ConversationParticipant
+            ).where(models.ConversationParticipant.user_id == user_id)
+        )).scalars().all()
+        participants = await _participants_by_conversation(db, [c.conversation_id for c in conversations])
+
+        return [
+            {
+                "conversation_id": conv.conversation_id,
+                "is_group": conv.is_group,
+                "group_name": conv.group_name,
+                "created_at": conv.created_at,
+                "participants": participants[conv.conversation_id]
+            }
+            for conv in conversations
+        ]
+
+    return await cache.read_through(
+        conversations_key(user_id), load, ttl=REPLICA_STICKY_SECONDS if on_replica(db) else None
+    )
+
+@router.get("/inbox/{user_id}")
+async def get_inbox(
+    user_id: int,
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = Query(30, ge=1, le=100),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Conversations with their last message and unread count, most recently active first.
+
+    Runs two queries regardless of page size: one for the page itself and one for
+    the participants of every conversation on it.
+    """
+    Participant = models.ConversationParticipant
+
+    mine = aliased(Participant)
+    last_ids = select(
+        models.Message.conversation_id.label("conversation_id"),
+        func.max(models.Message.message_id).label("last_message_id")
+    ).join(
+        mine, (mine.conversation_id == models.Message.conversation_id) & (mine.user_id == user_id)
+    ).group_by(models.Message.conversation_id).subquery()
+
+    reader = aliased(Participant)
+    unread = select(
+        models.Message.conversation_id.label("conversation_id"),
+        func.count(models.Message.message_id).label("unread_count")
+    ).join(
+        reader, (reader.conversation_id == models.Message.conversation_id) & (reader.user_id == user_id)
+    ).where(
+        models.Message.message_id > func.coalesce(reader.last_read_message_id, 0),
+        models.Message.sender_id != user_id
+    ).group_by(models.Message.conversation_id).subquery()
+
+    last_message = aliased(models.Message)
+    sender = aliased(models.User)
+    last_activity = func.coalesce(last_message.created_at, models.Conversation.created_at)
+
+    query = select(
+        models.Conversation,
+        last_message,
+        sender.full_name,
+        func.coalesce(unread.c.unread_count, 0),
+        last_activity
+    ).join(
+        Participant,
+        (Participant.conversation_id == models.Conversation.conversation_id) & (Participant.user_id == user_id)
+    ).outerjoin(
+        last_ids, last_ids.c.conversation_id == models.Conversation.conversation_id
+    ).outerjoin(
+        last_message, last_message.message_id == last_ids.c.last_message_id
+    ).outerjoin(
+        sender, sender.user_id == last_message.sender_id
+    ).outerjoin(
+        unread, unread.c.conversation_id == models.Conversation.conversation_id
+    )
+
+    bound = decode_cursor(cursor)
+    if bound:
+        activity_at, conversation_id = bound
+        query = query.where(or_(
+            last_activity < activity_at,
+            (last_activity == activity_at) & (models.Conversation.conversation_id < conversation_id)
+        ))
+    rows = (await db.execute(query.order_by(
+        last_activity.desc(), models.Conversation.conversation_id.desc()
+    ).limit(limit + 1))).all()
+
+    if len(rows) > limit:
+        rows = rows[:limit]
+        conv, activity_at = rows[-1][0], rows[-1][4]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(activity_at, conv.conversation_id)
+
+    participants = await _participants_by_conversation(db, [r[0].conversation_id for r in rows])
+    return [
+        {
             "conversation_id": conv.conversation_id,
             "is_group": conv.is_group,
             "group_name": conv.group_name,
             "created_at": conv.created_at,
-            "participants": [
-                {"user_id": p.user_id, "full_name": p.full_name, "email": p.email, "role": p.role}
-                for p in participants
-            ]
-        })
-    return result
+            "last_activity": activity_at,
+            "unread_count": unread_count,
+            "last_message": {
+                "message_id": msg.message_id,
+                "sender_id": msg.sender_id,
+                "sender_name": sender_name,
+                "content": msg.content,
+                "created_at": msg.created_at
+            } if msg else None,
+            "participants": participants[conv.conversation_id]
+        }
+        for conv, msg, sender_name, unread_count, activity_at in rows
+    ]
+
+@router.post("/conversations/{conversation_id}/read")
+async def mark_conversation_read(
+    conversation_id: int, user_id: int, message_id: Optional[int] = None, db: AsyncSession = Depends(get_async_db)
+):
+    """Advance the user's last-read pointer, to the latest message unless one is given."""
+    participant = (await db.execute(
+        select(models.ConversationParticipant).where(
+            models.ConversationParticipant.conversation_id == conversation_id,
+            models.ConversationParticipant.user_id == user_id
+        )
+    )).scalars().first()
+    if not participant:
+        raise HTTPException(status_code=403, detail="User not in conversation")
+
+    if message_id is None:
+        message_id = (await db.execute(
+            select(func.max(models.Message.message_id)).where(
+                models.Message.conversation_id == conversation_id
+            )
+        )).scalar()
+    if message_id and message_id > (participant.last_read_message_id or 0):
+        participant.last_read_message_id = message_id
+        await db.commit()
+    return {"conversation_id": conversation_id, "last_read_message_id": participant.last_read_message_id}
 
 # ============ DIRECT MESSAGE ENDPOINTS (by Firebase UID) ============
 
@@ -251,10 +570,9 @@ class DirectMessageCreate(BaseModel):
     receiver_uid: str
     content: str
 
-@app.get("/messages")
-def get_messages_by_uid(user1: str, user2: str, db: Session = Depends(get_db)):
-    from sqlalchemy import text
-    rows = db.execute(
+@router.get("/messages")
+async def get_messages_by_uid(user1: str, user2: str, db: AsyncSession = Depends(get_async_db)):
+    rows = (await db.execute(
         text("""
             SELECT id, sender_uid, receiver_uid, content, created_at
             FROM messages
@@ -263,8 +581,8 @@ def get_messages_by_uid(user1: str, user2: str, db: Session = Depends(get_db)):
             ORDER BY created_at ASC
         """),
         {"u1": user1, "u2": user2}
-    ).fetchall()
-    return [
+    )).fetchall()
+    messages = [
         {
             "id": r[0],
             "sender_uid": r[1],
@@ -274,34 +592,55 @@ def get_messages_by_uid(user1: str, user2: str, db: Session = Depends(get_db)):
         }
         for r in rows
     ]
+    # Archived months are all older than the table's
+    if archived_months():
+        archived = await run_in_threadpool(read_direct_messages, user1, user2)
+        messages = [
+            {field: m[field] for field in ("id", "sender_uid", "receiver_uid", "content", "created_at")}
+            for m in archived
+        ] + messages
+    return messages
 
-@app.post("/messages")
-def send_message_by_uid(msg: DirectMessageCreate, db: Session = Depends(get_db)):
-    from sqlalchemy import text
-    result = db.execute(
+@router.post("/messages")
+async def send_message_by_uid(
+    msg: DirectMessageCreate, background_tasks: BackgroundTasks, db: AsyncSession = Depends(get_async_db)
+):
+    result = (await db.execute(
         text("""
             INSERT INTO messages (sender_uid, receiver_uid, content)
             VALUES (:sender_uid, :receiver_uid, :content)
             RETURNING id, sender_uid, receiver_uid, content, created_at
         """),
         {"sender_uid": msg.sender_uid, "receiver_uid": msg.receiver_uid, "content": msg.content}
-    ).fetchone()
-    db.commit()
-    return {
+    )).fetchone()
+    await db.commit()
+    out = {
         "id": result[0],
         "sender_uid": result[1],
         "receiver_uid": result[2],
         "content": result[3],
         "created_at": result[4]
     }
+    payload = jsonable_encoder(out)
+    for uid in {msg.sender_uid, msg.receiver_uid}:
+        background_tasks.add_task(broker.publish, user_channel(uid), payload)
+    return out
 
 
-@app.post("/messages/{conversation_id}")
-def send_message(conversation_id: int, sender_id: int, message: MessageCreate, db: Session = Depends(get_db)):
-    participant = db.query(models.ConversationParticipant).filter(
-        models.ConversationParticipant.conversation_id == conversation_id,
-        models.ConversationParticipant.user_id == sender_id
-    ).first()
+@router.post("/messages/{conversation_id}")
+async def send_message(
+    conversation_id: int,
+    sender_id: int,
+    message: MessageCreate,
+    background_tasks: BackgroundTasks,
+    db: AsyncSession = Depends(get_async_db)
+):
+    participant = (await db.execute(
+        select(models.ConversationParticipant.participant_id).where(
+            models.ConversationParticipant.conversation_id == conversation_id,
+            models.ConversationParticipant.user_id == sender_id
+        )
+    )).first()
     
     if not participant:
         raise HTTPException(status_code=403, detail="User not in conversation")
@@ -309,10 +648,10 @@ def send_message(conversation_id: int, sender_id: int, message: MessageCreate, d
     try:
         msg = models.Message(conversation_id=conversation_id, sender_id=sender_id, content=message.content)
         db.add(msg)
-        db.commit()
-        db.refresh(msg)
-        sender = db.query(models.User).filter(models.User.user_id == sender_id).first()
-        return {
+        await db.commit()
+        await db.refresh(msg)
+        sender = await db.get(models.User, sender_id)
+        out = {
             "message_id": msg.message_id,
             "conversation_id": msg.conversation_id,
             "sender_id": msg.sender_id,
@@ -320,64 +659,335 @@ def send_message(conversation_id: int, sender_id: int, message: MessageCreate, d
             "content": msg.content,
             "created_at": msg.created_at
         }
+        background_tasks.add_task(broker.publish, conversation_channel(conversation_id), jsonable_encoder(out))
+        return out
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail=f"Error: {str(e)}")
 
-@app.get("/messages/{conversation_id}")
-def get_conversation_messages(conversation_id: int, db: Session = Depends(get_db)):
-    messages = db.query(models.Message).filter(
-        models.Message.conversation_id == conversation_id
-    ).order_by(models.Message.created_at.asc()).all()
-    
-    return [
+@router.get("/messages/{conversation_id}")
+async def get_conversation_messages(
+    conversation_id: int,
+    request: Request,
+    response: Response,
+    before: Optional[str] = None,
+    after: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=200),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """One page of history in chronological order.
+
+    Without a cursor the most recent page is returned. Pass the X-Prev-Cursor header
+    value as ``before`` to page back, or X-Next-Cursor as ``after`` to page forward.
+    """
+    if before and after:
+        raise HTTPException(status_code=400, detail="Use either before or after, not both")
+
+    # Messages are never edited; sender names can change
+    last_message_at, users_version = (await db.execute(select(
+        select(func.max(models.Message.created_at))
+        .where(models.Message.conversation_id == conversation_id).scalar_subquery(),
+        select(func.max(models.User.updated_at)).scalar_subquery(),
+    ))).one()
+    unchanged = not_modified(
+        request, response,
+        make_etag("messages", conversation_id, last_message_at, users_version, before, after, limit),
+        last_message_at, users_version
+    )
+    if unchanged:
+        return unchanged
+
+    query = select(models.Message, models.User.full_name).join(
+        models.User, models.User.user_id == models.Message.sender_id
+    ).where(models.Message.conversation_id == conversation_id)
+
+    if after:
+        created_at, message_id = decode_cursor(after)
+        query = query.where(or_(
+            models.Message.created_at > created_at,
+            (models.Message.created_at == created_at) & (models.Message.message_id > message_id)
+        )).order_by(models.Message.created_at.asc(), models.Message.message_id.asc())
+    else:
+        bound = decode_cursor(before)
+        if bound:
+            created_at, message_id = bound
+            query = query.where(or_(
+                models.Message.created_at < created_at,
+                (models.Message.created_at == created_at) & (models.Message.message_id < message_id)
+            ))
+        query = query.order_by(models.Message.created_at.desc(), models.Message.message_id.desc())
+
+    rows = (await db.execute(query.limit(limit + 1))).all()
+    messages = [
         {
             "message_id": m.message_id,
             "conversation_id": m.conversation_id,
             "sender_id": m.sender_id,
-            "sender_name": db.query(models.User).filter(models.User.user_id == m.sender_id).first().full_name,
+            "sender_name": sender_name,
             "content": m.content,
             "created_at": m.created_at
         }
-        for m in messages
+        for m, sender_name in rows
     ]
+    if (after or len(messages) <= limit) and archived_months():
+        messages = await _with_archived_history(db, conversation_id, messages, after, before, limit)
+
+    has_more = len(messages) > limit
+    messages = messages[:limit]
+    if not after:
+        messages.reverse()
+
+    if has_more:
+        edge = messages[-1] if after else messages[0]
+        header = NEXT_CURSOR_HEADER if after else PREV_CURSOR_HEADER
+        response.headers[header] = encode_cursor(edge["created_at"], edge["message_id"])
+
+    return messages
+
+async def _with_archived_history(
+    db: AsyncSession, conversation_id: int, messages: List[dict], after: Optional[str], before: Optional[str], limit: int
+) -> List[dict]:
+    """Extends a page of history with archived messages, which are all older than the table's."""
+    if after:
+        archived = await run_in_threadpool(read_history, conversation_id, after=decode_cursor(after), limit=limit + 1)
+    else:
+        edge = (messages[-1]["created_at"], messages[-1]["message_id"]) if messages else decode_cursor(before)
+        archived = await run_in_threadpool(read_history, conversation_id, before=edge, limit=limit + 1 - len(messages))
+    if not archived:
+        return messages
+
+    names = dict((await db.execute(
+        select(models.User.user_id, models.User.full_name).where(
+            models.User.user_id.in_({m["sender_id"] for m in archived})
+        )
+    )).all())
+    archived = [
+        {
+            "message_id": m["message_id"],
+            "conversation_id": m["conversation_id"],
+            "sender_id": m["sender_id"],
+            "sender_name": names.get(m["sender_id"]),
+            "content": m["content"],
+            "created_at": m["created_at"]
+        }
+        for m in archived
+    ]
+    return archived + messages if after else messages + archived
+
+MESSAGE_EXPORT_FIELDS = ["message_id", "sender_id", "sender_name", "content", "created_at"]
+
+def _sender_name_lookup():
+    """Per-batch ``sender_name`` lookup; names are kept for the rest of the export, so each sender is read once."""
+    names = {}
+
+    def lookup(db: Session, rows):
+        # Archived batches arrive as dicts, table batches as rows
+        records = [row if isinstance(row, dict) else row._asdict() for row in rows]
+        missing = {record["sender_id"] for record in records} - names.keys()
+        if missing:
+            names.update(db.execute(
+                select(models.User.user_id, models.User.full_name).where(models.User.user_id.in_(missing))
+            ).all())
+        return [
+            {**{field: record.get(field) for field in MESSAGE_EXPORT_FIELDS}, "sender_name": names.get(record["sender_id"])}
+            for record in records
+        ]
+
+    return lookup
+
+@router.get("/messages/{conversation_id}/export")
+def export_conversation_messages(
+    conversation_id: int,
+    request: Request,
+    response: Response,
+    format: Literal["ndjson", "csv"] = "ndjson",
+    db: Session = Depends(get_db)
+):
+    """The whole history in chronological order, archived months included, streamed in batches."""
+    if db.get(models.Conversation, conversation_id) is None:
+        raise HTTPException(status_code=404, detail="Conversation not found")
+    last_message_at, users_version = db.execute(select(
+        select(func.max(models.Message.created_at))
+        .where(models.Message.conversation_id == conversation_id).scalar_subquery(),
+        select(func.max(models.User.updated_at)).scalar_subquery(),
+    )).one()
+    unchanged = not_modified(
+        request, response, make_etag("messages-export", format, conversation_id, last_message_at, users_version),
+        last_message_at, users_version
+    )
+    if unchanged:
+        return unchanged
+
+    # The stream checks out its own connection; give this one back instead of holding both until it ends
+    db.close()
+    batches = stream_rows(
+        select(
+            models.Message.message_id, models.Message.sender_id, models.Message.content, models.Message.created_at
+        ).where(
+            models.Message.conversation_id == conversation_id
+        ).order_by(models.Message.created_at.asc(), models.Message.message_id.asc()),
+        lookup=_sender_name_lookup(),
+        first=iter_conversation(conversation_id)
+    )
+    if format == "csv":
+        body, media_type = csv_rows(MESSAGE_EXPORT_FIELDS, batches), CSV_MEDIA_TYPE
+    else:
+        body, media_type = ndjson(batches), NDJSON_MEDIA_TYPE
+    headers = {**response.headers, "Content-Disposition": f'attachment; filename="conversation-{conversation_id}.{format}"'}
+    return StreamingResponse(body, media_type=media_type, headers=headers)
+
+# ============ REAL-TIME DELIVERY ============
+
+async def _subscription_channels(firebase_uid: str) -> Optional[List[str]]:
+    async with database.AsyncSessionLocal() as db:
+        user_id = (await db.execute(
+            select(models.User.user_id).where(models.User.firebase_uid == firebase_uid)
+        )).scalar()
+        if user_id is None:
+            return None
+        conversation_ids = (await db.execute(
+            select(models.ConversationParticipant.conversation_id).where(
+                models.ConversationParticipant.user_id == user_id
+            )
+        )).scalars().all()
+    return [user_channel(firebase_uid)] + [conversation_channel(c) for c in conversation_ids]
+
+@router.websocket("/ws/{firebase_uid}")
+async def message_stream(websocket: WebSocket, firebase_uid: str):
+    """Pushes {"channel", "message"} frames for the user's direct messages and conversations.
+
+    Subscriptions are fixed when the socket opens; reconnect after joining a conversation.
+    """
+    channels = await _subscription_channels(firebase_uid)
+    if channels is None:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    await websocket.accept()
+
+    async def forward(events):
+        async for channel, message in events:
+            await websocket.send_json({"channel": channel, "message": message})
+
+    async def wait_for_disconnect():
+        try:
+            while True:
+                await websocket.receive_text()
+        except WebSocketDisconnect:
+            pass
+
+    async with broker.subscribe(channels) as events:
+        tasks = [asyncio.create_task(forward(events)), asyncio.create_task(wait_for_disconnect())]
+        done, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
 
 # ============ RESOURCE SHARING ENDPOINTS ============
 
-@app.get("/posts", response_model=List[PostOut])
-def get_posts(current_user_uid: str = None, db: Session = Depends(get_db)):
-    posts = db.query(models.Post).order_by(models.Post.created_at.desc()).all()
-    result = []
-    for post in posts:
-        author = db.query(models.User).filter(models.User.firebase_uid == post.author_uid).first()
-        user_vote = 0
+@router.get("/posts", response_model=List[PostOut])
+async def get_posts(
+    request: Request,
+    response: Response,
+    current_user_uid: str = None,
+    sort: Literal["new", "hot", "top"] = "new",
+    cursor: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=200),
+    db: AsyncSession = Depends(get_async_read_db)
+):
+    """Feed ordered by ``sort``: newest first, by hot score, or by score.
+
+    Every order is served from a ``(key, id)`` index; the next page's cursor is
+    returned in the X-Next-Cursor header and is only valid for the same ``sort``.
+    """
+    # A buffered vote changes user_vote before it touches the post row
+    if not (score_buffer.enabled and current_user_uid):
+        posts_version, users_version = (await db.execute(select(
+            select(func.max(models.Post.updated_at)).scalar_subquery(),
+            select(func.max(models.User.updated_at)).scalar_subquery(),
+        ))).one()
+        unchanged = not_modified(
+            request, response,
+            make_etag("posts", posts_version, users_version, sort, cursor, limit, current_user_uid),
+            posts_version, users_version
+        )
+        if unchanged:
+            return unchanged
+
+    async def load():
         if current_user_uid:
-            vote = db.query(models.PostVote).filter(
-                (models.PostVote.post_id == post.id) & (models.PostVote.user_uid == current_user_uid)
-            ).first()
-            if vote: user_vote = vote.vote
-        result.append(PostOut(
-            id=post.id, author_uid=post.author_uid,
-            author_name=author.full_name if author else "Unknown",
-            author_role=author.role if author else "Student",
-            title=post.title, description=post.description,
-            resource_link=post.resource_link, score=post.score,
-            user_vote=user_vote, created_at=post.created_at
-        ))
-    return result
+            user_vote = func.coalesce(models.PostVote.vote, 0)
+        else:
+            user_vote = literal(0)
+        query = select(
+            models.Post, models.User.full_name, models.User.role, user_vote
+        ).outerjoin(
+            models.User, models.User.firebase_uid == models.Post.author_uid
+        )
+        if current_user_uid:
+            query = query.outerjoin(
+                models.PostVote,
+                (models.PostVote.post_id == models.Post.id) & (models.PostVote.user_uid == current_user_uid)
+            )
+
+        sort_key = {"new": models.Post.created_at, "hot": models.Post.hot_score, "top": models.Post.score}[sort]
+        after = decode_cursor(cursor) if sort == "new" else decode_rank_cursor(cursor)
+        if after:
+            key, post_id = after
+            query = query.where(or_(sort_key < key, (sort_key == key) & (models.Post.id < post_id)))
+        rows = (await db.execute(
+            query.order_by(sort_key.desc(), models.Post.id.desc()).limit(limit + 1)
+        )).all()
+
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            last = rows[-1][0]
+            if sort == "new":
+                next_cursor = encode_cursor(last.created_at, last.id)
+            else:
+                next_cursor = encode_rank_cursor(getattr(last, sort_key.key), last.id)
 
-@app.post("/posts", response_model=PostOut)
-def create_post(post_data: PostCreate, author_uid: str, db: Session = Depends(get_db)):
-    author = db.query(models.User).filter(models.User.firebase_uid == author_uid).first()
+        posts = [
+            PostOut(
+                id=post.id, author_uid=post.author_uid,
+                author_name=author_name or "Unknown",
+                author_role=author_role or "Student",
+                title=post.title, description=post.description,
+                resource_link=post.resource_link, score=post.score,
+                user_vote=vote, created_at=post.created_at
+            )
+            for post, author_name, author_role, vote in rows
+        ]
+        return {"posts": posts, "next_cursor": next_cursor}
+
+    # Every post write starts a new feed generation; pages are per user for user_vote
+    generation = await cache.generation(FEED_NAMESPACE)
+    # Pages read from a replica may lag, so they are cached only for the sticky window
+    page = await cache.read_through(
+        f"{FEED_NAMESPACE}:{generation}:{sort}:{limit}:{cursor or ''}:{current_user_uid or ''}", load,
+        ttl=REPLICA_STICKY_SECONDS if on_replica(db) else None
+    )
+    if page["next_cursor"]:
+        response.headers[NEXT_CURSOR_HEADER] = page["next_cursor"]
+    return page["posts"]
+
+@router.post("/posts", response_model=PostOut)
+async def create_post(post_data: PostCreate, author_uid: str, db: AsyncSession = Depends(get_async_db)):
+    author = (await db.execute(
+        select(models.User).where(models.User.firebase_uid == author_uid)
+    )).scalars().first()
     if not author: raise HTTPException(status_code=404, detail="User not found")
+    created_at = datetime.utcnow()
     new_post = models.Post(
         author_uid=author_uid, title=post_data.title.strip(),
         description=post_data.description.strip() if post_data.description else None,
         resource_link=post_data.resource_link, score=0,
+        hot_score=hot_score(0, created_at), created_at=created_at,
     )
     db.add(new_post)
-    db.commit()
-    db.refresh(new_post)
+    await db.commit()
+    await db.refresh(new_post)
+    await cache.invalidate_namespace(FEED_NAMESPACE)
     return PostOut(
         id=new_post.id, author_uid=new_post.author_uid,
         author_name=author.full_name, author_role=author.role,
@@ -386,28 +996,71 @@ def create_post(post_data: PostCreate, author_uid: str, db: Session = Depends(ge
         user_vote=0, created_at=new_post.created_at
     )
 
-@app.post("/posts/{post_id}/vote")
-def vote_post(post_id: int, user_uid: str = Query(...), vote: int = Query(...), db: Session = Depends(get_db)):
+@router.post("/posts/{post_id}/vote")
+async def vote_post(
+    post_id: int, user_uid: str = Query(...), vote: int = Query(...), db: AsyncSession = Depends(get_async_db)
+):
     if vote not in [-1, 0, 1]: raise HTTPException(status_code=400, detail="Invalid vote")
-    post = db.query(models.Post).filter(models.Post.id == post_id).first()
-    if not post: raise HTTPException(status_code=404, detail="Post not found")
-    
-    post_vote = db.query(models.PostVote).filter(
-        (models.PostVote.post_id == post_id) & (models.PostVote.user_uid == user_uid)
-    ).first()
-    prev_vote = post_vote.vote if post_vote else 0
-    
-    if post_vote:
-        if vote == 0: db.delete(post_vote)
-        else: post_vote.vote = vote
-    elif vote != 0:
-        db.add(models.PostVote(post_id=post_id, user_uid=user_uid, vote=vote))
-    
-    post.score = post.score - prev_vote + vote
-    db.commit()
+    try:
+        delta = await record_vote(db, post_id, user_uid, vote)
+        if score_buffer.enabled:
+            found = await db.scalar(select(models.Post.id).where(models.Post.id == post_id))
+        else:
+            found = await apply_score_delta(db, post_id, delta)
+    except IntegrityError:
+        # post_votes.post_id references a post that does not exist
+        found = None
+    if found is None:
+        await db.rollback()
+        raise HTTPException(status_code=404, detail="Post not found")
+    await db.commit()
+    if score_buffer.enabled:
+        score_buffer.add(post_id, delta)
+    if delta:
+        await cache.invalidate_namespace(FEED_NAMESPACE)
     return {"status": "success"}
 
 
+# ============ SEARCH ENDPOINT ============
+
+@router.get("/search", response_model=List[SearchResult])
+async def search_content(
+    response: Response,
+    q: str = Query(..., min_length=1, max_length=200),
+    type: Literal["posts", "messages"] = "posts",
+    user_id: Optional[int] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=100),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Best matches first; messages are searched only in ``user_id``'s conversations."""
+    if type == "messages" and user_id is None:
+        raise HTTPException(status_code=400, detail="user_id is required to search messages")
+    rows = await search(db, type, q, user_id, decode_rank_cursor(cursor), limit)
+
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last, rank = rows[-1]
+        last_id = last.id if type == "posts" else last.message_id
+        response.headers[NEXT_CURSOR_HEADER] = encode_rank_cursor(rank, last_id)
+
+    if type == "posts":
+        return [
+            SearchResult(
+                type="post", id=post.id, rank=rank, created_at=post.created_at, title=post.title,
+                description=post.description, resource_link=post.resource_link, score=post.score
+            )
+            for post, rank in rows
+        ]
+    return [
+        SearchResult(
+            type="message", id=message.message_id, rank=rank, created_at=message.created_at,
+            conversation_id=message.conversation_id, sender_id=message.sender_id, content=message.content
+        )
+        for message, rank in rows
+    ]
+
+
 # ============ STUDY GROUP ENDPOINTS ============
 
 class StudyGroupCreate(BaseModel):
@@ -417,47 +1070,125 @@ class StudyGroupCreate(BaseModel):
 class JoinGroupRequest(BaseModel):
     user_email: str
 
-@app.get("/study-groups")
-def get_study_groups(user_email: str, db: Session = Depends(get_db)):
-    members = db.query(models.StudyGroupMember).filter(
-        models.StudyGroupMember.user_email == user_email
-    ).all()
-    group_ids = [m.group_id for m in members]
-    groups = db.query(models.StudyGroup).filter(
-        models.StudyGroup.id.in_(group_ids)
-    ).all()
-    return [
-        {"id": g.id, "name": g.name, "created_at": g.created_at,
-         "member_count": len(g.members)}
-        for g in groups
-    ]
+@router.get("/study-groups")
+async def get_study_groups(user_email: str, db: AsyncSession = Depends(get_async_db)):
+    async def load():
+        member_count = select(func.count(models.StudyGroupMember.id)).where(
+            models.StudyGroupMember.group_id == models.StudyGroup.id
+        ).scalar_subquery()
+        rows = (await db.execute(
+            select(models.StudyGroup, member_count).where(
+                models.StudyGroup.id.in_(
+                    select(models.StudyGroupMember.group_id).where(models.StudyGroupMember.user_email == user_email)
+                )
+            )
+        )).all()
+        return [
+            {"id": g.id, "name": g.name, "created_at": g.created_at, "member_count": count}
+            for g, count in rows
+        ]
 
-@app.post("/study-groups")
-def create_study_group(body: StudyGroupCreate, db: Session = Depends(get_db)):
+    return await cache.read_through(study_groups_key(user_email), load)
+
+@router.post("/study-groups")
+async def create_study_group(body: StudyGroupCreate, db: AsyncSession = Depends(get_async_db)):
     group = models.StudyGroup(name=body.name)
     db.add(group)
-    db.flush()
+    await db.flush()
     db.add(models.StudyGroupMember(group_id=group.id, user_email=body.user_email))
-    db.commit()
-    db.refresh(group)
+    await db.commit()
+    await db.refresh(group)
+    await cache.delete(study_groups_key(body.user_email))
     return {"id": group.id, "name": group.name, "created_at": group.created_at}
 
-@app.post("/study-groups/{group_id}/join")
-def join_study_group(group_id: int, body: JoinGroupRequest, db: Session = Depends(get_db)):
-    group = db.query(models.StudyGroup).filter(models.StudyGroup.id == group_id).first()
+@router.post("/study-groups/{group_id}/join")
+async def join_study_group(group_id: int, body: JoinGroupRequest, db: AsyncSession = Depends(get_async_db)):
+    group = await db.get(models.StudyGroup, group_id)
     if not group:
         raise HTTPException(status_code=404, detail="Group not found")
-    existing = db.query(models.StudyGroupMember).filter(
-        models.StudyGroupMember.group_id == group_id,
-        models.StudyGroupMember.user_email == body.user_email
-    ).first()
-    if not existing:
+    member_emails = (await db.execute(
+        select(models.StudyGroupMember.user_email).where(models.StudyGroupMember.group_id == group_id)
+    )).scalars().all()
+    if body.user_email not in member_emails:
         db.add(models.StudyGroupMember(group_id=group_id, user_email=body.user_email))
-        db.commit()
+        await db.commit()
+        # Every member's list shows the new member count
+        await cache.delete(*(study_groups_key(email) for email in [*member_emails, body.user_email]))
     return {"id": group.id, "name": group.name}
 
-@app.get("/study-groups/{group_id}/suggestions")
-def get_group_suggestions(
+@router.get("/study-groups/suggestions")
+async def get_cross_group_suggestions(
+    range_start: str,
+    range_end: str,
+    user_email: Optional[str] = None,
+    emails: Optional[List[str]] = Query(None),
+    duration_minutes: int = 60,
+    slot_minutes: int = 30,
+    day_start_hour: int = 8,
+    day_end_hour: int = 22,
+    min_available_members: int = 1,
+    limit: int = Query(50, ge=1, le=500),
+    db: AsyncSession = Depends(get_async_read_db)
+):
+    """Suggestions for every group of ``user_email`` (at times they are free), or for one ad-hoc list of ``emails``."""
+    if (user_email is None) == (not emails):
+        raise HTTPException(status_code=400, detail="Pass either user_email or emails")
+    if duration_minutes <= 0 or slot_minutes <= 0 or duration_minutes % CELL_MINUTES or slot_minutes % CELL_MINUTES:
+        raise HTTPException(status_code=400, detail=f"Durations must be multiples of {CELL_MINUTES} minutes")
+    start, end = align_range(
+        datetime.fromisoformat(range_start.replace("Z", "+00:00")).replace(tzinfo=None),
+        datetime.fromisoformat(range_end.replace("Z", "+00:00")).replace(tzinfo=None)
+    )
+    if end <= start or end - start > MAX_RANGE:
+        raise HTTPException(status_code=400, detail=f"Range must be at most {MAX_RANGE.days} days")
+
+    if user_email is not None:
+        memberships = (await db.execute(
+            select(models.StudyGroup.id, models.StudyGroup.name, models.StudyGroupMember.user_email)
+            .join(models.StudyGroupMember, models.StudyGroupMember.group_id == models.StudyGroup.id)
+            .where(models.StudyGroup.id.in_(
+                select(models.StudyGroupMember.group_id).where(models.StudyGroupMember.user_email == user_email)
+            ))
+            .order_by(models.StudyGroup.id)
+        )).all()
+        names, members = {}, {}
+        for group_id, name, email in memberships:
+            names[group_id] = name
+            members.setdefault(group_id, set()).add(email)
+    else:
+        names, members = {None: None}, {None: set(emails)}
+    if not members:
+        return {"groups": []}
+
+    everyone = sorted(set().union(*members.values()))
+    row_of = {email: i for i, email in enumerate(everyone)}
+    busy = await busy_matrix(db, everyone, start, end)
+    # The matrix work is CPU-bound; keep it off the event loop
+    suggestions = await run_in_threadpool(
+        suggest_for_groups,
+        busy, {group_id: [row_of[email] for email in group] for group_id, group in members.items()}, start,
+        duration_minutes=duration_minutes,
+        slot_minutes=slot_minutes,
+        day_start_hour=day_start_hour,
+        day_end_hour=day_end_hour,
+        min_available_members=min_available_members,
+        limit=limit,
+        required_rows=[row_of[user_email]] if user_email is not None else ()
+    )
+    return {
+        "groups": [
+            {
+                "group_id": group_id,
+                "name": names[group_id],
+                "total_members": len(members[group_id]),
+                "suggestions": suggestions[group_id]
+            }
+            for group_id in members
+        ]
+    }
+
+@router.get("/study-groups/{group_id}/suggestions")
+async def get_group_suggestions(
     group_id: int,
     range_start: str,
     range_end: str,
@@ -467,48 +1198,51 @@ def get_group_suggestions(
     day_end_hour: int = 22,
     min_available_members: int = 1,
     user_timezone: str = "UTC",
-    db: Session = Depends(get_db)
+    limit: int = Query(50, ge=1, le=500),
+    db: AsyncSession = Depends(get_async_read_db)
 ):
-    from datetime import timedelta
-    group = db.query(models.StudyGroup).filter(models.StudyGroup.id == group_id).first()
+    group = await db.get(models.StudyGroup, group_id)
     if not group:
         raise HTTPException(status_code=404, detail="Group not found")
 
-    members = db.query(models.StudyGroupMember).filter(
-        models.StudyGroupMember.group_id == group_id
-    ).all()
-    member_emails = {m.user_email for m in members}
+    member_emails = set((await db.execute(
+        select(models.StudyGroupMember.user_email).where(
+            models.StudyGroupMember.group_id == group_id
+        )
+    )).scalars().all())
     total_members = len(member_emails)
 
     start = datetime.fromisoformat(range_start.replace("Z", "+00:00")).replace(tzinfo=None)
     end = datetime.fromisoformat(range_end.replace("Z", "+00:00")).replace(tzinfo=None)
 
-    busy_slots = db.query(models.UserAvailability).filter(
-        models.UserAvailability.user_email.in_(member_emails),
-        models.UserAvailability.starts_at < end,
-        models.UserAvailability.ends_at > start
-    ).all()
-
-    suggestions = []
-    slot_start = start
-    while slot_start + timedelta(minutes=duration_minutes) <= end:
-        slot_end = slot_start + timedelta(minutes=duration_minutes)
-        if day_start_hour <= slot_start.hour < day_end_hour:
-            busy_count = sum(
-                1 for b in busy_slots
-                if b.starts_at < slot_end and b.ends_at > slot_start
-            )
-            available = total_members - busy_count
-            if available >= min_available_members:
-                suggestions.append({
-                    "starts_at": slot_start.isoformat(),
-                    "ends_at": slot_end.isoformat(),
-                    "available_members": available,
-                    "total_members": total_members
-                })
-        slot_start += timedelta(minutes=slot_minutes)
+    busy_rows = (await db.execute(
+        select(
+            models.UserAvailability.user_email,
+            models.UserAvailability.starts_at,
+            models.UserAvailability.ends_at
+        ).where(
+            models.UserAvailability.user_email.in_(member_emails),
+            models.UserAvailability.starts_at < end,
+            models.UserAvailability.ends_at > start
+        )
+    )).all()
 
-    return {"suggestions": suggestions[:50]}
+    busy_by_member = {}
+    for email, starts_at, ends_at in busy_rows:
+        busy_by_member.setdefault(email, []).append((starts_at, ends_at))
+
+    # The sweep is CPU-bound; keep it off the event loop
+    suggestions = await run_in_threadpool(
+        suggest_slots,
+        busy_by_member, total_members, start, end,
+        duration_minutes=duration_minutes,
+        slot_minutes=slot_minutes,
+        day_start_hour=day_start_hour,
+        day_end_hour=day_end_hour,
+        min_available_members=min_available_members,
+        limit=limit
+    )
+    return {"suggestions": suggestions}
 
 
 # ============ STUDY SESSION ENDPOINTS ============
@@ -521,15 +1255,34 @@ class StudySessionCreate(BaseModel):
     ends_at: str
     group_id: Optional[int] = None
 
-@app.get("/study-sessions")
-def get_study_sessions(user_email: str, range_start: str, range_end: str, db: Session = Depends(get_db)):
+@router.get("/study-sessions")
+def get_study_sessions(
+    request: Request,
+    response: Response,
+    user_email: str,
+    range_start: str,
+    range_end: str,
+    db: Session = Depends(get_read_db)
+):
     start = datetime.fromisoformat(range_start.replace("Z", "+00:00")).replace(tzinfo=None)
     end = datetime.fromisoformat(range_end.replace("Z", "+00:00")).replace(tzinfo=None)
-    sessions = db.query(models.StudySession).filter(
+    in_range = (
         models.StudySession.creator_email == user_email,
         models.StudySession.starts_at >= start,
         models.StudySession.starts_at < end
-    ).order_by(models.StudySession.starts_at.asc()).all()
+    )
+    # Sessions are never edited, so the newest id and the count identify the set
+    last_id, count, last_created_at = db.query(
+        func.max(models.StudySession.id), func.count(models.StudySession.id),
+        func.max(models.StudySession.created_at)
+    ).filter(*in_range).one()
+    unchanged = not_modified(
+        request, response, make_etag("study-sessions", user_email, start, end, last_id, count), last_created_at
+    )
+    if unchanged:
+        return unchanged
+
+    sessions = db.query(models.StudySession).filter(*in_range).order_by(models.StudySession.starts_at.asc()).all()
     return [
         {
             "id": s.id,
@@ -543,7 +1296,95 @@ def get_study_sessions(user_email: str, range_start: str, range_end: str, db: Se
         for s in sessions
     ]
 
-@app.post("/study-sessions")
+SESSION_EXPORT_COLUMNS = (
+    models.StudySession.id,
+    models.StudySession.title,
+    models.StudySession.session_type,
+    models.StudySession.starts_at,
+    models.StudySession.ends_at,
+    models.StudySession.group_id,
+    models.StudySession.creator_email,
+    models.StudySession.created_at,
+)
+
+def _session_range(range_start: Optional[str], range_end: Optional[str]):
+    conditions = []
+    if range_start:
+        start = datetime.fromisoformat(range_start.replace("Z", "+00:00")).replace(tzinfo=None)
+        conditions.append(models.StudySession.starts_at >= start)
+    if range_end:
+        end = datetime.fromisoformat(range_end.replace("Z", "+00:00")).replace(tzinfo=None)
+        conditions.append(models.StudySession.starts_at < end)
+    return conditions
+
+def _stream_sessions(request: Request, response: Response, db: Session, statement, format: str, name: str, key, *last_modified):
+    """Stream the sessions ``statement`` selects as ICS or NDJSON, or a 304 if the client has them."""
+    listed = statement.subquery()
+    last_id, count, last_created_at = db.execute(
+        select(func.max(listed.c.id), func.count(), func.max(listed.c.created_at))
+    ).one()
+    unchanged = not_modified(
+        request, response, make_etag("session-export", format, *key, last_id, count), last_created_at, *last_modified
+    )
+    if unchanged:
+        return unchanged
+
+    # The stream checks out its own connection; give this one back instead of holding both until it ends
+    db.close()
+    batches = stream_rows(select(listed).order_by(listed.c.starts_at, listed.c.id))
+    if format == "ics":
+        return StreamingResponse(ics_feed(name, batches), media_type=ICS_MEDIA_TYPE, headers=dict(response.headers))
+    return StreamingResponse(ndjson(batches), media_type=NDJSON_MEDIA_TYPE, headers=dict(response.headers))
+
+@router.get("/study-sessions/export")
+def export_study_sessions(
+    request: Request,
+    response: Response,
+    user_email: str,
+    format: Literal["ics", "ndjson"] = "ics",
+    range_start: Optional[str] = None,
+    range_end: Optional[str] = None,
+    db: Session = Depends(get_db)
+):
+    """Sessions the user created or that belong to one of their groups, as a calendar feed or NDJSON."""
+    in_range = _session_range(range_start, range_end)
+    member_groups = select(models.StudyGroupMember.group_id).where(models.StudyGroupMember.user_email == user_email)
+    # A UNION lets each branch use its own index, where an OR would scan
+    statement = union(
+        select(*SESSION_EXPORT_COLUMNS).where(models.StudySession.creator_email == user_email, *in_range),
+        select(*SESSION_EXPORT_COLUMNS).where(models.StudySession.group_id.in_(member_groups), *in_range)
+    )
+    # Joining a group adds its sessions without a newer created_at
+    joined_at = db.query(func.max(models.StudyGroupMember.joined_at)).filter(
+        models.StudyGroupMember.user_email == user_email
+    ).scalar()
+    return _stream_sessions(
+        request, response, db, statement, format, f"StudySync: {user_email}",
+        (user_email, range_start, range_end), joined_at
+    )
+
+@router.get("/study-groups/{group_id}/sessions/export")
+def export_group_sessions(
+    request: Request,
+    response: Response,
+    group_id: int,
+    format: Literal["ics", "ndjson"] = "ics",
+    range_start: Optional[str] = None,
+    range_end: Optional[str] = None,
+    db: Session = Depends(get_db)
+):
+    group = db.get(models.StudyGroup, group_id)
+    if not group:
+        raise HTTPException(status_code=404, detail="Group not found")
+    statement = select(*SESSION_EXPORT_COLUMNS).where(
+        models.StudySession.group_id == group_id, *_session_range(range_start, range_end)
+    )
+    return _stream_sessions(
+        request, response, db, statement, format, f"StudySync: {group.name}",
+        (group_id, group.name, range_start, range_end)
+    )
+
+@router.post("/study-sessions")
 def create_study_session(body: StudySessionCreate, db: Session = Depends(get_db)):
     session = models.StudySession(
         creator_email=body.creator_email,
@@ -580,24 +1421,30 @@ class AvailabilitySync(BaseModel):
     source: str = "google_calendar"
     busy_slots: List[BusySlot]
 
-@app.post("/availability/sync")
-def sync_availability(body: AvailabilitySync, db: Session = Depends(get_db)):
+@router.post("/availability/sync", status_code=status.HTTP_202_ACCEPTED)
+async def sync_availability(body: AvailabilitySync, response: Response, db: AsyncSession = Depends(get_async_db)):
+    """Queue the sync and return its job; ``GET /jobs/{job_id}`` has the counts once it has run."""
     range_start = datetime.fromisoformat(body.starts_at.replace("Z", "+00:00")).replace(tzinfo=None)
     range_end = datetime.fromisoformat(body.ends_at.replace("Z", "+00:00")).replace(tzinfo=None)
-    # Delete old blocks in range
-    db.query(models.UserAvailability).filter(
-        models.UserAvailability.user_email == body.user_email,
-        models.UserAvailability.starts_at >= range_start,
-        models.UserAvailability.ends_at <= range_end
-    ).delete(synchronize_session=False)
-    count = 0
-    for slot in body.busy_slots:
-        db.add(models.UserAvailability(
-            user_email=body.user_email,
-            starts_at=datetime.fromisoformat(slot.starts_at.replace("Z", "+00:00")).replace(tzinfo=None),
-            ends_at=datetime.fromisoformat(slot.ends_at.replace("Z", "+00:00")).replace(tzinfo=None),
-            source=body.source
-        ))
-        count += 1
-    db.commit()
-    return {"inserted_busy_blocks": count}
+    busy = [
+        (
+            datetime.fromisoformat(slot.starts_at.replace("Z", "+00:00")).replace(tzinfo=None),
+            datetime.fromisoformat(slot.ends_at.replace("Z", "+00:00")).replace(tzinfo=None)
+        )
+        for slot in body.busy_slots
+    ]
+    payload, dedup_key = sync_job(body.user_email, range_start, range_end, busy, body.source)
+    job = await enqueue(db, AVAILABILITY_SYNC_JOB, payload, dedup_key=dedup_key)
+    response.headers["Location"] = f"/jobs/{job.id}"
+    return describe(job)
+
+
+@router.get("/jobs/{job_id}")
+async def get_job(job_id: int, db: AsyncSession = Depends(get_async_db)):
+    job = await db.get(models.Job, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return describe(job)
+
+
+app = create_app()
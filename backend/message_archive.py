@@ -0,0 +1,212 @@
+"""Cold storage for archived months of messages.
+
+Each archived month is two files in ``MESSAGE_ARCHIVE_DIR``:
+
+- ``messages-YYYY-MM.<version>.ndjson.gz`` holds the month's messages, one JSON
+  object per line with every column of the row. They are ordered by
+  conversation, then ``created_at`` and ``message_id``. Direct messages, which
+  have no conversation, come last under the ``"direct"`` key. Each conversation is cut into chunks of ``ARCHIVE_CHUNK_ROWS``
+  messages, and every chunk is its own gzip member, so the file as a whole is
+  still an ordinary gzip stream.
+- ``messages-YYYY-MM.json`` is the manifest. It names the data file and maps each
+  conversation to its chunks: byte offset, length, row count, and the first and
+  last ``(created_at, message_id)``. A page of history therefore decompresses
+  only the chunks it needs.
+
+A month is written under a new version and the manifest is swapped in last, so a
+reader never sees a partial month. Archiving more rows into a month that is
+already archived merges them with what is there.
+"""
+import gzip
+import heapq
+import itertools
+import json
+import os
+import uuid
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+ARCHIVE_DIR = os.getenv(
+    "MESSAGE_ARCHIVE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "archive", "messages")
+)
+ARCHIVE_CHUNK_ROWS = 1000
+# Manifest key of the rows without a conversation, i.e. the /messages direct messages
+DIRECT = "direct"
+
+# month label -> (manifest mtime, manifest)
+_manifests: Dict[str, Tuple[float, dict]] = {}
+
+
+def month_label(month: datetime) -> str:
+    return f"{month.year:04d}-{month.month:02d}"
+
+
+def _manifest_path(label: str) -> str:
+    return os.path.join(ARCHIVE_DIR, f"messages-{label}.json")
+
+
+def _timestamp(moment: datetime) -> str:
+    # Fixed width, so stored timestamps also order correctly as strings
+    return moment.isoformat(timespec="microseconds")
+
+
+def _record(row) -> dict:
+    record = dict(row if isinstance(row, dict) else row._asdict())
+    for field, value in record.items():
+        if isinstance(value, datetime):
+            record[field] = _timestamp(value)
+    return record
+
+
+def _sort_key(record: dict):
+    conversation_id = record["conversation_id"]
+    return conversation_id is None, conversation_id or 0, record["created_at"], record["message_id"]
+
+
+def _chunks_key(key: str):
+    return key == DIRECT, 0 if key == DIRECT else int(key)
+
+
+def archived_months() -> List[str]:
+    """Labels of the archived months, oldest first."""
+    try:
+        names = os.listdir(ARCHIVE_DIR)
+    except FileNotFoundError:
+        return []
+    return sorted(name[len("messages-"):-len(".json")] for name in names if name.endswith(".json"))
+
+
+def _manifest(label: str) -> Optional[dict]:
+    path = _manifest_path(label)
+    try:
+        mtime = os.stat(path).st_mtime
+    except FileNotFoundError:
+        return None
+    cached = _manifests.get(label)
+    if cached is None or cached[0] != mtime:
+        with open(path) as f:
+            cached = _manifests[label] = (mtime, json.load(f))
+    return cached[1]
+
+
+def _read_chunk(manifest: dict, offset: int, length: int) -> List[dict]:
+    with open(os.path.join(ARCHIVE_DIR, manifest["data"]), "rb") as f:
+        f.seek(offset)
+        payload = gzip.decompress(f.read(length))
+    return [json.loads(line) for line in payload.splitlines()]
+
+
+def _iter_month(label: str) -> Iterator[dict]:
+    manifest = _manifest(label)
+    if manifest is None:
+        return
+    for conversation_id in sorted(manifest["conversations"], key=_chunks_key):
+        for offset, length, *_ in manifest["conversations"][conversation_id]:
+            yield from _read_chunk(manifest, offset, length)
+
+
+def write_month(month: datetime, rows: Iterable) -> int:
+    """Archive ``rows`` (in ``_sort_key`` order) under ``month``; returns the month's total."""
+    label = month_label(month)
+    previous = _manifest(label)
+    rows = iter(rows)
+    first = next(rows, None)
+    if first is None:
+        return previous["rows"] if previous else 0
+    os.makedirs(ARCHIVE_DIR, exist_ok=True)
+    new = (_record(row) for row in itertools.chain([first], rows))
+    merged = heapq.merge(_iter_month(label), new, key=_sort_key)
+    data_name = f"messages-{label}.{uuid.uuid4().hex[:12]}.ndjson.gz"
+    conversations, total = {}, 0
+    with open(os.path.join(ARCHIVE_DIR, data_name), "wb") as f:
+        # A row archived twice (after a run that failed before deleting it) is kept once
+        unique = (next(group) for _, group in itertools.groupby(merged, key=_sort_key))
+        for conversation_id, group in itertools.groupby(unique, key=lambda record: record["conversation_id"]):
+            chunks = conversations.setdefault(DIRECT if conversation_id is None else str(conversation_id), [])
+            while True:
+                chunk = list(itertools.islice(group, ARCHIVE_CHUNK_ROWS))
+                if not chunk:
+                    break
+                member = gzip.compress("".join(json.dumps(record, default=str) + "\n" for record in chunk).encode())
+                chunks.append([
+                    f.tell(), len(member), len(chunk), chunk[0]["created_at"], chunk[0]["message_id"],
+                    chunk[-1]["created_at"], chunk[-1]["message_id"],
+                ])
+                f.write(member)
+                total += len(chunk)
+        f.flush()
+        os.fsync(f.fileno())
+
+    manifest = {"month": label, "data": data_name, "rows": total, "conversations": conversations}
+    temporary = _manifest_path(label) + ".tmp"
+    with open(temporary, "w") as f:
+        json.dump(manifest, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temporary, _manifest_path(label))
+    if previous is not None:
+        try:
+            os.remove(os.path.join(ARCHIVE_DIR, previous["data"]))
+        except FileNotFoundError:
+            pass
+    return total
+
+
+def _as_message(record: dict) -> dict:
+    return {**record, "created_at": datetime.fromisoformat(record["created_at"])}
+
+
+def read_history(
+    conversation_id: int,
+    before: Optional[Tuple[datetime, int]] = None,
+    after: Optional[Tuple[datetime, int]] = None,
+    limit: int = 50,
+) -> List[dict]:
+    """Up to ``limit`` archived messages of a conversation: newest first, or oldest first after ``after``."""
+    key = str(conversation_id)
+    after_key = after and (_timestamp(after[0]), after[1])
+    before_key = before and (_timestamp(before[0]), before[1])
+    months = archived_months()
+    messages = []
+    for label in (months if after else reversed(months)):
+        manifest = _manifest(label)
+        chunks = manifest["conversations"].get(key, []) if manifest else []
+        for offset, length, _, first_at, first_id, last_at, last_id in (chunks if after else reversed(chunks)):
+            if after_key and (last_at, last_id) <= after_key:
+                continue
+            if before_key and (first_at, first_id) >= before_key:
+                continue
+            records = _read_chunk(manifest, offset, length)
+            if after_key:
+                records = [r for r in records if (r["created_at"], r["message_id"]) > after_key]
+            else:
+                records = [
+                    r for r in reversed(records) if not before_key or (r["created_at"], r["message_id"]) < before_key
+                ]
+            messages.extend(_as_message(record) for record in records)
+            if len(messages) >= limit:
+                return messages[:limit]
+    return messages
+
+
+def iter_conversation(conversation_id: int) -> Iterator[List[dict]]:
+    """All archived messages of a conversation in chronological order, one chunk at a time."""
+    key = str(conversation_id)
+    for label in archived_months():
+        manifest = _manifest(label)
+        for offset, length, *_ in (manifest["conversations"].get(key, []) if manifest else []):
+            yield [_as_message(record) for record in _read_chunk(manifest, offset, length)]
+
+
+def read_direct_messages(user1: str, user2: str) -> List[dict]:
+    """Archived direct messages between two Firebase users, oldest first."""
+    users = {user1, user2}
+    messages = []
+    for label in archived_months():
+        manifest = _manifest(label)
+        for offset, length, *_ in (manifest["conversations"].get(DIRECT, []) if manifest else []):
+            messages.extend(
+                _as_message(record) for record in _read_chunk(manifest, offset, length)
+                if {record.get("sender_uid"), record.get("receiver_uid")} == users
+            )
+    return messages
@@ -0,0 +1,206 @@
+"""Monthly partitions of ``messages`` and archival of old months to cold storage.
+
+On PostgreSQL, migration 0008 makes ``messages`` a table partitioned by range of
+``created_at``, with one partition per calendar month (``messages_y2026m01``) and
+a default partition that catches anything outside them. Each month's indexes are
+only as large as that month, and old months can be dropped whole.
+
+``ensure_partitions`` creates the partitions for the current month and the next
+``MESSAGE_PARTITIONS_AHEAD`` months. It also gives their own partition to any
+months that have collected rows in the default partition, for example after a
+bulk load of old history.
+
+``archive_old_months`` moves every month older than ``MESSAGE_RETENTION_MONTHS``
+to ``message_archive``. The history and export endpoints still read from there.
+A month is written to the archive and synced to disk first. Only then is its
+partition dropped (on SQLite, or for rows in the default partition, they are
+deleted). A run that fails in between archives the same rows again next time,
+and the archive keeps each row once.
+
+Both run every ``MESSAGE_MAINTENANCE_SECONDS`` (default one day, 0 disables it)
+while the app is up, and on demand with ``python message_partitions.py``.
+Retention defaults to 0, which keeps every message in the database.
+"""
+import argparse
+import asyncio
+import logging
+import os
+import re
+from datetime import datetime
+from typing import List, Optional
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import func, literal_column, select, text
+from sqlalchemy.engine import Connection
+
+import database
+import message_archive
+import models
+
+logger = logging.getLogger(__name__)
+
+MESSAGE_PARTITIONS_AHEAD = int(os.getenv("MESSAGE_PARTITIONS_AHEAD", "3"))
+MESSAGE_RETENTION_MONTHS = int(os.getenv("MESSAGE_RETENTION_MONTHS", "0"))
+MESSAGE_MAINTENANCE_SECONDS = float(os.getenv("MESSAGE_MAINTENANCE_SECONDS", "86400"))
+DEFAULT_PARTITION = "messages_default"
+PARTITION_NAME = re.compile(r"^messages_(y(\d{4})m(\d{2})|default)$")
+# Keeps two workers from maintaining the table at the same time
+ADVISORY_LOCK_KEY = 3930021
+
+
+def month_start(moment: datetime) -> datetime:
+    return moment.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def add_months(month: datetime, months: int) -> datetime:
+    index = month.year * 12 + month.month - 1 + months
+    return month.replace(year=index // 12, month=index % 12 + 1)
+
+
+def partition_name(month: datetime) -> str:
+    return f"messages_y{month.year:04d}m{month.month:02d}"
+
+
+def is_partitioned(conn: Connection) -> bool:
+    if conn.dialect.name != "postgresql":
+        return False
+    return conn.execute(text(
+        "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass('messages'))"
+    )).scalar()
+
+
+def partition_months(conn: Connection) -> List[datetime]:
+    """Months that have their own partition, oldest first."""
+    names = conn.execute(text(
+        "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+        "WHERE i.inhparent = to_regclass('messages')"
+    )).scalars()
+    months = []
+    for name in names:
+        match = PARTITION_NAME.match(name)
+        if match and match.group(2):
+            months.append(datetime(int(match.group(2)), int(match.group(3)), 1))
+    return sorted(months)
+
+
+def create_partition(conn: Connection, month: datetime) -> bool:
+    """Create ``month``'s partition unless it exists, moving its rows out of the default partition."""
+    name = partition_name(month)
+    if conn.execute(text("SELECT to_regclass(:name)"), {"name": name}).scalar() is not None:
+        return False
+    bounds = {"start": month, "end": add_months(month, 1)}
+    conn.execute(text(f"CREATE TABLE {name} (LIKE messages INCLUDING DEFAULTS)"))
+    conn.execute(text(
+        f"WITH moved AS (DELETE FROM {DEFAULT_PARTITION} WHERE created_at >= :start AND created_at < :end "
+        f"RETURNING *) INSERT INTO {name} SELECT * FROM moved"
+    ), bounds)
+    # Bounds are literals in DDL; these come from a datetime, never from input
+    conn.execute(text(
+        f"ALTER TABLE messages ATTACH PARTITION {name} "
+        f"FOR VALUES FROM ('{bounds['start'].isoformat(' ')}') TO ('{bounds['end'].isoformat(' ')}')"
+    ))
+    return True
+
+
+def ensure_partitions(
+    conn: Connection,
+    now: Optional[datetime] = None,
+    ahead: int = MESSAGE_PARTITIONS_AHEAD,
+    since: Optional[datetime] = None,
+) -> List[str]:
+    """Create the partitions that are due, and any back to ``since``; returns the new ones. The caller commits."""
+    if not is_partitioned(conn):
+        return []
+    current = month_start(now or datetime.utcnow())
+    months = {add_months(current, i) for i in range(ahead + 1)}
+    month = month_start(since or current)
+    while month < current:
+        months.add(month)
+        month = add_months(month, 1)
+    months.update(conn.execute(text(
+        f"SELECT DISTINCT date_trunc('month', created_at) FROM {DEFAULT_PARTITION}"
+    )).scalars())
+    return [partition_name(month) for month in sorted(months) if create_partition(conn, month)]
+
+
+def _months_before(conn: Connection, cutoff: datetime, partitioned: bool) -> List[datetime]:
+    if partitioned:
+        months = {month for month in partition_months(conn) if month < cutoff}
+        oldest = conn.execute(text(f"SELECT min(created_at) FROM {DEFAULT_PARTITION}")).scalar()
+    else:
+        months = set()
+        oldest = conn.execute(select(func.min(models.Message.created_at))).scalar()
+    month = month_start(oldest) if oldest else cutoff
+    while month < cutoff:
+        months.add(month)
+        month = add_months(month, 1)
+    return sorted(months)
+
+
+def archive_old_months(
+    conn: Connection, now: Optional[datetime] = None, retention: int = MESSAGE_RETENTION_MONTHS
+) -> List[str]:
+    """Move the months older than ``retention`` months to cold storage; returns the archived months."""
+    if retention <= 0:
+        return []
+    cutoff = add_months(month_start(now or datetime.utcnow()), -retention)
+    partitioned = is_partitioned(conn)
+    Message = models.Message
+    archived = []
+    for month in _months_before(conn, cutoff, partitioned):
+        end = add_months(month, 1)
+        in_month = (Message.created_at >= month, Message.created_at < end)
+        # Every column, including the direct-message ones the model does not map
+        with conn.execute(
+            select(literal_column("*")).select_from(Message.__table__)
+            .where(*in_month)
+            .order_by(Message.conversation_id.asc().nulls_last(), Message.created_at, Message.message_id)
+            .execution_options(yield_per=message_archive.ARCHIVE_CHUNK_ROWS)
+        ) as rows:
+            total = message_archive.write_month(month, rows)
+        if partitioned and month in partition_months(conn):
+            name = partition_name(month)
+            conn.execute(text(f"ALTER TABLE messages DETACH PARTITION {name}"))
+            conn.execute(text(f"DROP TABLE {name}"))
+        # Whatever is left of the month (all of it without partitions) is deleted row by row
+        conn.execute(Message.__table__.delete().where(*in_month))
+        conn.commit()
+        archived.append(message_archive.month_label(month))
+        logger.info("Archived %s: %d messages in cold storage", archived[-1], total)
+    return archived
+
+
+def maintain(now: Optional[datetime] = None) -> dict:
+    """Create due partitions, then archive expired months."""
+    with database.engine.connect() as conn:
+        if conn.dialect.name == "postgresql" and not conn.execute(
+            text("SELECT pg_try_advisory_lock(:key)"), {"key": ADVISORY_LOCK_KEY}
+        ).scalar():
+            return {"created": [], "archived": [], "skipped": True}
+        try:
+            created = ensure_partitions(conn, now)
+            conn.commit()
+            archived = archive_old_months(conn, now)
+        finally:
+            if conn.dialect.name == "postgresql":
+                conn.rollback()
+                conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": ADVISORY_LOCK_KEY})
+                conn.commit()
+    return {"created": created, "archived": archived, "skipped": False}
+
+
+async def maintain_periodically(interval: float = MESSAGE_MAINTENANCE_SECONDS) -> None:
+    while True:
+        try:
+            result = await run_in_threadpool(maintain)
+            if result["created"] or result["archived"]:
+                logger.info("Message partitions created %s, archived %s", result["created"], result["archived"])
+        except Exception:
+            logger.exception("Message partition maintenance failed")
+        await asyncio.sleep(interval)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--now", type=datetime.fromisoformat, help="pretend it is this time (default: now, UTC)")
+    print(maintain(parser.parse_args().now))
@@ -0,0 +1,231 @@
+"""Per-request SQL instrumentation and Prometheus metrics.
+
+``instrument_engine`` attaches SQLAlchemy event hooks that count statements, DB
+time and pool checkout wait against the request currently being served;
+``MetricsMiddleware`` opens that per-request record, observes the histograms when
+the response is done and warns when one statement shape repeats more than
+``N_PLUS_ONE_THRESHOLD`` times (the usual sign of an N+1 loop).
+
+Set ``METRICS_ENABLED=false`` to skip both; nothing is hooked in that case.
+"""
+import contextvars
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import event
+
+logger = logging.getLogger(__name__)
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() in ("1", "true", "yes")
+N_PLUS_ONE_THRESHOLD = int(os.getenv("N_PLUS_ONE_THRESHOLD", "10"))
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 500)
+
+
+class RequestStats:
+    __slots__ = ("route", "query_count", "db_time", "pool_wait", "statements")
+
+    def __init__(self):
+        self.route = None
+        self.query_count = 0
+        self.db_time = 0.0
+        self.pool_wait = 0.0
+        self.statements = Counter()
+
+
+_current: contextvars.ContextVar[Optional[RequestStats]] = contextvars.ContextVar("request_stats", default=None)
+
+
+class Histogram:
+    def __init__(self, name: str, documentation: str, buckets: Tuple[float, ...], labels: Tuple[str, ...]):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = buckets
+        self.labels = labels
+        self._series: Dict[tuple, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *label_values) -> None:
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                # bucket counts, then sum and count
+                series = self._series[label_values] = [0] * len(self.buckets) + [0.0, 0]
+            i = bisect_left(self.buckets, value)
+            if i < len(self.buckets):
+                series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def total(self) -> Tuple[float, int]:
+        """Sum and count of all observations across every label set."""
+        with self._lock:
+            return sum(s[-2] for s in self._series.values()), sum(s[-1] for s in self._series.values())
+
+    def render(self):
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} histogram"
+        with self._lock:
+            snapshot = {k: list(v) for k, v in self._series.items()}
+        for label_values, series in sorted(snapshot.items()):
+            labels = _labels(self.labels, label_values)
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                yield f'{self.name}_bucket{{{labels},le="{bound}"}} {cumulative}'
+            yield f'{self.name}_bucket{{{labels},le="+Inf"}} {series[-1]}'
+            yield f"{self.name}_sum{{{labels}}} {series[-2]}"
+            yield f"{self.name}_count{{{labels}}} {series[-1]}"
+
+
+class CounterMetric:
+    def __init__(self, name: str, documentation: str, labels: Tuple[str, ...]):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self._values: Dict[tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount: float = 1) -> None:
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def render(self):
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} counter"
+        with self._lock:
+            snapshot = dict(self._values)
+        for label_values, value in sorted(snapshot.items()):
+            yield f"{self.name}{{{_labels(self.labels, label_values)}}} {value}"
+
+
+def _labels(names, values) -> str:
+    return ",".join(
+        '{}="{}"'.format(n, str(v).replace("\\", "\\\\").replace('"', '\\"')) for n, v in zip(names, values)
+    )
+
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds", "Response latency.", LATENCY_BUCKETS, ("method", "route", "status")
+)
+REQUEST_QUERIES = Histogram(
+    "db_queries_per_request", "SQL statements executed per request.", QUERY_COUNT_BUCKETS, ("method", "route")
+)
+REQUEST_DB_TIME = Histogram(
+    "db_time_per_request_seconds", "Total SQL execution time per request.", LATENCY_BUCKETS, ("method", "route")
+)
+POOL_WAIT = Histogram(
+    "db_pool_checkout_wait_seconds", "Time spent waiting for a pooled connection per request.",
+    LATENCY_BUCKETS, ("method", "route")
+)
+N_PLUS_ONE = CounterMetric(
+    "db_repeated_statement_warnings_total", "Requests that repeated one statement shape too often.",
+    ("method", "route")
+)
+CACHE_REQUESTS = CounterMetric(
+    "cache_requests_total", "Response cache lookups by key prefix and result (hit or miss).",
+    ("namespace", "result")
+)
+REGISTRY = (REQUEST_LATENCY, REQUEST_QUERIES, REQUEST_DB_TIME, POOL_WAIT, N_PLUS_ONE, CACHE_REQUESTS)
+
+
+def render_metrics() -> str:
+    return "\n".join(line for metric in REGISTRY for line in metric.render()) + "\n"
+
+
+# ============ ENGINE HOOKS ============
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current.get() is not None:
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _current.get()
+    if stats is None:
+        return
+    started = conn.info.get("query_start")
+    if started:
+        stats.db_time += time.perf_counter() - started.pop()
+    stats.query_count += 1
+    stats.statements[statement] += 1
+
+
+def _time_pool_checkout(pool) -> None:
+    # The pool has no "before checkout" event, so time the call that blocks on it.
+    connect = pool.connect
+
+    def timed_connect():
+        stats = _current.get()
+        if stats is None:
+            return connect()
+        started = time.perf_counter()
+        try:
+            return connect()
+        finally:
+            stats.pool_wait += time.perf_counter() - started
+
+    pool.connect = timed_connect
+
+
+def instrument_engine(engine) -> None:
+    """Attach the hooks to a sync Engine (pass ``async_engine.sync_engine`` for async ones)."""
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    _time_pool_checkout(engine.pool)
+    # dispose() swaps in a fresh pool
+    event.listen(engine, "engine_disposed", lambda e: _time_pool_checkout(e.pool))
+
+
+# ============ ASGI MIDDLEWARE ============
+
+class MetricsMiddleware:
+    def __init__(self, app, n_plus_one_threshold: int = N_PLUS_ONE_THRESHOLD):
+        self.app = app
+        self.n_plus_one_threshold = n_plus_one_threshold
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = _current.set(stats)
+        status = 500
+        started = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current.reset(token)
+            elapsed = time.perf_counter() - started
+            route = getattr(scope.get("route"), "path", None) or "unmatched"
+            method = scope["method"]
+            REQUEST_LATENCY.observe(elapsed, method, route, status)
+            REQUEST_QUERIES.observe(stats.query_count, method, route)
+            REQUEST_DB_TIME.observe(stats.db_time, method, route)
+            POOL_WAIT.observe(stats.pool_wait, method, route)
+            self._check_repeats(stats, method, route)
+
+    def _check_repeats(self, stats: RequestStats, method: str, route: str) -> None:
+        if not stats.statements:
+            return
+        statement, count = stats.statements.most_common(1)[0]
+        if count > self.n_plus_one_threshold:
+            N_PLUS_ONE.inc(method, route)
+            logger.warning(
+                "Possible N+1 in %s %s: statement ran %d times: %s",
+                method, route, count, " ".join(statement.split())[:200]
+            )
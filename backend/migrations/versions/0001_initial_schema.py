@@ -0,0 +1,131 @@
+"""Initial schema, as previously created by Base.metadata.create_all
+
+Databases that were set up by create_all should be stamped at this revision
+(`alembic stamp 0001`) before running `alembic upgrade head`.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "users",
+        sa.Column("user_id", sa.Integer(), primary_key=True),
+        sa.Column("firebase_uid", sa.String(), nullable=False),
+        sa.Column("email", sa.String(), nullable=False),
+        sa.Column("full_name", sa.String()),
+        sa.Column("role", sa.String()),
+        sa.Column("google_calendar_token", sa.String(), nullable=True),
+        sa.Column("created_at", sa.DateTime()),
+    )
+    op.create_index("ix_users_user_id", "users", ["user_id"])
+    op.create_index("ix_users_firebase_uid", "users", ["firebase_uid"], unique=True)
+    op.create_index("ix_users_email", "users", ["email"], unique=True)
+
+    op.create_table(
+        "conversations",
+        sa.Column("conversation_id", sa.Integer(), primary_key=True),
+        sa.Column("is_group", sa.Boolean()),
+        sa.Column("group_name", sa.String(), nullable=True),
+        sa.Column("created_at", sa.DateTime()),
+    )
+    op.create_index("ix_conversations_conversation_id", "conversations", ["conversation_id"])
+
+    op.create_table(
+        "conversation_participants",
+        sa.Column("participant_id", sa.Integer(), primary_key=True),
+        sa.Column("conversation_id", sa.Integer(), sa.ForeignKey("conversations.conversation_id"), nullable=False),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.user_id"), nullable=False),
+        sa.Column("joined_at", sa.DateTime()),
+    )
+    op.create_index("ix_conversation_participants_participant_id", "conversation_participants", ["participant_id"])
+
+    op.create_table(
+        "messages",
+        sa.Column("message_id", sa.Integer(), primary_key=True),
+        sa.Column("conversation_id", sa.Integer(), sa.ForeignKey("conversations.conversation_id"), nullable=False),
+        sa.Column("sender_id", sa.Integer(), sa.ForeignKey("users.user_id"), nullable=False),
+        sa.Column("content", sa.Text(), nullable=False),
+        sa.Column("created_at", sa.DateTime()),
+    )
+    op.create_index("ix_messages_message_id", "messages", ["message_id"])
+
+    op.create_table(
+        "posts",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("author_uid", sa.String(), sa.ForeignKey("users.firebase_uid"), nullable=False),
+        sa.Column("title", sa.String(), nullable=False),
+        sa.Column("description", sa.Text(), nullable=True),
+        sa.Column("resource_link", sa.String(), nullable=True),
+        sa.Column("score", sa.Integer()),
+        sa.Column("created_at", sa.DateTime()),
+    )
+    op.create_index("ix_posts_id", "posts", ["id"])
+
+    op.create_table(
+        "post_votes",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("post_id", sa.Integer(), sa.ForeignKey("posts.id"), nullable=False),
+        sa.Column("user_uid", sa.String(), nullable=False),
+        sa.Column("vote", sa.Integer(), nullable=False),
+    )
+    op.create_index("ix_post_votes_id", "post_votes", ["id"])
+
+    op.create_table(
+        "study_groups",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("name", sa.String(), nullable=False),
+        sa.Column("created_at", sa.DateTime()),
+    )
+    op.create_index("ix_study_groups_id", "study_groups", ["id"])
+
+    op.create_table(
+        "study_group_members",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("group_id", sa.Integer(), sa.ForeignKey("study_groups.id"), nullable=False),
+        sa.Column("user_email", sa.String(), nullable=False),
+        sa.Column("joined_at", sa.DateTime()),
+    )
+    op.create_index("ix_study_group_members_id", "study_group_members", ["id"])
+
+    op.create_table(
+        "study_sessions",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("creator_email", sa.String(), nullable=False),
+        sa.Column("session_type", sa.String()),
+        sa.Column("title", sa.String(), nullable=False),
+        sa.Column("starts_at", sa.DateTime(), nullable=False),
+        sa.Column("ends_at", sa.DateTime(), nullable=False),
+        sa.Column("group_id", sa.Integer(), sa.ForeignKey("study_groups.id"), nullable=True),
+        sa.Column("created_at", sa.DateTime()),
+    )
+    op.create_index("ix_study_sessions_id", "study_sessions", ["id"])
+
+    op.create_table(
+        "user_availability",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("user_email", sa.String(), nullable=False),
+        sa.Column("starts_at", sa.DateTime(), nullable=False),
+        sa.Column("ends_at", sa.DateTime(), nullable=False),
+        sa.Column("source", sa.String()),
+        sa.Column("created_at", sa.DateTime()),
+    )
+    op.create_index("ix_user_availability_id", "user_availability", ["id"])
+
+
+def downgrade():
+    for table in (
+        "user_availability", "study_sessions", "study_group_members", "study_groups", "post_votes",
+        "posts", "messages", "conversation_participants", "conversations", "users",
+    ):
+        op.drop_table(table)
@@ -0,0 +1,62 @@
+"""Composite and unique indexes for the endpoint hot paths, plus read pointers
+
+On PostgreSQL the indexes are built with CREATE INDEX CONCURRENTLY outside a
+transaction, so the tables stay writable while this runs. Duplicate rows that
+would block the unique indexes are removed first, keeping the newest row.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+# (name, table, columns, unique)
+INDEXES = [
+    ("ix_messages_conversation_id_created_at", "messages", ["conversation_id", "created_at"], False),
+    ("ix_posts_created_at_id", "posts", ["created_at", "id"], False),
+    ("uq_post_votes_post_id_user_uid", "post_votes", ["post_id", "user_uid"], True),
+    ("uq_conversation_participants_conversation_user", "conversation_participants",
+     ["conversation_id", "user_id"], True),
+    ("ix_conversation_participants_user_id", "conversation_participants", ["user_id"], False),
+    ("uq_study_group_members_group_id_user_email", "study_group_members", ["group_id", "user_email"], True),
+    ("ix_study_group_members_user_email", "study_group_members", ["user_email"], False),
+    ("ix_study_sessions_creator_email_starts_at", "study_sessions", ["creator_email", "starts_at"], False),
+    ("ix_user_availability_user_email_starts_at_ends_at", "user_availability",
+     ["user_email", "starts_at", "ends_at"], False),
+]
+
+
+def _drop_duplicates(table, key_columns, id_column):
+    keys = ", ".join(key_columns)
+    op.execute(
+        f"DELETE FROM {table} WHERE {id_column} NOT IN "
+        f"(SELECT MAX({id_column}) FROM {table} GROUP BY {keys})"
+    )
+
+
+def upgrade():
+    op.add_column("conversation_participants", sa.Column("last_read_message_id", sa.Integer(), nullable=True))
+
+    _drop_duplicates("post_votes", ["post_id", "user_uid"], "id")
+    _drop_duplicates("conversation_participants", ["conversation_id", "user_id"], "participant_id")
+    _drop_duplicates("study_group_members", ["group_id", "user_email"], "id")
+
+    with op.get_context().autocommit_block():
+        for name, table, columns, unique in INDEXES:
+            op.create_index(
+                name, table, columns, unique=unique, if_not_exists=True, postgresql_concurrently=True
+            )
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        for name, table, _, _ in reversed(INDEXES):
+            op.drop_index(name, table_name=table, if_exists=True, postgresql_concurrently=True)
+    op.drop_column("conversation_participants", "last_read_message_id")
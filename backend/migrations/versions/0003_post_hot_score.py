@@ -0,0 +1,83 @@
+"""Materialized hot score on posts, with indexes for the hot and top feeds
+
+Existing posts are backfilled in id batches before the indexes are built
+concurrently.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-17
+"""
+import math
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = 1000
+# Same formula and constants as ranking.hot_score at the time of this revision
+HOT_EPOCH = datetime(2025, 1, 1)
+HOT_DECAY_SECONDS = 45000.0
+
+# (name, table, columns, unique)
+INDEXES = [
+    ("ix_posts_hot_score_id", "posts", ["hot_score", "id"], False),
+    ("ix_posts_score_id", "posts", ["score", "id"], False),
+]
+
+
+def _hot_score(score, created_at):
+    score = score or 0
+    order = math.log10(max(abs(score), 1))
+    sign = (score > 0) - (score < 0)
+    age_bonus = (created_at.replace(tzinfo=None) - HOT_EPOCH).total_seconds() / HOT_DECAY_SECONDS
+    return round(sign * order + age_bonus, 7)
+
+
+def _backfill_hot_scores():
+    posts = sa.table(
+        "posts", sa.column("id", sa.Integer), sa.column("score", sa.Integer),
+        sa.column("created_at", sa.DateTime), sa.column("hot_score", sa.Float)
+    )
+    conn = op.get_bind()
+    last_id = 0
+    while True:
+        rows = conn.execute(
+            sa.select(posts.c.id, posts.c.score, posts.c.created_at)
+            .where(posts.c.id > last_id).order_by(posts.c.id).limit(BATCH_SIZE)
+        ).all()
+        if not rows:
+            return
+        scores = [
+            {"post_id": post_id, "hot": _hot_score(score, created_at)}
+            for post_id, score, created_at in rows if created_at is not None
+        ]
+        if scores:
+            conn.execute(
+                posts.update().where(posts.c.id == sa.bindparam("post_id")).values(hot_score=sa.bindparam("hot")),
+                scores
+            )
+        last_id = rows[-1][0]
+
+
+def upgrade():
+    op.add_column("posts", sa.Column("hot_score", sa.Float(), nullable=False, server_default="0"))
+    _backfill_hot_scores()
+
+    with op.get_context().autocommit_block():
+        for name, table, columns, unique in INDEXES:
+            op.create_index(
+                name, table, columns, unique=unique, if_not_exists=True, postgresql_concurrently=True
+            )
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        for name, table, _, _ in reversed(INDEXES):
+            op.drop_index(name, table_name=table, if_exists=True, postgresql_concurrently=True)
+    op.drop_column("posts", "hot_score")
@@ -0,0 +1,83 @@
+"""Full-text search indexes for posts and messages
+
+PostgreSQL gets GIN indexes on the to_tsvector() expressions that search.py
+queries, built concurrently. SQLite gets external-content FTS5 tables kept in sync
+by triggers and populated from the existing rows.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+# (name, table, to_tsvector() expression); must match models.*_search_document()
+GIN_INDEXES = [
+    ("ix_posts_search_document", "posts",
+     "to_tsvector('english', coalesce(title, '') || ' ' || coalesce(description, ''))"),
+    ("ix_messages_search_document", "messages", "to_tsvector('english', content)"),
+]
+
+# (fts table, content table, rowid column, indexed columns)
+FTS5_TABLES = [
+    ("posts_fts", "posts", "id", ["title", "description"]),
+    ("messages_fts", "messages", "message_id", ["content"]),
+]
+
+
+def _create_fts5(fts, table, rowid, columns):
+    cols = ", ".join(columns)
+    new = ", ".join(f"new.{c}" for c in columns)
+    old = ", ".join(f"old.{c}" for c in columns)
+    op.execute(
+        f"CREATE VIRTUAL TABLE {fts} USING fts5({cols}, content='{table}', content_rowid='{rowid}', "
+        f"tokenize='porter unicode61')"
+    )
+    op.execute(
+        f"CREATE TRIGGER {fts}_ai AFTER INSERT ON {table} BEGIN "
+        f"INSERT INTO {fts}(rowid, {cols}) VALUES (new.{rowid}, {new}); END"
+    )
+    op.execute(
+        f"CREATE TRIGGER {fts}_ad AFTER DELETE ON {table} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, {cols}) VALUES ('delete', old.{rowid}, {old}); END"
+    )
+    # Only text edits touch the index, not score or read-pointer updates
+    op.execute(
+        f"CREATE TRIGGER {fts}_au AFTER UPDATE OF {cols} ON {table} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, {cols}) VALUES ('delete', old.{rowid}, {old}); "
+        f"INSERT INTO {fts}(rowid, {cols}) VALUES (new.{rowid}, {new}); END"
+    )
+    op.execute(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')")
+
+
+def upgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == "postgresql":
+        with op.get_context().autocommit_block():
+            for name, table, expression in GIN_INDEXES:
+                op.create_index(
+                    name, table, [sa.text(expression)], postgresql_using="gin",
+                    if_not_exists=True, postgresql_concurrently=True
+                )
+    elif dialect == "sqlite":
+        for fts, table, rowid, columns in FTS5_TABLES:
+            _create_fts5(fts, table, rowid, columns)
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == "postgresql":
+        with op.get_context().autocommit_block():
+            for name, table, _ in reversed(GIN_INDEXES):
+                op.drop_index(name, table_name=table, if_exists=True, postgresql_concurrently=True)
+    elif dialect == "sqlite":
+        for fts, _, _, _ in reversed(FTS5_TABLES):
+            for suffix in ("ai", "ad", "au"):
+                op.execute(f"DROP TRIGGER IF EXISTS {fts}_{suffix}")
+            op.execute(f"DROP TABLE IF EXISTS {fts}")
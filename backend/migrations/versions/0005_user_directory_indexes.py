@@ -0,0 +1,56 @@
+"""Indexes for the paginated, searchable user directory
+
+Name-ordered roster pages get (lower(coalesce(full_name, '')), user_id) indexes on
+every dialect. On PostgreSQL, substring search on name and email gets pg_trgm GIN
+indexes; creating the extension needs a role allowed to do so.
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0005"
+down_revision = "0004"
+branch_labels = None
+depends_on = None
+
+NAME_KEY = "lower(coalesce(full_name, ''))"
+
+# (name, columns); must match models.User.__table_args__
+INDEXES = [
+    ("ix_users_name_key_user_id", [sa.text(NAME_KEY), "user_id"]),
+    ("ix_users_role_name_key_user_id", ["role", sa.text(NAME_KEY), "user_id"]),
+]
+TRIGRAM_INDEXES = [
+    ("ix_users_full_name_trgm", "lower(full_name) gin_trgm_ops"),
+    ("ix_users_email_trgm", "lower(email) gin_trgm_ops"),
+]
+
+
+def upgrade():
+    is_postgresql = op.get_bind().dialect.name == "postgresql"
+    if is_postgresql:
+        op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+
+    with op.get_context().autocommit_block():
+        for name, columns in INDEXES:
+            op.create_index(name, "users", columns, if_not_exists=True, postgresql_concurrently=True)
+        if is_postgresql:
+            for name, expression in TRIGRAM_INDEXES:
+                op.create_index(
+                    name, "users", [sa.text(expression)], postgresql_using="gin",
+                    if_not_exists=True, postgresql_concurrently=True
+                )
+
+
+def downgrade():
+    is_postgresql = op.get_bind().dialect.name == "postgresql"
+    with op.get_context().autocommit_block():
+        if is_postgresql:
+            for name, _ in reversed(TRIGRAM_INDEXES):
+                op.drop_index(name, table_name="users", if_exists=True, postgresql_concurrently=True)
+        for name, _ in reversed(INDEXES):
+            op.drop_index(name, table_name="users", if_exists=True, postgresql_concurrently=True)
@@ -0,0 +1,42 @@
+"""Row versions on users and posts for conditional GETs
+
+Adds ``updated_at`` to both tables, backfills it from ``created_at`` and builds
+the indexes that make ``max(updated_at)`` a single index lookup.
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0006"
+down_revision = "0005"
+branch_labels = None
+depends_on = None
+
+# (name, table, columns)
+INDEXES = [
+    ("ix_users_updated_at", "users", ["updated_at"]),
+    ("ix_posts_updated_at", "posts", ["updated_at"]),
+]
+TABLES = ["users", "posts"]
+
+
+def upgrade():
+    for table in TABLES:
+        op.add_column(table, sa.Column("updated_at", sa.DateTime(), nullable=True))
+        op.execute(f"UPDATE {table} SET updated_at = coalesce(created_at, CURRENT_TIMESTAMP)")
+
+    with op.get_context().autocommit_block():
+        for name, table, columns in INDEXES:
+            op.create_index(name, table, columns, if_not_exists=True, postgresql_concurrently=True)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        for name, table, _ in reversed(INDEXES):
+            op.drop_index(name, table_name=table, if_exists=True, postgresql_concurrently=True)
+    for table in reversed(TABLES):
+        op.drop_column(table, "updated_at")
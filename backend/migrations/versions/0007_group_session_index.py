@@ -0,0 +1,29 @@
+"""Index on study session group and start for the group calendar feeds
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-17
+"""
+from alembic import op
+
+
+revision = "0007"
+down_revision = "0006"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_study_sessions_group_id_starts_at", "study_sessions", ["group_id", "starts_at"],
+            if_not_exists=True, postgresql_concurrently=True
+        )
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            "ix_study_sessions_group_id_starts_at", table_name="study_sessions",
+            if_exists=True, postgresql_concurrently=True
+        )
@@ -0,0 +1,165 @@
+"""Partition messages by month on PostgreSQL
+
+On PostgreSQL the table is rebuilt as a table partitioned by range of
+``created_at``. The old table is renamed and the new one is created ``LIKE`` it,
+so every column comes along, including those the ``Message`` model does not map
+(the raw-SQL ``/messages`` direct-message path's). The new table takes over the
+old one's sequences, foreign keys and non-unique indexes. Unique indexes other
+than the primary key are not carried over, because on a partitioned table they
+would have to include ``created_at``. Then one partition is created per month from the oldest message to three
+months ahead, plus a default partition; the app creates later months as they
+come due (see ``message_partitions``). The rows are copied over, and the
+indexes are built on the new table. The primary key becomes
+``(message_id, created_at)``, because a partitioned table's unique keys must
+include the partition key. The copy holds a lock on ``messages`` for its
+duration; run it in a maintenance window on large databases.
+
+On every dialect ``created_at`` becomes NOT NULL. Rows without one get the
+migration time. On SQLite that recreates the table, which drops the full-text
+triggers from 0004, so they are created again.
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-17
+"""
+import re
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0008"
+down_revision = "0007"
+branch_labels = None
+depends_on = None
+
+DEFAULT_PARTITION = "messages_default"
+PARTITIONS_AHEAD = 3
+UTC_NOW = "(now() AT TIME ZONE 'utc')"
+# (name, columns or expression, using); must match models.Message
+INDEXES = [
+    ("ix_messages_message_id", "message_id", "btree"),
+    ("ix_messages_conversation_id_created_at", "conversation_id, created_at", "btree"),
+    ("ix_messages_search_document", "to_tsvector('english', content)", "gin"),
+]
+# Same triggers as migration 0004
+FTS_TRIGGERS = [
+    "CREATE TRIGGER messages_fts_ai AFTER INSERT ON messages BEGIN "
+    "INSERT INTO messages_fts(rowid, content) VALUES (new.message_id, new.content); END",
+    "CREATE TRIGGER messages_fts_ad AFTER DELETE ON messages BEGIN "
+    "INSERT INTO messages_fts(messages_fts, rowid, content) VALUES ('delete', old.message_id, old.content); END",
+    "CREATE TRIGGER messages_fts_au AFTER UPDATE OF content ON messages BEGIN "
+    "INSERT INTO messages_fts(messages_fts, rowid, content) VALUES ('delete', old.message_id, old.content); "
+    "INSERT INTO messages_fts(rowid, content) VALUES (new.message_id, new.content); END",
+]
+
+
+def _month_start(moment):
+    return moment.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def _add_months(month, months):
+    index = month.year * 12 + month.month - 1 + months
+    return month.replace(year=index // 12, month=index % 12 + 1)
+
+
+def _create_partition(month):
+    # Named like message_partitions.partition_name, which finds them by that pattern
+    op.execute(
+        f"CREATE TABLE messages_y{month.year:04d}m{month.month:02d} PARTITION OF messages "
+        f"FOR VALUES FROM ('{month.isoformat(' ')}') TO ('{_add_months(month, 1).isoformat(' ')}')"
+    )
+
+
+def _create_indexes():
+    for name, columns, using in INDEXES:
+        op.execute(f"CREATE INDEX {name} ON messages USING {using} ({columns})")
+
+
+def _rename_aside(bind):
+    """Rename ``messages`` to ``messages_old``; returns its foreign keys, other indexes and owned sequences."""
+    op.execute("ALTER TABLE messages RENAME TO messages_old")
+    op.execute("ALTER TABLE messages_old RENAME CONSTRAINT messages_pkey TO messages_old_pkey")
+    for name, _, _ in INDEXES:
+        op.execute(f"DROP INDEX IF EXISTS {name}")
+    foreign_keys = bind.execute(sa.text(
+        "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint "
+        "WHERE conrelid = 'messages_old'::regclass AND contype = 'f'"
+    )).all()
+    indexes = bind.execute(sa.text(
+        "SELECT indexrelid::regclass::text, pg_get_indexdef(indexrelid) FROM pg_index "
+        "WHERE indrelid = 'messages_old'::regclass AND NOT indisprimary AND NOT indisunique"
+    )).all()
+    # Dropped here so the new table can reuse their names
+    for name, _ in indexes:
+        op.execute(f"DROP INDEX {name}")
+    sequences = bind.execute(sa.text(
+        "SELECT quote_ident(attname), pg_get_serial_sequence('messages_old', quote_ident(attname)) "
+        "FROM pg_attribute WHERE attrelid = 'messages_old'::regclass AND attnum > 0 AND NOT attisdropped"
+    )).all()
+    return foreign_keys, indexes, [(column, sequence) for column, sequence in sequences if sequence]
+
+
+def _move_rows(foreign_keys, indexes, sequences):
+    """Copy every row of ``messages_old`` into the new ``messages``, which takes over the rest, and drop it."""
+    op.execute("INSERT INTO messages SELECT * FROM messages_old")
+    for column, sequence in sequences:
+        op.execute(f"ALTER SEQUENCE {sequence} OWNED BY messages.{column}")
+    op.execute("DROP TABLE messages_old")
+    for name, definition in foreign_keys:
+        op.execute(f"ALTER TABLE messages ADD CONSTRAINT {name} {definition}")
+    _create_indexes()
+    for _, definition in indexes:
+        op.execute(re.sub(r" ON (ONLY )?(\S+\.)?messages_old ", " ON messages ", definition, count=1))
+
+
+def upgrade():
+    bind = op.get_bind()
+    if bind.dialect.name != "postgresql":
+        op.execute("UPDATE messages SET created_at = CURRENT_TIMESTAMP WHERE created_at IS NULL")
+        with op.batch_alter_table("messages") as batch:
+            batch.alter_column("created_at", existing_type=sa.DateTime(), nullable=False)
+        if bind.dialect.name == "sqlite":
+            for trigger in FTS_TRIGGERS:
+                op.execute(trigger)
+        return
+
+    op.execute(f"UPDATE messages SET created_at = {UTC_NOW} WHERE created_at IS NULL")
+    moved = _rename_aside(bind)
+    op.execute(
+        "CREATE TABLE messages (LIKE messages_old INCLUDING DEFAULTS INCLUDING CONSTRAINTS) "
+        "PARTITION BY RANGE (created_at)"
+    )
+    # The direct-message path inserts without created_at
+    op.execute(
+        f"ALTER TABLE messages ALTER COLUMN created_at SET NOT NULL, ALTER COLUMN created_at SET DEFAULT {UTC_NOW}"
+    )
+    op.execute("ALTER TABLE messages ADD CONSTRAINT messages_pkey PRIMARY KEY (message_id, created_at)")
+    op.execute(f"CREATE TABLE {DEFAULT_PARTITION} PARTITION OF messages DEFAULT")
+    oldest = bind.execute(sa.text("SELECT min(created_at) FROM messages_old")).scalar()
+    month = _month_start(oldest or datetime.utcnow())
+    last = _add_months(_month_start(datetime.utcnow()), PARTITIONS_AHEAD)
+    while month <= last:
+        _create_partition(month)
+        month = _add_months(month, 1)
+    _move_rows(*moved)
+
+
+def downgrade():
+    bind = op.get_bind()
+    if bind.dialect.name != "postgresql":
+        with op.batch_alter_table("messages") as batch:
+            batch.alter_column("created_at", existing_type=sa.DateTime(), nullable=True)
+        if bind.dialect.name == "sqlite":
+            for trigger in FTS_TRIGGERS:
+                op.execute(trigger)
+        return
+
+    # Archived months stay in cold storage; only the rows still in the table come back.
+    # created_at keeps its default, which the direct-message path relies on.
+    moved = _rename_aside(bind)
+    op.execute("CREATE TABLE messages (LIKE messages_old INCLUDING DEFAULTS INCLUDING CONSTRAINTS)")
+    op.execute("ALTER TABLE messages ALTER COLUMN created_at DROP NOT NULL")
+    op.execute("ALTER TABLE messages ADD CONSTRAINT messages_pkey PRIMARY KEY (message_id)")
+    _move_rows(*moved)
@@ -1,10 +1,34 @@
 from database import Base
-from sqlalchemy import Column, Integer, String, DateTime, Enum, ForeignKey, Text, Boolean
+from sqlalchemy import Column, Integer, Float, String, DateTime, Enum, ForeignKey, Text, Boolean, Index, JSON, func, literal_column, text
+from sqlalchemy.dialects import postgresql  # noqa: F401  registers the to_tsvector() types
 from sqlalchemy.orm import relationship
 import datetime
 import enum
 
 
+# Full-text search documents. On PostgreSQL they back GIN expression indexes, and a
+# query only uses an index if it repeats the expression exactly, so constants are
+# inlined rather than bound. SQLite searches FTS5 tables instead (see search.py).
+SEARCH_CONFIG = literal_column("'english'")
+
+
+def post_search_document(title, description):
+    return func.to_tsvector(
+        SEARCH_CONFIG,
+        func.coalesce(title, literal_column("''")) + literal_column("' '")
+        + func.coalesce(description, literal_column("''"))
+    )
+
+
+def message_search_document(content):
+    return func.to_tsvector(SEARCH_CONFIG, content)
+
+
+def user_name_key(full_name):
+    """Case-insensitive roster sort key; NULL names sort first instead of breaking keyset pages."""
+    return func.lower(func.coalesce(full_name, literal_column("''")))
+
+
 class UserRole(str, enum.Enum):
     STUDENT = "Student"
     TA = "TA"
@@ -21,11 +45,29 @@ class User(Base):
     role = Column(String, default="Student")  # Or use Enum(UserRole)
     google_calendar_token = Column(String, nullable=True)
     created_at = Column(DateTime, default=datetime.datetime.utcnow)
+    # Row version for conditional GETs; max() over it changes on every insert or update
+    updated_at = Column(DateTime, default=datetime.datetime.utcnow, onupdate=datetime.datetime.utcnow)
     
     # Relationships
     messages = relationship("Message", back_populates="sender")
     conversation_participants = relationship("ConversationParticipant", back_populates="user")
 
+    __table_args__ = (
+        # Roster pages in name order, optionally for one role
+        Index("ix_users_name_key_user_id", user_name_key(full_name), "user_id"),
+        Index("ix_users_role_name_key_user_id", "role", user_name_key(full_name), "user_id"),
+        Index("ix_users_updated_at", "updated_at"),
+        # Substring search on name and email (pg_trgm, PostgreSQL only)
+        Index(
+            "ix_users_full_name_trgm", func.lower(full_name).label("lower_full_name"), postgresql_using="gin",
+            postgresql_ops={"lower_full_name": "gin_trgm_ops"}
+        ).ddl_if(dialect="postgresql"),
+        Index(
+            "ix_users_email_trgm", func.lower(email).label("lower_email"), postgresql_using="gin",
+            postgresql_ops={"lower_email": "gin_trgm_ops"}
+        ).ddl_if(dialect="postgresql"),
+    )
+
 
 class Conversation(Base):
     __tablename__ = "conversations"
@@ -47,11 +89,17 @@ class ConversationParticipant(Base):
     conversation_id = Column(Integer, ForeignKey("conversations.conversation_id"), nullable=False)
     user_id = Column(Integer, ForeignKey("users.user_id"), nullable=False)
     joined_at = Column(DateTime, default=datetime.datetime.utcnow)
+    last_read_message_id = Column(Integer, nullable=True)  # Unread = messages after this one
     
     # Relationships
     conversation = relationship("Conversation", back_populates="participants")
     user = relationship("User", back_populates="conversation_participants")
 
+    __table_args__ = (
+        Index("uq_conversation_participants_conversation_user", "conversation_id", "user_id", unique=True),
+        Index("ix_conversation_participants_user_id", "user_id"),
+    )
+
 
 class Message(Base):
     __tablename__ = "messages"
@@ -60,12 +108,22 @@ class Message(Base):
     conversation_id = Column(Integer, ForeignKey("conversations.conversation_id"), nullable=False)
     sender_id = Column(Integer, ForeignKey("users.user_id"), nullable=False)
     content = Column(Text, nullable=False)
-    created_at = Column(DateTime, default=datetime.datetime.utcnow)
+    # On PostgreSQL the table is partitioned by month on created_at and its primary
+    # key is (message_id, created_at); see migration 0008 and message_partitions.py
+    created_at = Column(DateTime, nullable=False, default=datetime.datetime.utcnow)
     
     # Relationships
     conversation = relationship("Conversation", back_populates="messages")
     sender = relationship("User", back_populates="messages")
 
+    __table_args__ = (
+        # Conversation history is read as a range on (conversation_id, created_at)
+        Index("ix_messages_conversation_id_created_at", "conversation_id", "created_at"),
+        Index(
+            "ix_messages_search_document", message_search_document(content), postgresql_using="gin"
+        ).ddl_if(dialect="postgresql"),
+    )
+
 
 class Post(Base):
     __tablename__ = "posts"
@@ -76,10 +134,26 @@ class Post(Base):
     description = Column(Text, nullable=True)
     resource_link = Column(String, nullable=True)
     score = Column(Integer, default=0)
+    # Materialized feed rank, maintained by ranking.hot_score
+    hot_score = Column(Float, nullable=False, default=0.0, server_default="0")
     created_at = Column(DateTime, default=datetime.datetime.utcnow)
+    # Row version for conditional GETs, bumped by every vote and rescore as well
+    updated_at = Column(DateTime, default=datetime.datetime.utcnow, onupdate=datetime.datetime.utcnow)
 
     votes = relationship("PostVote", back_populates="post", cascade="all, delete-orphan")
 
+    __table_args__ = (
+        # Keyset pagination of the feed on (created_at, id)
+        Index("ix_posts_created_at_id", "created_at", "id"),
+        # ?sort=hot and ?sort=top pages
+        Index("ix_posts_hot_score_id", "hot_score", "id"),
+        Index("ix_posts_score_id", "score", "id"),
+        Index("ix_posts_updated_at", "updated_at"),
+        Index(
+            "ix_posts_search_document", post_search_document(title, description), postgresql_using="gin"
+        ).ddl_if(dialect="postgresql"),
+    )
+
 
 class PostVote(Base):
     __tablename__ = "post_votes"
@@ -87,10 +161,14 @@ class PostVote(Base):
     id = Column(Integer, primary_key=True, index=True)
     post_id = Column(Integer, ForeignKey("posts.id"), nullable=False)
     user_uid = Column(String, nullable=False)
-    vote = Column(Integer, nullable=False)  # 1 or -1
+    vote = Column(Integer, nullable=False)  # 1 or -1, 0 once withdrawn
 
     post = relationship("Post", back_populates="votes")
 
+    __table_args__ = (
+        Index("uq_post_votes_post_id_user_uid", "post_id", "user_uid", unique=True),
+    )
+
 
 class StudyGroup(Base):
     __tablename__ = "study_groups"
@@ -113,6 +191,11 @@ class StudyGroupMember(Base):
 
     group = relationship("StudyGroup", back_populates="members")
 
+    __table_args__ = (
+        Index("uq_study_group_members_group_id_user_email", "group_id", "user_email", unique=True),
+        Index("ix_study_group_members_user_email", "user_email"),
+    )
+
 
 class StudySession(Base):
     __tablename__ = "study_sessions"
@@ -128,6 +211,11 @@ class StudySession(Base):
 
     group = relationship("StudyGroup", back_populates="sessions")
 
+    __table_args__ = (
+        Index("ix_study_sessions_creator_email_starts_at", "creator_email", "starts_at"),
+        Index("ix_study_sessions_group_id_starts_at", "group_id", "starts_at"),
+    )
+
 
 class UserAvailability(Base):
     __tablename__ = "user_availability"
@@ -138,3 +226,37 @@ class UserAvailability(Base):
     ends_at = Column(DateTime, nullable=False)
     source = Column(String, default="google_calendar")
     created_at = Column(DateTime, default=datetime.datetime.utcnow)
+
+    __table_args__ = (
+        Index("ix_user_availability_user_email_starts_at_ends_at", "user_email", "starts_at", "ends_at"),
+    )
+
+
+class Job(Base):
+    """A unit of background work; see jobs.py."""
+    __tablename__ = "jobs"
+
+    id = Column(Integer, primary_key=True)
+    kind = Column(String(100), nullable=False)
+    # Jobs with the same kind and key that are still queued are merged into one
+    dedup_key = Column(String(255), nullable=True)
+    payload = Column(JSON, nullable=False)
+    status = Column(String(20), nullable=False, default="queued")  # queued, running, succeeded or failed
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False, default=5)
+    # Earliest start while queued, lease expiry while running
+    run_at = Column(DateTime, nullable=False, default=datetime.datetime.utcnow)
+    result = Column(JSON, nullable=True)
+    error = Column(Text, nullable=True)
+    created_at = Column(DateTime, nullable=False, default=datetime.datetime.utcnow)
+    updated_at = Column(DateTime, nullable=False, default=datetime.datetime.utcnow, onupdate=datetime.datetime.utcnow)
+    finished_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        # Claiming: due queued jobs and expired leases, oldest first
+        Index("ix_jobs_status_run_at", "status", "run_at"),
+        Index(
+            "uq_jobs_kind_dedup_key_queued", "kind", "dedup_key", unique=True,
+            postgresql_where=text("status = 'queued'"), sqlite_where=text("status = 'queued'")
+        ),
+    )
@@ -0,0 +1,58 @@
+"""Opaque keyset cursors shared by the paginated list endpoints.
+
+A cursor encodes the sort key of the last row on a page, e.g. ``(created_at, id)``
+or ``(hot_score, id)``, so the next page is a bounded index range scan instead of
+an OFFSET.
+"""
+import base64
+from datetime import datetime
+from typing import Callable, Optional, Tuple, TypeVar
+
+from fastapi import HTTPException
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+PREV_CURSOR_HEADER = "X-Prev-Cursor"
+
+K = TypeVar("K")
+
+
+def _encode(key: str, row_id: int) -> str:
+    raw = f"{key}|{row_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def _decode(cursor: Optional[str], parse_key: Callable[[str], K]) -> Optional[Tuple[K, int]]:
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        key, row_id = raw.rsplit("|", 1)
+        return parse_key(key), int(row_id)
+    except (ValueError, UnicodeDecodeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def encode_cursor(created_at: datetime, row_id: int) -> str:
+    return _encode(created_at.isoformat(), row_id)
+
+
+def decode_cursor(cursor: Optional[str]) -> Optional[Tuple[datetime, int]]:
+    return _decode(cursor, datetime.fromisoformat)
+
+
+def encode_rank_cursor(rank: float, row_id: int) -> str:
+    """Cursor for feeds ordered by a numeric rank column instead of a timestamp."""
+    return _encode(repr(float(rank)), row_id)
+
+
+def decode_rank_cursor(cursor: Optional[str]) -> Optional[Tuple[float, int]]:
+    return _decode(cursor, float)
+
+
+def encode_text_cursor(key: str, row_id: int) -> str:
+    """Cursor for lists ordered by a string key, such as the roster's name order."""
+    return _encode(key, row_id)
+
+
+def decode_text_cursor(cursor: Optional[str]) -> Optional[Tuple[str, int]]:
+    return _decode(cursor, str)
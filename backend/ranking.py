@@ -0,0 +1,100 @@
+"""Materialized "hot" ranking for the resource feed.
+
+``hot_score`` is the log of a post's score plus a bonus that grows linearly with
+its creation time, so every ``HOT_DECAY_SECONDS`` of age is worth a factor of ten
+in score. Because the age term is fixed at creation, a post's hot score only
+changes when its score does: votes update it incrementally, in the same UPDATE as
+the score (see ``hot_score_sql``), and the feed reads it straight from the
+``(hot_score, id)`` index. ``rescore_all`` recomputes every row
+in batches and runs periodically to repair drift (or after changing the decay).
+"""
+import asyncio
+import logging
+import math
+import os
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import Float, Numeric, bindparam, case, cast, func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import database
+import models
+from cache import FEED_NAMESPACE, cache
+
+logger = logging.getLogger(__name__)
+
+HOT_EPOCH = datetime(2025, 1, 1)
+HOT_DECAY_SECONDS = float(os.getenv("HOT_DECAY_SECONDS", "45000"))
+HOT_RESCORE_SECONDS = float(os.getenv("HOT_RESCORE_SECONDS", "3600"))
+RESCORE_BATCH_SIZE = 1000
+
+
+def hot_score(score: Optional[int], created_at: datetime) -> float:
+    score = score or 0
+    order = math.log10(max(abs(score), 1))
+    sign = (score > 0) - (score < 0)
+    age_bonus = (created_at.replace(tzinfo=None) - HOT_EPOCH).total_seconds() / HOT_DECAY_SECONDS
+    return round(sign * order + age_bonus, 7)
+
+
+def hot_score_sql(dialect: str, score, created_at):
+    """``hot_score`` as a SQL expression, so an UPDATE can set it from the score it writes.
+
+    Agrees with ``hot_score`` up to float rounding. SQLite needs its math functions
+    (built in by default since 3.35).
+    """
+    magnitude = case((func.abs(score) > 1, func.abs(score)), else_=1)
+    sign = case((score > 0, 1), (score < 0, -1), else_=0)
+    if dialect == "postgresql":
+        age = cast(func.extract("epoch", created_at - HOT_EPOCH), Float)
+    else:
+        age = (func.julianday(created_at) - func.julianday(HOT_EPOCH.isoformat(sep=" "))) * 86400
+    value = sign * func.log(cast(magnitude, Float)) + age / HOT_DECAY_SECONDS
+    # PostgreSQL only rounds numerics to a number of places
+    return func.round(cast(value, Numeric) if dialect == "postgresql" else value, 7)
+
+
+async def _rescore_rows(db: AsyncSession, rows) -> int:
+    changed = [
+        {"post_id": post_id, "hot": hot_score(score, created_at)}
+        for post_id, score, created_at, current in rows
+        if created_at is not None and hot_score(score, created_at) != current
+    ]
+    if changed:
+        posts = models.Post.__table__
+        await db.execute(
+            update(posts).where(posts.c.id == bindparam("post_id")).values(hot_score=bindparam("hot")),
+            changed
+        )
+    return len(changed)
+
+
+async def rescore_all(batch_size: int = RESCORE_BATCH_SIZE) -> int:
+    """Walk the posts table in id order, committing each batch; returns rows changed."""
+    Post = models.Post
+    changed = 0
+    last_id = 0
+    while True:
+        async with database.AsyncSessionLocal() as db:
+            rows = (await db.execute(
+                select(Post.id, Post.score, Post.created_at, Post.hot_score)
+                .where(Post.id > last_id).order_by(Post.id).limit(batch_size)
+            )).all()
+            if not rows:
+                return changed
+            changed += await _rescore_rows(db, rows)
+            await db.commit()
+        last_id = rows[-1][0]
+
+
+async def rescore_periodically(interval: float = HOT_RESCORE_SECONDS) -> None:
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            changed = await rescore_all()
+            if changed:
+                logger.info("Rescored %d posts whose hot score had drifted", changed)
+                await cache.invalidate_namespace(FEED_NAMESPACE)
+        except Exception:
+            logger.exception("Hot score rescoring failed")
@@ -0,0 +1,117 @@
+"""Slot-suggestion engine for study group scheduling.
+
+Candidate slots start at ``range_start`` and step every ``slot_minutes``; each
+slot lasts ``duration_minutes``. A member is busy for a slot when any of their
+busy blocks overlaps it. Instead of testing every block against every slot, each
+member's blocks are turned into a sorted, coalesced run of slot indices and added
+to a difference array, so one prefix-sum pass yields the exact number of distinct
+busy members per slot.
+"""
+import heapq
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Tuple
+
+
+Interval = Tuple[datetime, datetime]
+
+
+def merge_intervals(intervals: Iterable[Interval]) -> List[Interval]:
+    """Sort and coalesce overlapping or touching intervals."""
+    merged: List[Interval] = []
+    for s, e in sorted(i for i in intervals if i[0] < i[1]):
+        if merged and s <= merged[-1][1]:
+            if e > merged[-1][1]:
+                merged[-1] = (merged[-1][0], e)
+        else:
+            merged.append((s, e))
+    return merged
+
+
+def _slot_index_runs(
+    intervals: List[Interval], start: datetime, step: float, duration: float, slot_count: int
+) -> List[Tuple[int, int]]:
+    """Map merged busy intervals to coalesced, inclusive runs of slot indices.
+
+    Slot ``i`` covers ``[start + i*step, start + i*step + duration)`` and overlaps
+    ``(s, e)`` iff ``s - duration < start + i*step < e``.
+    """
+    runs: List[Tuple[int, int]] = []
+    for s, e in intervals:
+        lo_off = (s - start).total_seconds() - duration
+        hi_off = (e - start).total_seconds()
+        lo = max(int(lo_off // step) + 1, 0)
+        hi = min(-int(-hi_off // step) - 1, slot_count - 1)
+        if lo > hi:
+            continue
+        if runs and lo <= runs[-1][1] + 1:
+            if hi > runs[-1][1]:
+                runs[-1] = (runs[-1][0], hi)
+        else:
+            runs.append((lo, hi))
+    return runs
+
+
+def busy_member_counts(
+    busy_by_member: Dict[str, Iterable[Interval]],
+    start: datetime,
+    end: datetime,
+    duration_minutes: int,
+    slot_minutes: int,
+) -> List[int]:
+    """Return the number of distinct busy members for every candidate slot."""
+    step = slot_minutes * 60
+    duration = duration_minutes * 60
+    span = (end - start).total_seconds() - duration
+    if step <= 0 or span < 0:
+        return []
+    slot_count = int(span // step) + 1
+
+    diff = [0] * (slot_count + 1)
+    for intervals in busy_by_member.values():
+        for lo, hi in _slot_index_runs(merge_intervals(intervals), start, step, duration, slot_count):
+            diff[lo] += 1
+            diff[hi + 1] -= 1
+
+    counts = []
+    running = 0
+    for i in range(slot_count):
+        running += diff[i]
+        counts.append(running)
+    return counts
+
+
+def suggest_slots(
+    busy_by_member: Dict[str, Iterable[Interval]],
+    total_members: int,
+    start: datetime,
+    end: datetime,
+    duration_minutes: int = 60,
+    slot_minutes: int = 30,
+    day_start_hour: int = 8,
+    day_end_hour: int = 22,
+    min_available_members: int = 1,
+    limit: int = 50,
+) -> List[dict]:
+    """Return the ``limit`` best slots, most available members first, earliest first on ties."""
+    counts = busy_member_counts(busy_by_member, start, end, duration_minutes, slot_minutes)
+    step = timedelta(minutes=slot_minutes)
+    duration = timedelta(minutes=duration_minutes)
+
+    candidates = (
+        (total_members - busy, i)
+        for i, busy in enumerate(counts)
+        if total_members - busy >= min_available_members
+        and day_start_hour <= (start + i * step).hour < day_end_hour
+    )
+    best = heapq.nsmallest(limit, candidates, key=lambda c: (-c[0], c[1]))
+
+    suggestions = []
+    for available, i in best:
+        slot_start = start + i * step
+        suggestions.append({
+            "starts_at": slot_start.isoformat(),
+            "ends_at": (slot_start + duration).isoformat(),
+            "available_members": available,
+            "total_members": total_members
+        })
+    return suggestions
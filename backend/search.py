@@ -0,0 +1,80 @@
+"""Ranked full-text search over posts and the caller's messages.
+
+PostgreSQL matches ``websearch_to_tsquery`` against the GIN expression indexes
+declared in ``models`` and ranks with ``ts_rank``. SQLite (used for local runs
+without a server) matches the FTS5 tables created by migration 0004 and ranks with
+``bm25``. Either way the matches become an ``(id, rank)`` subquery joined back to
+the base table, so pages are keyset-paginated on ``(rank, id)`` like the feed.
+"""
+import re
+from typing import List, Optional, Tuple
+
+from sqlalchemy import func, literal_column, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import models
+
+# FTS5 table shadowing each searchable table (SQLite only)
+FTS_TABLES = {"posts": "posts_fts", "messages": "messages_fts"}
+
+
+def fts5_query(q: str) -> str:
+    """Quote every word, so user input is never parsed as FTS5 syntax; words are ANDed."""
+    return " ".join(f'"{word}"' for word in re.findall(r"\w+", q))
+
+
+def _matches(dialect: str, kind: str, q: str):
+    if dialect == "postgresql":
+        if kind == "posts":
+            row_id = models.Post.id
+            document = models.post_search_document(models.Post.title, models.Post.description)
+        else:
+            row_id = models.Message.message_id
+            document = models.message_search_document(models.Message.content)
+        query = func.websearch_to_tsquery(models.SEARCH_CONFIG, q)
+        return select(
+            row_id.label("id"), func.ts_rank(document, query).label("rank")
+        ).where(document.bool_op("@@")(query)).subquery("matches")
+
+    fts_table = FTS_TABLES[kind]
+    # bm25() is lower-is-better, and is only callable in the MATCH query itself
+    return select(
+        literal_column("rowid").label("id"), (-func.bm25(literal_column(fts_table))).label("rank")
+    ).select_from(text(fts_table)).where(
+        text(f"{fts_table} MATCH :fts_query").bindparams(fts_query=fts5_query(q))
+    ).subquery("matches")
+
+
+async def search(
+    db: AsyncSession,
+    kind: str,
+    q: str,
+    user_id: Optional[int] = None,
+    after: Optional[Tuple[float, int]] = None,
+    limit: int = 20,
+) -> List[tuple]:
+    """Return up to ``limit + 1`` ``(row, rank)`` pairs, best first.
+
+    ``kind`` is ``"posts"`` or ``"messages"``; messages are limited to the
+    conversations ``user_id`` participates in.
+    """
+    if kind == "posts":
+        model, row_id = models.Post, models.Post.id
+    else:
+        model, row_id = models.Message, models.Message.message_id
+    if db.bind.dialect.name != "postgresql" and not fts5_query(q):
+        return []
+
+    matches = _matches(db.bind.dialect.name, kind, q)
+    query = select(model, matches.c.rank).join(matches, matches.c.id == row_id)
+    if kind == "messages":
+        query = query.where(models.Message.conversation_id.in_(
+            select(models.ConversationParticipant.conversation_id)
+            .where(models.ConversationParticipant.user_id == user_id)
+        ))
+    if after:
+        rank, last_id = after
+        query = query.where((matches.c.rank < rank) | ((matches.c.rank == rank) & (row_id < last_id)))
+    return (await db.execute(
+        query.order_by(matches.c.rank.desc(), row_id.desc()).limit(limit + 1)
+    )).all()
@@ -0,0 +1,138 @@
+"""Race-free post voting.
+
+A vote is one ``INSERT ... ON CONFLICT (post_id, user_uid) DO UPDATE`` that only
+overwrites the vote it read, which yields the exact score delta. A withdrawn vote
+is stored as 0. The delta is then applied as ``score = score + delta`` in the
+database, or, when ``VOTE_BUFFER_SECONDS`` is set, accumulated in memory and
+flushed for all posts in one batch per interval. Either way the same UPDATE also
+sets the post's hot score (see ``ranking``). Increments commute, so several
+workers can buffer independently.
+"""
+import asyncio
+import logging
+import os
+from typing import Dict, Optional
+
+from sqlalchemy import bindparam, func, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import database
+import models
+from cache import FEED_NAMESPACE, cache
+from ranking import hot_score_sql
+
+logger = logging.getLogger(__name__)
+
+VOTE_BUFFER_SECONDS = float(os.getenv("VOTE_BUFFER_SECONDS", "0"))
+
+_INSERTS = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}
+
+
+async def record_vote(db: AsyncSession, post_id: int, user_uid: str, vote: int) -> int:
+    """Store ``vote`` (-1, 0 or 1) as the user's vote and return the score delta.
+
+    On PostgreSQL this is one statement: a CTE locks and reads the previous vote
+    and the upsert beside it overwrites only that vote. SQLite allows no writes
+    in a CTE, so it reads first. When a concurrent first vote makes the read stale,
+    nothing is written and the vote runs again.
+    """
+    PostVote = models.PostVote
+    dialect = db.bind.dialect.name
+    read = select(PostVote.vote).where((PostVote.post_id == post_id) & (PostVote.user_uid == user_uid))
+    while True:
+        if dialect == "postgresql":
+            old = read.with_for_update().cte("old")
+            previous = select(old.c.vote).scalar_subquery()
+        else:
+            previous = (await db.execute(read)).scalar()
+        stmt = _INSERTS[dialect](PostVote).values(post_id=post_id, user_uid=user_uid, vote=vote)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[PostVote.post_id, PostVote.user_uid], set_={"vote": stmt.excluded.vote},
+            where=PostVote.vote.is_not_distinct_from(previous)
+        ).returning(PostVote.vote)
+        if dialect == "postgresql":
+            up = stmt.cte("up")
+            previous, written = (await db.execute(
+                select(previous, select(func.count()).select_from(up).scalar_subquery())
+            )).one()
+        else:
+            written = (await db.execute(stmt)).first() is not None
+        if written:
+            return vote - (previous or 0)
+
+
+async def apply_score_delta(db: AsyncSession, post_id: int, delta: int) -> Optional[int]:
+    """Atomically add ``delta`` to the post's score and set the matching hot score.
+
+    Returns None if the post does not exist.
+    """
+    Post = models.Post
+    score = Post.score + delta
+    values = {"score": score}
+    if delta:
+        values["hot_score"] = hot_score_sql(db.bind.dialect.name, score, Post.created_at)
+    return (await db.execute(update(Post).where(Post.id == post_id).values(values).returning(Post.id))).scalar()
+
+
+class ScoreBuffer:
+    """Accumulates score deltas per post and flushes them in one batch."""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._pending: Dict[int, int] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._stopping: Optional[asyncio.Event] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.interval > 0
+
+    def add(self, post_id: int, delta: int) -> None:
+        if delta:
+            self._pending[post_id] = self._pending.get(post_id, 0) + delta
+
+    async def flush(self) -> None:
+        pending, self._pending = self._pending, {}
+        rows = [{"post_id": post_id, "delta": delta} for post_id, delta in pending.items() if delta]
+        if not rows:
+            return
+        posts = models.Post.__table__
+        try:
+            async with database.AsyncSessionLocal() as db:
+                score = posts.c.score + bindparam("delta")
+                await db.execute(
+                    update(posts).where(posts.c.id == bindparam("post_id"))
+                    .values(score=score, hot_score=hot_score_sql(db.bind.dialect.name, score, posts.c.created_at)),
+                    rows
+                )
+                await db.commit()
+        except Exception:
+            logger.exception("Failed to flush %d buffered score deltas; will retry", len(rows))
+            for row in rows:
+                self.add(row["post_id"], row["delta"])
+            return
+        await cache.invalidate_namespace(FEED_NAMESPACE)
+
+    async def _run(self) -> None:
+        while not self._stopping.is_set():
+            try:
+                await asyncio.wait_for(self._stopping.wait(), self.interval)
+            except asyncio.TimeoutError:
+                await self.flush()
+
+    def start(self) -> None:
+        if self.enabled and self._task is None:
+            self._stopping = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            # Not cancelled: a flush cut short after taking the pending deltas would lose them
+            self._stopping.set()
+            await self._task
+            self._task = None
+        await self.flush()
+
+
+score_buffer = ScoreBuffer(VOTE_BUFFER_SECONDS)
@@ -0,0 +1,39 @@
+"""Run background jobs outside the API process.
+
+Start one or more of these and set ``JOB_WORKER_IN_APP=false`` on the API:
+
+    python worker.py --concurrency 8
+
+Workers share the ``jobs`` table and never run a job twice at once. Stop one
+with Ctrl-C or SIGTERM; the jobs it was running go back to the queue.
+"""
+import argparse
+import asyncio
+import logging
+import signal
+
+import availability  # noqa: F401  registers its job handlers
+from database import dispose_engines, init_engines
+from jobs import JOB_CONCURRENCY, JOB_POLL_SECONDS, Worker
+
+
+async def serve(concurrency: int, poll: float) -> None:
+    init_engines()
+    task = asyncio.create_task(Worker(concurrency, poll).run())
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, task.cancel)
+    try:
+        await task
+    except asyncio.CancelledError:
+        pass
+    await dispose_engines()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--concurrency", type=int, default=JOB_CONCURRENCY, help="jobs run at once")
+    parser.add_argument("--poll", type=float, default=JOB_POLL_SECONDS, help="seconds between looks for due jobs")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(levelname)s %(message)s")
+    asyncio.run(serve(args.concurrency, args.poll))
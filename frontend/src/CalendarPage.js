@@ -195,8 +195,16 @@ const CalendarPage = () => {
         }),
       });
       if (!backendResponse.ok) throw new Error("Failed to sync busy times to backend");
-      const result = await backendResponse.json();
-      setSyncStatus(`Synced ${result.inserted_busy_blocks} busy blocks (no event details stored).`);
+      let job = await backendResponse.json();
+      setSyncStatus("Saving busy times...");
+      while (job.status === "queued" || job.status === "running") {
+        await new Promise((resolve) => setTimeout(resolve, 1000));
+        const jobResponse = await fetch(`${API_BASE}/jobs/${job.job_id}`);
+        if (!jobResponse.ok) throw new Error("Failed to check calendar sync status");
+        job = await jobResponse.json();
+      }
+      if (job.status !== "succeeded") throw new Error("Failed to sync busy times to backend");
+      setSyncStatus(`Synced ${job.result.inserted_busy_blocks} busy blocks (no event details stored).`);
     } catch (err) {
       setSyncStatus(err.message || "Calendar sync failed");
     }
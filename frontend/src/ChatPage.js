@@ -1,4 +1,4 @@
-import { useEffect, useState } from "react";
+import { useEffect, useRef, useState } from "react";
 import { onAuthStateChanged } from "firebase/auth";
 import Navbar from "./Navbar";
 import "./LoginPage.css";
@@ -11,12 +11,24 @@ const ROLE_PRIORITY = {
   Student: 2,
 };
 
+// Sort by role priority then name
+const byRoleThenName = (a, b) => {
+  const roleA = ROLE_PRIORITY[a.role] ?? 99;
+  const roleB = ROLE_PRIORITY[b.role] ?? 99;
+  if (roleA !== roleB) return roleA - roleB;
+  return (a.full_name || "").localeCompare(b.full_name || "");
+};
+
 const ChatPage = () => {
   const [authUser, setAuthUser] = useState(null);
   const [userProfile, setUserProfile] = useState(null);
   const [loading, setLoading] = useState(true);
 
   const [users, setUsers] = useState([]);
+  const [userSearch, setUserSearch] = useState("");
+  const [usersCursor, setUsersCursor] = useState(null);
+  const [loadingMoreUsers, setLoadingMoreUsers] = useState(false);
+  const rosterQuery = useRef("");
   const [selectedUser, setSelectedUser] = useState(null);
   const [messages, setMessages] = useState([]);
   const [newMessage, setNewMessage] = useState("");
@@ -36,29 +48,6 @@ const ChatPage = () => {
         } catch (err) {
           console.error("Error loading user profile for chat:", err);
         }
-
-        // Load all users for roster
-        try {
-          const usersRes = await fetch("http://localhost:8000/users");
-          if (usersRes.ok) {
-            const allUsers = await usersRes.json();
-            // Exclude current user and sort by role priority then name
-            const filtered = allUsers
-              .filter((u) => u.firebase_uid !== user.uid)
-              .sort((a, b) => {
-                const roleA = ROLE_PRIORITY[a.role] ?? 99;
-                const roleB = ROLE_PRIORITY[b.role] ?? 99;
-                if (roleA !== roleB) return roleA - roleB;
-                return (a.full_name || "").localeCompare(b.full_name || "");
-              });
-            setUsers(filtered);
-            if (filtered.length > 0) {
-              setSelectedUser(filtered[0]);
-            }
-          }
-        } catch (err) {
-          console.error("Error loading users for chat:", err);
-        }
       }
       setLoading(false);
     });
@@ -66,6 +55,68 @@ const ChatPage = () => {
     return () => unsubscribe();
   }, []);
 
+  // Fetch one page of the roster, without the current user
+  const fetchUsers = async (query, cursor = null) => {
+    const params = new URLSearchParams({ limit: "100" });
+    if (query) {
+      params.append("q", query);
+    }
+    if (cursor) {
+      params.append("cursor", cursor);
+    }
+    const usersRes = await fetch(`http://localhost:8000/users?${params.toString()}`);
+    if (!usersRes.ok) return null;
+    const pageUsers = await usersRes.json();
+    return {
+      users: pageUsers.filter((u) => u.firebase_uid !== authUser.uid),
+      next: usersRes.headers.get("X-Next-Cursor"),
+    };
+  };
+
+  // Load the roster (first page, or matches for the search box)
+  useEffect(() => {
+    if (!authUser) return;
+    const query = userSearch.trim();
+    rosterQuery.current = query;
+    const timer = setTimeout(async () => {
+      try {
+        const page = await fetchUsers(query);
+        if (page && rosterQuery.current === query) {
+          const sorted = page.users.sort(byRoleThenName);
+          setUsers(sorted);
+          setUsersCursor(page.next);
+          setSelectedUser((current) => current ?? sorted[0] ?? null);
+        }
+      } catch (err) {
+        console.error("Error loading users for chat:", err);
+      }
+    }, userSearch ? 250 : 0);
+
+    return () => clearTimeout(timer);
+  }, [authUser, userSearch]);
+
+  // Load the next page of the roster when the list is scrolled near its end
+  const handleUserListScroll = async (e) => {
+    const list = e.currentTarget;
+    if (!usersCursor || loadingMoreUsers) return;
+    if (list.scrollTop + list.clientHeight < list.scrollHeight - 80) return;
+
+    const query = rosterQuery.current;
+    setLoadingMoreUsers(true);
+    try {
+      const page = await fetchUsers(query, usersCursor);
+      // Drop the page if the search changed while it was loading
+      if (page && rosterQuery.current === query) {
+        setUsers((current) => [...current, ...page.users].sort(byRoleThenName));
+        setUsersCursor(page.next);
+      }
+    } catch (err) {
+      console.error("Error loading more users for chat:", err);
+    } finally {
+      setLoadingMoreUsers(false);
+    }
+  };
+
   // Fetch messages between authUser and selectedUser
   const loadMessages = async (currentUser, otherUser) => {
     if (!currentUser || !otherUser || !otherUser.firebase_uid) return;
@@ -172,10 +223,20 @@ const ChatPage = () => {
               )}
             </div>
 
+            <input
+              type="search"
+              className="dm-user-search"
+              placeholder="Search people..."
+              value={userSearch}
+              onChange={(e) => setUserSearch(e.target.value)}
+            />
+
             <div className="dm-list-label">Chats</div>
-            <div className="dm-user-list">
+            <div className="dm-user-list" onScroll={handleUserListScroll}>
               {users.length === 0 && (
-                <p className="dm-empty-text">No other users yet.</p>
+                <p className="dm-empty-text">
+                  {userSearch ? "No matching users." : "No other users yet."}
+                </p>
               )}
               {users.map((u) => {
                 const isActive = selectedUser?.firebase_uid === u.firebase_uid;
@@ -201,6 +262,7 @@ const ChatPage = () => {
                   </button>
                 );
               })}
+              {loadingMoreUsers && <p className="dm-empty-text">Loading more…</p>}
             </div>
           </aside>
 
@@ -9,6 +9,9 @@ const ResourcesPage = () => {
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState(null);
   const [currentUser, setCurrentUser] = useState(null);
+  const [sort, setSort] = useState("hot");
+  const [nextCursor, setNextCursor] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [showForm, setShowForm] = useState(false);
   const [formError, setFormError] = useState(null);
   const [isSubmitting, setIsSubmitting] = useState(false);
@@ -43,26 +46,32 @@ const ResourcesPage = () => {
     return () => unsubscribe();
   }, []);
 
-  // Fetch posts
-  const fetchPosts = async () => {
+  // Fetch posts: the first page, or with a cursor the page after the ones shown
+  const fetchPosts = async (cursor = null) => {
+    const setBusy = cursor ? setLoadingMore : setLoading;
     try {
-      setLoading(true);
+      setBusy(true);
       setError(null);
       const params = new URLSearchParams();
       if (currentUser?.uid) {
         params.append("current_user_uid", currentUser.uid);
       }
+      params.append("sort", sort);
+      if (cursor) {
+        params.append("cursor", cursor);
+      }
       const response = await fetch(
         `http://localhost:8000/posts?${params.toString()}`
       );
       if (!response.ok) throw new Error("Failed to fetch posts");
       const data = await response.json();
-      setPosts(data);
+      setPosts((prevPosts) => (cursor ? [...prevPosts, ...data] : data));
+      setNextCursor(response.headers.get("X-Next-Cursor"));
     } catch (err) {
       setError("Failed to load posts. Please try again.");
       console.error("Error fetching posts:", err);
     } finally {
-      setLoading(false);
+      setBusy(false);
     }
   };
 
@@ -71,7 +80,7 @@ const ResourcesPage = () => {
     if (currentUser) {
       fetchPosts();
     }
-  }, [currentUser]);
+  }, [currentUser, sort]);
 
   // Handle form input change
   const handleFormChange = (e) => {
@@ -306,6 +315,20 @@ const ResourcesPage = () => {
             </div>
           )}
 
+          {/* Feed Order */}
+          <div className="feed-sort">
+            {["hot", "top", "new"].map((option) => (
+              <button
+                key={option}
+                type="button"
+                className={`feed-sort-option${sort === option ? " active" : ""}`}
+                onClick={() => setSort(option)}
+              >
+                {option.charAt(0).toUpperCase() + option.slice(1)}
+              </button>
+            ))}
+          </div>
+
           {/* Posts Feed */}
           {error && <div className="error-message">{error}</div>}
 
@@ -385,6 +408,16 @@ const ResourcesPage = () => {
                   </div>
                 </div>
               ))}
+              {nextCursor && (
+                <button
+                  type="button"
+                  className="btn-cancel load-more"
+                  onClick={() => fetchPosts(nextCursor)}
+                  disabled={loadingMore}
+                >
+                  {loadingMore ? "Loading..." : "Load more"}
+                </button>
+              )}
             </div>
           )}
         </div>